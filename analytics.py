@@ -0,0 +1,386 @@
+"""
+Cohort statistics over many parsed audits, computed on NumPy columns.
+
+Load a cohort from the SQLite audit index (SCRAPER_INDEX_DB), from reprocess.py
+NDJSON output, or from (student id, json_preview) pairs, then ask for:
+
+    term_loads          credits per student per term (mean, median, p10/p90)
+    grade_distribution  grade counts and mean grade points per course
+    section_completion  share of students with nothing left in each requirement section
+    gpa_trends          credit-weighted term GPA per term, overall GPA per classification
+
+Run from the repository root:
+    python analytics.py --index audits.db
+    python analytics.py --ndjson reprocessed.ndjson --stats grades --course "COSC 111"
+"""
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+from audit_index import AuditIndex, label_term
+from courses import term_label
+from rules import load_rules
+
+COMPLETED, IN_PROGRESS = 0, 1
+
+
+class Vocabulary:
+    """Strings stored once; rows hold their index."""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def __call__(self, value):
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def __len__(self):
+        return len(self.values)
+
+
+def grouped_stats(groups, values, quantiles=(0.5,)):
+    """
+    Per-group count, sum and (linearly interpolated) quantiles of values.
+
+    Returns (group keys, counts, sums, {q: array}); one sort of the whole
+    column instead of a Python loop per group.
+    """
+    if not len(groups):
+        return groups[:0], np.zeros(0, np.int64), np.zeros(0), {q: np.zeros(0) for q in quantiles}
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    keys, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    sums = np.add.reduceat(values, starts)
+    result = {}
+    for q in quantiles:
+        position = starts + (counts - 1) * q
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[q] = values[low] + (values[high] - values[low]) * (position - low)
+    return keys, counts, sums, result
+
+
+def per_student_term(students, terms, weights, n_students):
+    """Sum weights per (term, student) pair: returns (term of each pair, sums)."""
+    pairs = terms.astype(np.int64) * n_students + students
+    unique, inverse = np.unique(pairs, return_inverse=True)
+    return unique // n_students, np.bincount(inverse, weights=weights, minlength=len(unique))
+
+
+def number(value, digits=2):
+    """A NumPy scalar as a rounded float for JSON; None for NaN."""
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+
+class Cohort:
+    """
+    Parsed audits of many students as column arrays.
+
+    Course rows: student, course, term (integer key, 0 when unknown), credits,
+    grade and status (completed / in progress). Section rows: student,
+    section, completed course count and remaining requirement count. Student
+    rows: id, GPA (NaN when unknown) and classification. Strings live in
+    vocabularies and rows hold their index. Build one with from_index,
+    from_ndjson or from_results; the statistics never loop per student.
+    """
+
+    def __init__(self, builder, rules=None):
+        rules = rules or load_rules()
+        self.student_ids = builder.students.values
+        self.codes = builder.codes.values
+        self.code_index = builder.codes.index
+        self.grades = builder.grades.values
+        self.section_names = builder.section_names.values
+        self.classifications = builder.classifications.values
+
+        self.gpa = np.array(builder.gpa, dtype=np.float64)
+        self.classification = np.array(builder.classification, dtype=np.int32)
+
+        self.course_student = np.array(builder.course_student, dtype=np.int32)
+        self.course = np.array(builder.course, dtype=np.int32)
+        self.term = np.array(builder.term, dtype=np.int32)
+        self.credits = np.array(builder.credits, dtype=np.float64)
+        self.grade = np.array(builder.grade, dtype=np.int32)
+        self.status = np.array(builder.status, dtype=np.int8)
+
+        self.section_student = np.array(builder.section_student, dtype=np.int32)
+        self.section = np.array(builder.section, dtype=np.int32)
+        self.section_completed = np.array(builder.section_completed, dtype=np.int32)
+        self.section_remaining = np.array(builder.section_remaining, dtype=np.int32)
+
+        # Per-grade lookups, indexed by the grade column
+        self.grade_points = np.array([rules.grade_points.get(g, np.nan) for g in self.grades], dtype=np.float64)
+        self.is_transfer = np.array([g in rules.transfer_grades for g in self.grades], dtype=bool)
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    # --- Loading ---
+    @classmethod
+    def from_results(cls, results, rules=None):
+        """Cohort from (student id, json_preview) pairs; a repeated id keeps its first audit."""
+        builder = CohortBuilder()
+        for student_id, preview in results:
+            builder.add(student_id, preview)
+        return cls(builder, rules)
+
+    @classmethod
+    def from_ndjson(cls, path, rules=None):
+        """Cohort from reprocess.py output: successful lines, keyed by their id."""
+        def results():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    data = record.get("data") or {}
+                    # --kind html lines hold a scrape result, --kind text lines the parsed text
+                    preview = data.get("json_preview") if "json_preview" in data else data
+                    if record.get("status") == "success" and isinstance(preview, dict):
+                        yield record["id"], preview
+        return cls.from_results(results(), rules)
+
+    @classmethod
+    def from_index(cls, index, rules=None):
+        """Cohort from an AuditIndex (see audit_index.py): three queries in one snapshot, loaded column by column."""
+        builder = CohortBuilder()
+        # One snapshot, so an upsert landing between the queries cannot leave rows without their student
+        with index.snapshot():
+            for student_id, gpa, classification in index.execute(
+                "SELECT student_id, gpa, classification FROM audits ORDER BY student_id"
+            ):
+                builder.add_student(student_id, gpa, classification)
+            students = builder.students.index
+
+            rows = index.execute("SELECT student_id, code, credits, grade, term, status FROM courses").fetchall()
+            if rows:
+                student, code, credits, grade, term, status = zip(*rows)
+                builder.course_student = [students[s] for s in student]
+                builder.course = [builder.codes(c) for c in code]
+                builder.credits = [c or 0.0 for c in credits]
+                builder.grade = [builder.grades(g or "") for g in grade]
+                builder.term = [t or 0 for t in term]
+                builder.status = [IN_PROGRESS if s == "in_progress" else COMPLETED for s in status]
+
+            rows = index.execute("SELECT student_id, section, completed, remaining FROM sections").fetchall()
+            if rows:
+                student, section, completed, remaining = zip(*rows)
+                builder.section_student = [students[s] for s in student]
+                builder.section = [builder.section_names(name) for name in section]
+                builder.section_completed = completed
+                builder.section_remaining = remaining
+        return cls(builder, rules)
+
+    # --- Statistics ---
+    def _course_rows(self, status=None, graded=False):
+        """Mask of non-transfer course rows with a known term (optionally one status / with grade points)."""
+        mask = (self.term > 0) & ~self.is_transfer[self.grade]
+        if status is not None:
+            mask &= self.status == status
+        if graded:
+            mask &= ~np.isnan(self.grade_points[self.grade]) & (self.credits > 0)
+        return mask
+
+    def term_loads(self):
+        """Credits each student carried per term, summarised per term (transfer credit left out)."""
+        mask = self._course_rows()
+        terms, loads = per_student_term(self.course_student[mask], self.term[mask], self.credits[mask], len(self))
+        keys, counts, sums, q = grouped_stats(terms, loads, (0.1, 0.5, 0.9, 1.0))
+        return [
+            {
+                "term": term_label(int(keys[i])),
+                "students": int(counts[i]),
+                "total_credits": number(sums[i], 1),
+                "mean": number(sums[i] / counts[i]),
+                "median": number(q[0.5][i]),
+                "p10": number(q[0.1][i]),
+                "p90": number(q[0.9][i]),
+                "max": number(q[1.0][i]),
+            }
+            for i in range(len(keys))
+        ]
+
+    def grade_distribution(self, course=None, limit=50):
+        """Grade counts and mean grade points per completed course, most-taken first."""
+        mask = self.status == COMPLETED
+        n_grades = len(self.grades)
+        cells = np.bincount(self.course[mask].astype(np.int64) * n_grades + self.grade[mask],
+                            minlength=len(self.codes) * n_grades)
+        matrix = cells.reshape(len(self.codes), n_grades) if n_grades else cells.reshape(len(self.codes), 0)
+        totals = matrix.sum(axis=1)
+
+        graded = ~np.isnan(self.grade_points)
+        points = np.where(graded, self.grade_points, 0.0)
+        graded_counts = matrix[:, graded].sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_points = np.where(graded_counts > 0, matrix @ points / graded_counts, np.nan)
+
+        if course is not None:
+            rows = [self.code_index[course]] if course in self.code_index else []
+        else:
+            rows = [int(i) for i in np.argsort(-totals, kind="stable")[:limit] if totals[i]]
+        return [
+            {
+                "course": self.codes[i],
+                "students": int(totals[i]),
+                "grades": {self.grades[g]: int(matrix[i, g]) for g in np.flatnonzero(matrix[i])},
+                "mean_points": number(mean_points[i]),
+            }
+            for i in rows
+        ]
+
+    def section_completion(self):
+        """Per requirement section: students who have it, share with nothing left, mean requirements left."""
+        n_sections = len(self.section_names)
+        students = np.bincount(self.section, minlength=n_sections)
+        complete = np.bincount(self.section, weights=self.section_remaining == 0, minlength=n_sections)
+        remaining = np.bincount(self.section, weights=self.section_remaining, minlength=n_sections)
+        completed = np.bincount(self.section, weights=self.section_completed, minlength=n_sections)
+        return [
+            {
+                "section": self.section_names[i],
+                "students": int(students[i]),
+                "completion_rate": number(complete[i] / students[i], 3),
+                "mean_remaining": number(remaining[i] / students[i]),
+                "mean_completed_courses": number(completed[i] / students[i]),
+            }
+            for i in np.argsort(-students, kind="stable") if students[i]
+        ]
+
+    def gpa_trends(self):
+        """Credit-weighted term GPA from course grades, per term, and overall GPA per classification."""
+        mask = self._course_rows(COMPLETED, graded=True)
+        students, terms, credits = self.course_student[mask], self.term[mask], self.credits[mask]
+        weighted = self.grade_points[self.grade[mask]] * credits
+        pair_terms, point_sums = per_student_term(students, terms, weighted, len(self))
+        _, credit_sums = per_student_term(students, terms, credits, len(self))
+        keys, counts, sums, q = grouped_stats(pair_terms, point_sums / credit_sums, (0.25, 0.5, 0.75))
+        by_term = [
+            {
+                "term": term_label(int(keys[i])),
+                "students": int(counts[i]),
+                "mean": number(sums[i] / counts[i]),
+                "p25": number(q[0.25][i]),
+                "median": number(q[0.5][i]),
+                "p75": number(q[0.75][i]),
+            }
+            for i in range(len(keys))
+        ]
+
+        known = ~np.isnan(self.gpa)
+        keys, counts, sums, q = grouped_stats(self.classification[known], self.gpa[known])
+        by_classification = [
+            {
+                "classification": self.classifications[keys[i]],
+                "students": int(counts[i]),
+                "mean": number(sums[i] / counts[i]),
+                "median": number(q[0.5][i]),
+            }
+            for i in range(len(keys))
+        ]
+        return {"by_term": by_term, "by_classification": by_classification}
+
+    def summary(self):
+        return {
+            "students": len(self),
+            "course_records": int(len(self.course)),
+            "courses": len(self.codes),
+            "sections": len(self.section_names),
+        }
+
+
+class CohortBuilder:
+    """Accumulates rows for a Cohort in plain lists."""
+
+    def __init__(self):
+        self.students = Vocabulary()
+        self.codes = Vocabulary()
+        self.grades = Vocabulary()
+        self.section_names = Vocabulary()
+        self.classifications = Vocabulary()
+        self.gpa, self.classification = [], []
+        self.course_student, self.course, self.term, self.credits, self.grade, self.status = [], [], [], [], [], []
+        self.section_student, self.section, self.section_completed, self.section_remaining = [], [], [], []
+
+    def add_student(self, student_id, gpa, classification):
+        if student_id in self.students.index:
+            return None
+        student = self.students(student_id)
+        self.gpa.append(np.nan if gpa is None else gpa)
+        self.classification.append(self.classifications(classification))
+        return student
+
+    def add_course(self, student, code, credits, grade, term, status):
+        self.course_student.append(student)
+        self.course.append(self.codes(code))
+        self.credits.append(credits or 0.0)
+        self.grade.append(self.grades(grade or ""))
+        self.term.append(term or 0)
+        self.status.append(status)
+
+    def add_section(self, student, name, completed, remaining):
+        self.section_student.append(student)
+        self.section.append(self.section_names(name))
+        self.section_completed.append(completed)
+        self.section_remaining.append(remaining)
+
+    def add(self, student_id, preview):
+        student = self.add_student(student_id, preview.get("gpa"), preview.get("classification"))
+        if student is None:
+            return
+        for c in preview.get("completed_courses_list") or []:
+            self.add_course(student, c["course"], c.get("credits"), c.get("grade"), label_term(c.get("term")),
+                            COMPLETED)
+        for c in preview.get("in_progress_courses_list") or []:
+            self.add_course(student, c["course"], c.get("credits"), "IP", label_term(c.get("term")), IN_PROGRESS)
+        for section in preview.get("sections") or []:
+            self.add_section(student, section.get("name"), len(section.get("completed_courses") or ()),
+                             len(section.get("remaining_requirements") or ()))
+
+
+STATS = {
+    "terms": lambda cohort, args: cohort.term_loads(),
+    "grades": lambda cohort, args: cohort.grade_distribution(args.course, args.limit),
+    "sections": lambda cohort, args: cohort.section_completion(),
+    "gpa": lambda cohort, args: cohort.gpa_trends(),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--index", help="audit index database (SCRAPER_INDEX_DB)")
+    source.add_argument("--ndjson", help="reprocess.py output")
+    parser.add_argument("--stats", nargs="+", choices=sorted(STATS), default=sorted(STATS))
+    parser.add_argument("--course", help="grades: only this course code")
+    parser.add_argument("--limit", type=int, default=50, help="grades: most-taken courses to list")
+    parser.add_argument("--profile", help="profile for grade points and transfer grades")
+    args = parser.parse_args()
+
+    rules = load_rules(args.profile) if args.profile else None
+    started = time.perf_counter()
+    if args.index:
+        cohort = Cohort.from_index(AuditIndex(args.index), rules)
+    else:
+        cohort = Cohort.from_ndjson(args.ndjson, rules)
+    loaded = time.perf_counter()
+    report = {"cohort": cohort.summary()}
+    for name in args.stats:
+        report[name] = STATS[name](cohort, args)
+    done = time.perf_counter()
+    print(json.dumps(report, indent=2))
+    print(f"loaded in {(loaded - started) * 1000:.0f} ms, statistics in {(done - loaded) * 1000:.0f} ms",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl  # POSIX only; without it one process at a time should write a store
+except ImportError:
+    fcntl = None
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_KINDS = {
+    "html": "degreeworks_raw_{}.html.gz",
+    "txt": "degreeworks_paragraphs_{}.txt.gz",
+    "json": "degreeworks_data_{}.json.gz",
+}
+INDEX_FILE = "index.jsonl"
+# flock target; index.jsonl itself is swapped out by compaction, so it can't hold the lock
+INDEX_LOCK_FILE = "index.jsonl.lock"
+
+
+def new_run_id():
+    """Sortable by time, unique across requests in the same second (and across processes)."""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}"
+
+
+class ArtifactStore:
+    """
+    Gzip-compressed HTML/TXT/JSON artifacts per scrape run, written off the request path.
+
+    submit() only queues the run; a single background thread compresses and
+    writes the files, appends the run to index.jsonl and applies retention
+    (max_bytes total, max_age_seconds per run, oldest first). The index is
+    loaded once at startup, so lookups never list the directory. Evictions
+    append tombstones to the index, which is compacted once most of its lines
+    are dead. When the queue is full the run is dropped (and counted) rather
+    than blocking.
+    """
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, max_age_seconds=30 * 24 * 3600,
+                 queue_size=64, compresslevel=6):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compresslevel = compresslevel
+
+        self._index = OrderedDict()  # run_id -> entry, oldest first
+        self._bytes = 0
+        self._index_lines = 0  # lines in index.jsonl, live entries and tombstones
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+        self.written = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.failed = 0
+
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+        self._evict()
+
+    # --- Paths ---
+    def paths(self, run_id):
+        return {kind: os.path.join(self.root, pattern.format(run_id)) for kind, pattern in ARTIFACT_KINDS.items()}
+
+    # --- Index ---
+    # Several processes can share root (uvicorn --workers N, reprocess.py next to
+    # the server). Appends and compactions hold an flock on INDEX_LOCK_FILE, and
+    # compaction rebuilds the file from its own contents, so runs and tombstones
+    # other processes appended since this one loaded the index are kept.
+    def _read_index(self):
+        """Live entries of index.jsonl as {run_id: entry}, oldest first, and its line count."""
+        entries = OrderedDict()
+        lines = 0
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            return entries, lines
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                lines += 1
+                if entry.get("deleted"):
+                    entries.pop(entry["id"], None)
+                else:
+                    entries[entry["id"]] = entry
+        return entries, lines
+
+    def _load_index(self):
+        self._index, self._index_lines = self._read_index()
+        self._bytes = sum(entry["bytes"] for entry in self._index.values())
+
+    @contextmanager
+    def _index_file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, INDEX_LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _append_index(self, *entries):
+        with self._index_file_lock():
+            with open(os.path.join(self.root, INDEX_FILE), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        self._index_lines += len(entries)
+
+    def _compact_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        tmp_path = f"{path}.tmp"
+        with self._index_file_lock():
+            entries, _ = self._read_index()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, path)
+        self._index_lines = len(entries)
+
+    def get(self, run_id):
+        """Index entry for a stored run (id, created, files, bytes), or None."""
+        with self._lock:
+            entry = self._index.get(run_id)
+            return dict(entry) if entry else None
+
+    # --- Writing ---
+    def submit(self, html_content, text_content, json_data, run_id=None):
+        """Queue a run for writing; returns (run_id, {kind: path}) right away, or None if it was dropped."""
+        run_id = run_id or new_run_id()
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((run_id, time.time(), html_content, text_content, json_data))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning("Artifact queue full, dropping run %s", run_id)
+            return None
+        return run_id, self.paths(run_id)
+
+    def write(self, run_id, created, html_content, text_content, json_data):
+        """Write one run synchronously (the background thread's unit of work)."""
+        paths = self.paths(run_id)
+        contents = {
+            "html": html_content,
+            "txt": "=== Extracted Paragraphs from HTML ===\n\n" + (text_content or "No text found."),
+            "json": json.dumps(json_data),
+        }
+        size = 0
+        for kind, path in paths.items():
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=self.compresslevel) as f:
+                f.write(contents[kind])
+            os.replace(tmp_path, path)
+            size += os.path.getsize(path)
+
+        entry = {
+            "id": run_id,
+            "created": created,
+            "files": paths,
+            "bytes": size,
+        }
+        with self._lock:
+            self._index[run_id] = entry
+            self._bytes += size
+            self._append_index(entry)
+            self.written += 1
+            self._evict()
+        logger.debug("Saved artifacts for run %s (%d bytes)", run_id, size)
+        return entry
+
+    def _ensure_writer(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._writer_loop, name="artifact-writer", daemon=True)
+                    self._thread.start()
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                with stage("artifact_write"):
+                    self.write(*item)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.error("Failed to write artifacts for run %s: %s", item[0], e)
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    # --- Retention ---
+    def _evict(self):
+        """Drop runs past max_age_seconds, then the oldest until under max_bytes (lock held)."""
+        now = time.time()
+        doomed = []
+        total = self._bytes
+        for run_id, entry in self._index.items():
+            if now - entry["created"] > self.max_age_seconds or total > self.max_bytes:
+                doomed.append(run_id)
+                total -= entry["bytes"]
+            else:
+                break
+        if not doomed:
+            return
+        for run_id in doomed:
+            entry = self._index.pop(run_id)
+            self._bytes -= entry["bytes"]
+            for path in entry["files"].values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.evicted += 1
+        # Tombstones keep eviction O(evicted); the file is rewritten only once
+        # dead lines outnumber live ones, so compaction stays amortised O(1)
+        self._append_index(*({"id": run_id, "deleted": True} for run_id in doomed))
+        if self._index_lines > 2 * len(self._index) + 1024:
+            self._compact_index()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "runs": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds,
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "evicted": self.evicted,
+                "failed": self.failed,
+            }
@@ -0,0 +1,307 @@
+import re
+import time
+import sqlite3
+import logging
+import threading
+import contextlib
+
+from courses import SEASON_ORDER, term_label
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audits (
+    student_id TEXT PRIMARY KEY,
+    audit_key TEXT NOT NULL,
+    parser_version TEXT,
+    updated REAL NOT NULL,
+    student_name TEXT,
+    classification TEXT,
+    major TEXT,
+    gpa REAL,
+    total_completed_credits REAL,
+    current_term INTEGER
+);
+CREATE TABLE IF NOT EXISTS courses (
+    student_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    title TEXT,
+    credits REAL,
+    grade TEXT,
+    term INTEGER,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS courses_code ON courses (code, status, term);
+CREATE INDEX IF NOT EXISTS courses_term ON courses (term, status);
+CREATE INDEX IF NOT EXISTS courses_grade ON courses (grade, code);
+CREATE INDEX IF NOT EXISTS courses_student ON courses (student_id);
+CREATE TABLE IF NOT EXISTS requirements (
+    id INTEGER PRIMARY KEY,
+    student_id TEXT NOT NULL,
+    section TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requirements_student ON requirements (student_id);
+CREATE TABLE IF NOT EXISTS sections (
+    student_id TEXT NOT NULL,
+    section TEXT,
+    completed INTEGER NOT NULL,
+    remaining INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sections_student ON sections (student_id);
+CREATE TABLE IF NOT EXISTS requirement_courses (
+    requirement_id INTEGER NOT NULL,
+    student_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    number TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requirement_courses_code ON requirement_courses (subject, number);
+CREATE INDEX IF NOT EXISTS requirement_courses_student ON requirement_courses (student_id);
+"""
+
+# Full-text index over the requirement text; skipped when SQLite lacks FTS5
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS requirements_fts USING fts5(text, content='requirements', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS requirements_fts_insert AFTER INSERT ON requirements BEGIN
+    INSERT INTO requirements_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS requirements_fts_delete AFTER DELETE ON requirements BEGIN
+    INSERT INTO requirements_fts (requirements_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# --- Course references in requirement text ---
+# "1 Class in COSC 350 or 351 or MATH 4@": a number without a subject takes
+# the last subject seen; "@" is DegreeWorks' wildcard.
+REFERENCE_TOKEN = re.compile(r"\b[A-Z]{2,5}\b|\b\d{3,4}[A-Z]?\b|\b\d*@+")
+COURSE_CODE = re.compile(r"^\s*([A-Za-z]{2,5})\s*(\d{3,4}[A-Za-z]?)\s*$")
+
+
+def course_references(text):
+    """(subject, number) pairs mentioned in a requirement; number may hold @ wildcards."""
+    references = []
+    subject = None
+    for token in REFERENCE_TOKEN.findall(text):
+        if token[0].isalpha():
+            subject = token
+        elif subject:
+            references.append((subject, token))
+    return references
+
+
+def normalize_code(code):
+    """"cosc470" / " COSC  470 " -> "COSC 470"; None if it isn't a course code."""
+    match = COURSE_CODE.match(code or "")
+    if not match:
+        return None
+    return f"{match.group(1).upper()} {match.group(2).upper()}"
+
+
+def label_term(label):
+    """Inverse of courses.term_label: 20243 for "FALL 2024", None for anything else."""
+    season, _, year = (label or "").strip().upper().partition(" ")
+    if season not in SEASON_ORDER or not year.isdigit():
+        return None
+    return int(year) * 10 + SEASON_ORDER[season]
+
+
+class AuditIndex:
+    """
+    SQLite index of the latest parsed audit per student, for cohort-wide lookups.
+
+    upsert() replaces a student's rows in one transaction (a no-op when the same
+    audit was already indexed with the same parser version). Courses are
+    indexed by code, term and grade; requirements by the course codes they
+    mention and, with FTS5, by their text. Each thread gets its own connection;
+    the database runs in WAL mode so lookups never wait on a write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite has no FTS5; requirement text search falls back to LIKE")
+            self.fts = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Writing ---
+    def upsert(self, student_id, preview, audit_key, parser_version=None):
+        """Index one successful json_preview under student_id; returns False when it was already current."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            row = conn.execute(
+                "SELECT audit_key, parser_version FROM audits WHERE student_id = ?", (student_id,),
+            ).fetchone()
+            if row and row["audit_key"] == audit_key and row["parser_version"] == parser_version:
+                return False
+
+            conn.execute("DELETE FROM courses WHERE student_id = ?", (student_id,))
+            conn.execute("DELETE FROM requirement_courses WHERE student_id = ?", (student_id,))
+            conn.execute("DELETE FROM requirements WHERE student_id = ?", (student_id,))
+            conn.execute("DELETE FROM sections WHERE student_id = ?", (student_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO audits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    student_id, audit_key, parser_version, time.time(),
+                    preview.get("student_name"), preview.get("classification"), preview.get("major"),
+                    preview.get("gpa"), preview.get("total_completed_credits"),
+                    label_term(preview.get("current_term")),
+                ),
+            )
+
+            rows = [
+                (student_id, c["course"], c.get("title"), c.get("credits"), c.get("grade"),
+                 label_term(c.get("term")), "completed")
+                for c in preview.get("completed_courses_list") or []
+            ]
+            rows += [
+                (student_id, c["course"], c.get("title"), c.get("credits"), "IP",
+                 label_term(c.get("term")), "in_progress")
+                for c in preview.get("in_progress_courses_list") or []
+            ]
+            conn.executemany("INSERT INTO courses VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+            conn.executemany(
+                "INSERT INTO sections VALUES (?, ?, ?, ?)",
+                [
+                    (student_id, section.get("name"), len(section.get("completed_courses") or ()),
+                     len(section.get("remaining_requirements") or ()))
+                    for section in preview.get("sections") or []
+                ],
+            )
+            for section in preview.get("sections") or []:
+                for text in section.get("remaining_requirements") or []:
+                    requirement_id = conn.execute(
+                        "INSERT INTO requirements (student_id, section, text) VALUES (?, ?, ?)",
+                        (student_id, section.get("name"), text),
+                    ).lastrowid
+                    conn.executemany(
+                        "INSERT INTO requirement_courses VALUES (?, ?, ?, ?)",
+                        [(requirement_id, student_id, subject, number) for subject, number in course_references(text)],
+                    )
+        return True
+
+    # --- Lookups ---
+    def _query(self, sql, params):
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def execute(self, sql, params=()):
+        """A cursor over plain tuples on this thread's connection, for bulk readers such as analytics.Cohort."""
+        cursor = self._connect().cursor()
+        # sqlite3.Row costs more than the query itself on a few hundred thousand rows
+        cursor.row_factory = None
+        return cursor.execute(sql, params)
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """One read transaction: every execute() inside it sees the index as of its first query."""
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            yield self
+        finally:
+            conn.execute("COMMIT")
+
+    def version(self):
+        """(audit count, last update time): changes whenever an audit is indexed or removed."""
+        return tuple(self._connect().execute("SELECT COUNT(*), MAX(updated) FROM audits").fetchone())
+
+    def still_needed(self, code, limit=1000):
+        """Students with a remaining requirement naming this course (directly or through a wildcard)."""
+        subject, _, number = code.partition(" ")
+        return self._query(
+            """
+            SELECT DISTINCT a.student_id, a.student_name, r.section, r.text AS requirement
+            FROM requirement_courses rc
+            JOIN requirements r ON r.id = rc.requirement_id
+            JOIN audits a ON a.student_id = rc.student_id
+            WHERE rc.subject = ?
+              AND (rc.number = ? OR (instr(rc.number, '@') AND ? GLOB replace(rc.number, '@', '*')))
+            ORDER BY a.student_id
+            LIMIT ?
+            """,
+            (subject, number, number, limit),
+        )
+
+    def in_progress(self, code, term=None, limit=1000):
+        """Students in progress on a course in term (a key), or in their own current term when None."""
+        term_clause = "c.term = ?" if term is not None else "c.term = a.current_term"
+        params = (code, term, limit) if term is not None else (code, limit)
+        rows = self._query(
+            f"""
+            SELECT a.student_id, a.student_name, c.title, c.credits, c.term
+            FROM courses c JOIN audits a ON a.student_id = c.student_id
+            WHERE c.code = ? AND c.status = 'in_progress' AND {term_clause}
+            ORDER BY a.student_id
+            LIMIT ?
+            """,
+            params,
+        )
+        return [dict(row, term=term_label(row["term"]) if row["term"] else None) for row in rows]
+
+    def completed(self, code, grade=None, limit=1000):
+        """Students who completed a course, optionally with a given grade."""
+        grade_clause = "AND c.grade = ?" if grade else ""
+        params = (code, grade.upper(), limit) if grade else (code, limit)
+        rows = self._query(
+            f"""
+            SELECT a.student_id, a.student_name, c.title, c.credits, c.grade, c.term
+            FROM courses c JOIN audits a ON a.student_id = c.student_id
+            WHERE c.code = ? AND c.status = 'completed' {grade_clause}
+            ORDER BY a.student_id
+            LIMIT ?
+            """,
+            params,
+        )
+        return [dict(row, term=term_label(row["term"]) if row["term"] else None) for row in rows]
+
+    def search_requirements(self, text, limit=1000):
+        """Remaining requirements matching free text (FTS5 query syntax when available)."""
+        if self.fts:
+            sql = """
+                SELECT a.student_id, a.student_name, r.section, r.text AS requirement
+                FROM requirements_fts f
+                JOIN requirements r ON r.id = f.rowid
+                JOIN audits a ON a.student_id = r.student_id
+                WHERE requirements_fts MATCH ?
+                ORDER BY a.student_id
+                LIMIT ?
+            """
+            try:
+                return self._query(sql, (text, limit))
+            except sqlite3.OperationalError:
+                # Not valid FTS syntax; search for it as a phrase
+                return self._query(sql, ('"' + text.replace('"', '""') + '"', limit))
+        return self._query(
+            """
+            SELECT a.student_id, a.student_name, r.section, r.text AS requirement
+            FROM requirements r JOIN audits a ON a.student_id = r.student_id
+            WHERE r.text LIKE ?
+            ORDER BY a.student_id
+            LIMIT ?
+            """,
+            (f"%{text}%", limit),
+        )
+
+    def stats(self):
+        conn = self._connect()
+        counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("audits", "courses", "requirements", "requirement_courses", "sections")
+        }
+        return {"path": self.path, "fts": self.fts, **counts}
@@ -0,0 +1,141 @@
+"""
+Benchmark embedded-course extraction on term fields with heavy spillover.
+
+When course titles carry no punctuation the flattened Term field of one record
+runs on into the following records, so a single term_text can hold dozens of
+embedded courses. Some of them are truncated (no Grade/Credits), which is what
+made the old two-pass extractor rescan the rest of the text per record.
+
+Times scraper2.extract_all_embedded_courses against the previous two-regex
+version on single term texts, and the whole embedded stage
+(collect_main_courses + add_embedded_courses) on the "spillover" synthetic audit.
+
+Run from the repository root:
+    python -m benchmarks.embedded
+    python -m benchmarks.embedded --records 50 200 1000 --truncated 0.3 --legacy
+"""
+import argparse
+import random
+import re
+import time
+
+from selectolax.parser import HTMLParser
+
+import scraper2
+from benchmarks.synthetic import SCALES, generate_audit_html
+from json_convert import parse_degreeworks_text
+
+SUBJECTS = ["COSC", "MATH", "ENGL", "PHYS", "HIST"]
+TITLE_WORDS = ["INTRODUCTION", "COMPUTING", "DATA", "STRUCTURES", "APPLIED", "PROBABILITY", "THEORY", "SYSTEMS"]
+
+
+def legacy_extract_all_embedded_courses(term_text):
+    """The extractor before the single-pass rewrite, kept for comparison."""
+    embedded = []
+    pattern1 = r'Course\s+([A-Z]+\s+\d+)\s+Title\s+(.+?)\s+Grade\s+([A-Z]+)\s+Credits\s*(\d+\.?\d*)?(?:\s+Term\s+([A-Z]+\s+\d{4}))?'
+    for match in re.finditer(pattern1, term_text, re.IGNORECASE | re.DOTALL):
+        emb_credits = scraper2.parse_credits(match.group(4) if match.group(4) else "3")
+        if emb_credits == 0.0:
+            emb_credits = 3.0
+        emb_semester, emb_year, emb_full_term = None, None, None
+        if match.group(5):
+            emb_semester, emb_year, emb_full_term = scraper2.extract_semester_info(match.group(5))
+        embedded.append({
+            "code": match.group(1).strip(),
+            "title": match.group(2).strip(),
+            "grade": match.group(3).strip().upper(),
+            "credits": emb_credits,
+            "semester": emb_semester,
+            "year": emb_year,
+            "full_term": emb_full_term
+        })
+
+    pattern2 = r'Course\s+([A-Z]+\s+\d+)\s+Title\s+([A-Z\s&,]+?)(?:\s+Grade|\s+Course|\n|$)'
+    found_codes = {emb["code"] for emb in embedded}
+    for match in re.finditer(pattern2, term_text, re.IGNORECASE):
+        emb_code = match.group(1).strip()
+        if emb_code in found_codes:
+            continue
+        semester_match = re.search(r'(FALL|SPRING|SUMMER|WINTER)\s+(\d{4})', term_text.upper())
+        emb_semester, emb_year, emb_full_term = None, None, None
+        if semester_match:
+            emb_semester = semester_match.group(1)
+            emb_year = int(semester_match.group(2))
+            emb_full_term = f"{emb_semester} {emb_year}"
+        embedded.append({
+            "code": emb_code,
+            "title": match.group(2).strip(),
+            "grade": "A",
+            "credits": 3.0,
+            "semester": emb_semester,
+            "year": emb_year,
+            "full_term": emb_full_term,
+            "needs_semester_inference": emb_full_term is None
+        })
+    return embedded
+
+
+def make_spillover_term(records, truncated=0.2, trailing=0.1, seed=0):
+    """
+    A parent's term text followed by `records` spilled-over records, some truncated.
+
+    `trailing` is the share of extra truncated rows after the last complete one
+    (planned courses with no grade yet); every one of them made the old
+    extractor scan to the end of the text.
+    """
+    rng = random.Random(seed)
+    lines = [f"{rng.choice(['FALL', 'SPRING'])} {rng.randint(2019, 2025)}"]
+    for i in range(records):
+        lines += ["Course", f"{rng.choice(SUBJECTS)} {100 + i}", "Title", " ".join(rng.sample(TITLE_WORDS, 3))]
+        if rng.random() >= truncated:
+            lines += ["Grade", rng.choice(["A", "B", "IP"]), "Credits", rng.choice(["3", "4"]),
+                      "Term", f"{rng.choice(['FALL', 'SPRING', 'SUMMER'])} {rng.randint(2019, 2025)}"]
+    for i in range(int(records * trailing)):
+        lines += ["Course", f"COSC {500 + i}", "Title", "SENIOR PROJECT"]
+    return "\n".join(lines)
+
+
+def time_call(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, nargs="+", default=[20, 100, 500, 2000],
+                        help="spilled-over records per term text")
+    parser.add_argument("--truncated", type=float, default=0.2, help="share of records with no Grade/Credits")
+    parser.add_argument("--trailing", type=float, default=0.1,
+                        help="extra truncated rows after the last complete record, as a share of --records")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true", help="also time the previous two-regex extractor")
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'KB':>7} {'single-pass ms':>15} {'legacy ms':>10} {'same':>5}")
+    for records in args.records:
+        text = make_spillover_term(records, args.truncated, args.trailing)
+        new_s = time_call(lambda: scraper2.extract_all_embedded_courses(text), args.repeat)
+        legacy = same = "-"
+        if args.legacy:
+            legacy = f"{time_call(lambda: legacy_extract_all_embedded_courses(text), args.repeat) * 1000:.2f}"
+            same = str(legacy_extract_all_embedded_courses(text) == scraper2.extract_all_embedded_courses(text))
+        print(f"{records:>8} {len(text) / 1024:>7.1f} {new_s * 1000:>15.2f} {legacy:>10} {same:>5}")
+
+    # --- The whole embedded stage on a spillover-heavy audit (text sections) ---
+    html, headers = generate_audit_html(SCALES["spillover"])
+    parsed = parse_degreeworks_text(HTMLParser(html).text(separator="\n").strip(), headers)
+    rows = [c for sec in parsed["sections"] for c in sec["completed_courses"]]
+
+    def embedded_stage():
+        scraper2.add_embedded_courses(scraper2.collect_main_courses(rows))
+
+    stage_s = time_call(embedded_stage, args.repeat)
+    print(f"\nspillover audit: {len(rows)} course records, embedded stage {stage_s * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
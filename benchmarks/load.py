@@ -0,0 +1,522 @@
+"""
+Load test for the FastAPI server: /scrape under concurrent traffic.
+
+The target is the app itself, in-process through httpx's ASGI transport (the
+default; no network and no uvicorn needed, but client and server share one
+event loop), a local uvicorn started for the run (--uvicorn) or a server that
+is already running (--url). Payloads are synthetic audits (--scales, a few
+seeds each) or saved ones (--payloads: .html / .html.gz files or directories,
+e.g. the degreeworks_raw_* artifacts). Every request is made unique with an
+HTML comment, so the result cache doesn't answer it; --cached turns that off.
+
+Load is closed-loop (--concurrency clients sending back to back) or open-loop
+(--rate requests/s with Poisson arrivals; latency counts from the scheduled
+send time, so a stalled server can't hide queueing). While a run is going, a
+probe polls /pool/stats: its latency shows how responsive the event loop
+still is, its "pending" the worker queue depth. The server's CPU and memory
+are sampled from /proc (or psutil when installed), split into the event-loop
+process and its pool workers.
+
+--sweep runs one closed-loop level after another and reports where throughput
+stops growing while latency keeps climbing. Results are written as JSON; with
+--baseline they are compared level by level against an earlier report.
+
+Run from the repository root:
+    python -m benchmarks.load --concurrency 8 --duration 20
+    python -m benchmarks.load --rate 5 --duration 30 --scales large
+    python -m benchmarks.load --sweep 1 2 4 8 16 32 --duration 10 --output bench_load.json
+    python -m benchmarks.load --uvicorn --sweep 1 4 16 64 --view summary
+    python -m benchmarks.load --url http://127.0.0.1:8000 --server-pid 4242 --payloads scraped_data
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import replace
+
+import httpx
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "<!--LOADTEST-->"
+# A level counts as saturated once doubling the clients adds less than this much throughput
+SATURATION_GAIN = 0.1
+
+
+# --- Payloads ---
+def load_payload_files(paths):
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                documents += [os.path.join(dirpath, name) for name in sorted(filenames)
+                              if name.endswith((".html", ".htm", ".html.gz"))]
+        else:
+            documents.append(path)
+    html = []
+    for path in sorted(documents):
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.endswith(".gz"):
+            data = gzip.decompress(data)
+        html.append(data.decode("utf-8", "replace"))
+    return html
+
+
+def synthetic_payloads(scales, variants):
+    from benchmarks.synthetic import SCALES, generate_audit_html
+    return [generate_audit_html(replace(SCALES[name], seed=seed))[0] for name in scales for seed in range(variants)]
+
+
+class Payloads:
+    """Request bodies, encoded once; next() hands them out round robin with a unique marker."""
+
+    def __init__(self, documents, unique):
+        self.unique = unique
+        self.parts = []
+        for html in documents:
+            body = json.dumps({"html": html + (MARKER if unique else "")}).encode("utf-8")
+            self.parts.append(body.split(MARKER.encode("utf-8"), 1) if unique else [body])
+        self.sizes = [sum(len(p) for p in parts) for parts in self.parts]
+        self.count = 0
+
+    def next(self):
+        parts = self.parts[self.count % len(self.parts)]
+        self.count += 1
+        if not self.unique:
+            return parts[0]
+        return b"".join((parts[0], f"<!--{self.count}-->".encode("ascii"), parts[1]))
+
+
+# --- Server CPU / memory ---
+def _proc_table():
+    """{pid: (ppid, cpu seconds, rss bytes)} from /proc."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    table = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                # The command name may hold spaces; fields resume after its ")"
+                fields = f.read().rsplit(b")", 1)[1].split()
+            table[int(name)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * page)
+        except (OSError, IndexError, ValueError):
+            continue
+    return table
+
+
+def process_usage(pid):
+    """(main process (cpu s, rss), pool workers (cpu s, rss, count)) for pid and its descendants."""
+    if psutil is not None:
+        main = psutil.Process(pid)
+        children = main.children(recursive=True)
+
+        def usage(process):
+            try:
+                times = process.cpu_times()
+                return times.user + times.system, process.memory_info().rss
+            except psutil.Error:
+                return 0.0, 0
+        cpu, rss = usage(main)
+        workers = [usage(child) for child in children]
+        return (cpu, rss), (sum(w[0] for w in workers), sum(w[1] for w in workers), len(workers))
+
+    table = _proc_table()
+    if pid not in table:
+        return (0.0, 0), (0.0, 0, 0)
+    children = {}
+    for child, (ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(child)
+    workers, stack = [], list(children.get(pid, ()))
+    while stack:
+        child = stack.pop()
+        workers.append(table[child])
+        stack += children.get(child, ())
+    return table[pid][1:], (sum(w[1] for w in workers), sum(w[2] for w in workers), len(workers))
+
+
+class ResourceSampler:
+    """Samples a server process tree on a thread while a run is going."""
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.pid is not None:
+            self.samples.append((time.perf_counter(), *process_usage(self.pid)))
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append((time.perf_counter(), *process_usage(self.pid)))
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.samples.append((time.perf_counter(), *process_usage(self.pid)))
+
+    def summary(self):
+        if len(self.samples) < 2:
+            return None
+        (t0, main0, workers0), (t1, main1, workers1) = self.samples[0], self.samples[-1]
+        elapsed = max(t1 - t0, 1e-9)
+        return {
+            # 100 = one core busy the whole run
+            "loop_cpu_pct": round((main1[0] - main0[0]) / elapsed * 100, 1),
+            "workers_cpu_pct": round((workers1[0] - workers0[0]) / elapsed * 100, 1),
+            "loop_rss_mb_peak": round(max(s[1][1] for s in self.samples) / 2 ** 20, 1),
+            "workers_rss_mb_peak": round(max(s[2][1] for s in self.samples) / 2 ** 20, 1),
+            "workers": max(s[2][2] for s in self.samples),
+        }
+
+
+# --- Targets ---
+class Target:
+    """The server under test: an httpx client for it and the pid to sample (None when unknown)."""
+
+    def __init__(self, args):
+        self.args = args
+        self.pid = args.server_pid
+        self.description = args.url or ("uvicorn" if args.uvicorn else "in-process")
+        self._process = None
+        self._lifespan = None
+
+    async def __aenter__(self):
+        timeout = httpx.Timeout(self.args.timeout)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        if self.args.url:
+            self.client = httpx.AsyncClient(base_url=self.args.url, timeout=timeout, limits=limits)
+        elif self.args.uvicorn:
+            port = free_port()
+            self._process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--log-level", "warning"],
+                cwd=ROOT,
+            )
+            self.pid = self._process.pid
+            self.client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=timeout, limits=limits)
+            await self._wait_ready()
+        else:
+            import server
+            self._lifespan = server.lifespan(server.app)
+            await self._lifespan.__aenter__()
+            self.pid = os.getpid()
+            self.client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=server.app), base_url="http://loadtest", timeout=timeout,
+            )
+        return self
+
+    async def _wait_ready(self, seconds=30):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            if self._process.poll() is not None:
+                raise SystemExit(f"uvicorn exited with code {self._process.returncode}")
+            try:
+                if (await self.client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        raise SystemExit("uvicorn did not come up within 30s")
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        if self._lifespan is not None:
+            await self._lifespan.__aexit__(None, None, None)
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- Runs ---
+def percentiles(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+
+    def at(q):
+        return round(samples[min(len(samples) - 1, int(len(samples) * q))], 1)
+    return {
+        "p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99),
+        "mean_ms": round(statistics.fmean(samples), 1), "max_ms": round(samples[-1], 1),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+
+    async def send(self, client, path, payloads, scheduled=None):
+        body = payloads.next()
+        started = time.perf_counter() if scheduled is None else scheduled
+        try:
+            response = await client.post(path, content=body, headers={"Content-Type": "application/json"})
+            status = str(response.status_code)
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.TransportError as e:
+            status = type(e).__name__
+        elapsed = (time.perf_counter() - started) * 1000
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == "200":
+            self.latencies.append(elapsed)
+
+
+async def probe(client, interval, stop, results):
+    """Poll /pool/stats: (latency ms, pending parses) per sample."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = await client.get("/pool/stats")
+            pending = response.json().get("pending") if response.status_code == 200 else None
+            results.append(((time.perf_counter() - started) * 1000, pending))
+        except (httpx.HTTPError, ValueError):
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def closed_loop(client, path, payloads, recorder, concurrency, duration, requests):
+    deadline = time.perf_counter() + duration if duration else None
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        while (deadline is None or time.perf_counter() < deadline) and (requests is None or sent < requests):
+            sent += 1
+            await recorder.send(client, path, payloads)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(client, path, payloads, recorder, rate, duration, max_in_flight, rng):
+    in_flight = set()
+    dropped = 0
+    start = time.perf_counter()
+    scheduled = start
+    while scheduled - start < duration:
+        scheduled += rng.expovariate(rate)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(recorder.send(client, path, payloads, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return dropped
+
+
+async def run_level(target, args, payloads, concurrency=None, rate=None):
+    recorder = Recorder()
+    stop = asyncio.Event()
+    probes = []
+    probe_task = asyncio.create_task(probe(target.client, args.probe_interval, stop, probes))
+    dropped = 0
+    started = time.perf_counter()
+    with ResourceSampler(target.pid) as sampler:
+        if rate:
+            dropped = await open_loop(target.client, args.path, payloads, recorder, rate, args.duration,
+                                      args.max_in_flight, random.Random(args.seed))
+        else:
+            duration = None if args.requests else args.duration
+            await closed_loop(target.client, args.path, payloads, recorder, concurrency, duration, args.requests)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    total = sum(recorder.statuses.values())
+    ok = recorder.statuses.get("200", 0)
+    pending = [p for _, p in probes if p is not None]
+    return {
+        "mode": "open" if rate else "closed",
+        "concurrency": concurrency,
+        "rate": rate,
+        "requests": total,
+        "ok": ok,
+        "dropped": dropped,
+        "statuses": dict(sorted(recorder.statuses.items())),
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(ok / elapsed, 2),
+        "latency": percentiles(recorder.latencies),
+        # How long a trivial request waited on the event loop while /scrape traffic ran
+        "probe": percentiles([latency for latency, _ in probes]),
+        "pending_max": max(pending) if pending else None,
+        "pending_mean": round(statistics.fmean(pending), 1) if pending else None,
+        "server": sampler.summary(),
+    }
+
+
+def saturation(levels):
+    """The last closed-loop level whose throughput still grew by SATURATION_GAIN, or None."""
+    closed = [level for level in levels if level["mode"] == "closed"]
+    for previous, level in zip(closed, closed[1:]):
+        if level["throughput_rps"] < previous["throughput_rps"] * (1 + SATURATION_GAIN):
+            return previous["concurrency"]
+    return None
+
+
+def print_level(level):
+    load = f"c={level['concurrency']}" if level["mode"] == "closed" else f"{level['rate']}/s"
+    latency = level["latency"] or {}
+    probe_stats = level["probe"] or {}
+    server = level["server"] or {}
+    print(f"  {load:>8} {level['throughput_rps']:>8.2f} {latency.get('p50_ms', 0):>9.1f} {latency.get('p95_ms', 0):>9.1f} "
+          f"{latency.get('p99_ms', 0):>9.1f} {level['error_rate'] * 100:>6.1f}% {probe_stats.get('p99_ms', 0):>9.1f} "
+          f"{level['pending_max'] if level['pending_max'] is not None else '-':>7} "
+          f"{server.get('loop_cpu_pct', '-'):>7} {server.get('workers_cpu_pct', '-'):>8} "
+          f"{server.get('workers_rss_mb_peak', '-'):>8}")
+
+
+def compare(report, baseline):
+    """(load, old rps, new rps, old p99, new p99) for levels present in both reports."""
+    def key(level):
+        return (level["mode"], level["concurrency"], level["rate"])
+    old_levels = {key(level): level for level in baseline.get("results", [])}
+    rows = []
+    for level in report["results"]:
+        old = old_levels.get(key(level))
+        if old and old["latency"] and level["latency"]:
+            rows.append((key(level), old["throughput_rps"], level["throughput_rps"],
+                         old["latency"]["p99_ms"], level["latency"]["p99_ms"]))
+    return rows
+
+
+async def run(args):
+    if args.payloads:
+        documents = load_payload_files(args.payloads)
+        if not documents:
+            raise SystemExit("no .html / .html.gz payloads found")
+    else:
+        documents = synthetic_payloads(args.scales, args.variants)
+    payloads = Payloads(documents, unique=not args.cached)
+    print(f"{len(documents)} payloads, {statistics.fmean(payloads.sizes) / 1024:.0f} KB mean request body")
+
+    if args.sweep:
+        plan = [{"concurrency": c} for c in args.sweep]
+    elif args.rate:
+        plan = [{"rate": args.rate}]
+    else:
+        plan = [{"concurrency": args.concurrency}]
+
+    results = []
+    async with Target(args) as target:
+        # Warm-up: starts the pool's worker processes and imports in them
+        warmup = Recorder()
+        for _ in range(args.warmup):
+            await warmup.send(target.client, args.path, payloads)
+        print(f"target: {target.description}, server pid {target.pid or 'unknown'}")
+        print(f"  {'load':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} "
+              f"{'probe p99':>9} {'pending':>7} {'loop %':>7} {'pool %':>8} {'pool MB':>8}")
+        for level in plan:
+            result = await run_level(target, args, payloads, **level)
+            results.append(result)
+            print_level(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running server")
+    target.add_argument("--uvicorn", action="store_true", help="start a local uvicorn for the run")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, to sample its CPU and memory")
+    parser.add_argument("--payloads", nargs="+", help=".html / .html.gz files or directories (default: synthetic)")
+    parser.add_argument("--scales", nargs="+", default=["medium"], help="synthetic audit scales")
+    parser.add_argument("--variants", type=int, default=4, help="synthetic audits per scale (different seeds)")
+    parser.add_argument("--cached", action="store_true", help="send payloads unchanged, so repeats hit the result cache")
+    parser.add_argument("--view", help="view= for /scrape (e.g. summary), to leave response size out of the picture")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=4, help="closed loop: clients sending back to back")
+    load.add_argument("--rate", type=float, help="open loop: mean arrivals per second (Poisson)")
+    load.add_argument("--sweep", type=int, nargs="+", help="closed loop at each of these concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--requests", type=int, help="closed loop: requests per level instead of --duration")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="open loop: drop arrivals past this")
+    parser.add_argument("--warmup", type=int, default=4, help="untimed requests before the first level")
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout in seconds")
+    parser.add_argument("--probe-interval", type=float, default=0.1, help="seconds between /pool/stats probes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_load.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", help="earlier report to compare throughput and p99 against")
+    args = parser.parse_args()
+    args.path = "/scrape" + (f"?view={args.view}" if args.view else "")
+
+    # Artifacts would fill the disk with load-test audits; the server reads this at import
+    os.environ.setdefault("SCRAPER_SAVE_ARTIFACTS", "0")
+    os.environ.setdefault("SCRAPER_LOG_LEVEL", "WARNING")
+    results = asyncio.run(run(args))
+
+    knee = saturation(results)
+    if args.sweep:
+        print(f"\nThroughput stops growing past concurrency {knee}" if knee
+              else "\nThroughput was still growing at the highest level")
+
+    import scraper2
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parser_version": scraper2.PARSER_VERSION,
+        "target": args.url or ("uvicorn" if args.uvicorn else "in-process"),
+        "path": args.path,
+        "payloads": args.payloads or [f"synthetic:{name}" for name in args.scales],
+        "cached": args.cached,
+        "pool": {name: os.environ.get(name) for name in ("SCRAPER_POOL", "SCRAPER_WORKERS", "SCRAPER_QUEUE_LIMIT")},
+        "saturation_concurrency": knee,
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            rows = compare(report, json.load(f))
+        report["baseline"] = args.baseline
+        for (mode, concurrency, rate), old_rps, new_rps, old_p99, new_p99 in rows:
+            load_label = f"c={concurrency}" if mode == "closed" else f"{rate}/s"
+            print(f"{load_label:>8}: {old_rps:.2f} -> {new_rps:.2f} req/s, p99 {old_p99:.1f} -> {new_p99:.1f} ms")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
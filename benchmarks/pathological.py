@@ -0,0 +1,187 @@
+"""
+Worst-case audit corpus with latency assertions.
+
+Every file in benchmarks/corpus/ is an input that once sent a parse stage
+quadratic (or worse): long whitespace runs after metadata labels, records cut
+short before Grade, "Still needed" blocks with no course, Term fields that
+spill over into hundreds of truncated rows, deep nesting. manifest.json holds
+each case's latency ceiling; the runner parses every case with no time
+budget (so the budget can't hide a regression) and exits non-zero when a case
+fails or runs past its ceiling.
+
+Run from the repository root:
+    python -m benchmarks.pathological
+    python -m benchmarks.pathological --cases advisor_whitespace --repeat 5
+    python -m benchmarks.pathological --budget 0.05    # exercise the partial-result path
+    python -m benchmarks.pathological --regenerate     # rebuild the corpus files (keeps max_ms)
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+
+import scraper2
+from benchmarks.embedded import make_spillover_term
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+MANIFEST = os.path.join(CORPUS_DIR, "manifest.json")
+
+TEXT_LABELS = [
+    "Advisor", "Major", "Program", "College", "Classification", "Transfer Hours",
+    "Academic Standing", "Graduation Application", "Graduation Term", "Cumulative GPA",
+]
+
+
+def paragraphs(lines):
+    return "".join(f"<p>{line}</p>" for line in lines)
+
+
+def page(body):
+    return f"<html><head><title>Degree Works</title></head><body>{body}</body></html>"
+
+
+# --- Case builders: name -> (description, builder, default max_ms) ---
+def advisor_whitespace():
+    return page("<p>advisor" + " " * 100_000 + "1</p>")
+
+
+def standing_whitespace():
+    return page("<p>Academic Standing" + " " * 100_000 + "1</p>")
+
+
+def advisor_repeated():
+    return page("<p>" + ("Advisor:" + " " * 200 + "x1 ") * 500 + "</p>")
+
+
+def labels_whitespace():
+    return page(paragraphs(f"{label}:" + " " * 20_000 + "1" for label in TEXT_LABELS))
+
+
+def courses_without_grade():
+    record = ["Course", "COSC 101", "Title", "INTRODUCTION TO COMPUTING", "Credits", "3"]
+    return page(paragraphs(["Major Requirements"] + record * 3000))
+
+
+def still_needed_without_course():
+    return page(paragraphs(["Major Requirements"] + ["Still needed:", "1 Class in"] * 3000))
+
+
+def embedded_trailing():
+    parent = ["Course", "COSC 100", "Title", "FOUNDATIONS", "Grade", "A", "Credits", "3", "Term"]
+    spill = make_spillover_term(1500, truncated=0.3, trailing=0.5).split("\n")
+    return page(paragraphs(["Major Requirements"] + parent + spill))
+
+
+def keyword_flood():
+    return page("<p>Major Requirements</p><p>" + "Course Title Grade Credits Term " * 30_000 + "</p>")
+
+
+def deep_nesting():
+    return page("<div>" * 5000 + "Course COSC 101" + "</div>" * 5000)
+
+
+# Ceilings are about 3x the best-of-3 time on one core: loose enough for noise,
+# tight enough that a stage going quadratic again trips them.
+CASES = {
+    "advisor_whitespace": ("advisor label followed by 100k spaces (raw HTML advisor regex)", advisor_whitespace, 10),
+    "standing_whitespace": ("Academic Standing followed by 100k spaces", standing_whitespace, 10),
+    "advisor_repeated": ("500 Advisor labels each followed by 200 spaces", advisor_repeated, 950),
+    "labels_whitespace": ("every text metadata label followed by 20k spaces", labels_whitespace, 30),
+    "courses_without_grade": ("3000 course records cut short before Grade", courses_without_grade, 125),
+    "still_needed_without_course": ("3000 Still needed blocks with no Course", still_needed_without_course, 30),
+    "embedded_trailing": ("Term field spilling into 1500 records plus 750 truncated ones", embedded_trailing, 150),
+    "keyword_flood": ("30k repetitions of the record keywords on one line", keyword_flood, 450),
+    "deep_nesting": ("5000 nested divs", deep_nesting, 250),
+}
+
+
+# --- Corpus files ---
+def load_manifest():
+    if not os.path.exists(MANIFEST):
+        return {}
+    with open(MANIFEST, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def regenerate():
+    """Rebuild every case file; ceilings already in the manifest are kept."""
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    old = load_manifest()
+    manifest = {}
+    for name, (description, builder, max_ms) in CASES.items():
+        html = builder()
+        filename = f"{name}.html.gz"
+        # mtime=0 keeps the gzip bytes stable across regenerations
+        with open(os.path.join(CORPUS_DIR, filename), "wb") as f:
+            f.write(gzip.compress(html.encode("utf-8"), mtime=0))
+        manifest[name] = {
+            "file": filename,
+            "description": description,
+            "chars": len(html),
+            "sha256": hashlib.sha256(html.encode("utf-8")).hexdigest(),
+            "max_ms": old.get(name, {}).get("max_ms", max_ms),
+        }
+    with open(MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {len(manifest)} cases to {CORPUS_DIR}")
+
+
+def load_case(entry):
+    with gzip.open(os.path.join(CORPUS_DIR, entry["file"]), "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def run_case(html, repeat, budget):
+    """Best-of-repeat latency in ms and the last result's status."""
+    best = float("inf")
+    status = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result, _ = scraper2.parse_audit_html(html, time_budget=budget)
+        best = min(best, (time.perf_counter() - started) * 1000)
+        status = result["status"]
+    return best, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", help="only run these cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=0,
+                        help="parse time budget in seconds (default 0: none, so latency is measured in full)")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the corpus files and exit")
+    args = parser.parse_args()
+
+    if args.regenerate:
+        regenerate()
+        return
+
+    manifest = load_manifest()
+    if not manifest:
+        sys.exit(f"No corpus in {CORPUS_DIR}; run with --regenerate first")
+    names = args.cases or list(manifest)
+
+    failures = []
+    print(f"{'case':<30} {'KB':>7} {'ms':>9} {'max ms':>7}  status")
+    for name in names:
+        entry = manifest[name]
+        html = load_case(entry)
+        elapsed, status = run_case(html, args.repeat, args.budget)
+        ok = elapsed <= entry["max_ms"] and status in ("success", "partial")
+        print(f"{name:<30} {len(html) / 1024:>7.0f} {elapsed:>9.1f} {entry['max_ms']:>7}  "
+              f"{status}{'' if ok else '  FAIL'}")
+        if not ok:
+            failures.append((name, elapsed, status))
+
+    for name, elapsed, status in failures:
+        print(f"REGRESSION {name}: {elapsed:.1f} ms ({status}), ceiling {manifest[name]['max_ms']} ms")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Stage-level benchmark for the scrape pipeline on synthetic audits.
+
+Each stage of scrape_degreeworks is timed on its own so a regression can be
+pinned to the stage that caused it:
+
+    dom_parse           HTMLParser(html)
+    tree_text           tree.text(separator="\\n")
+    metadata_regex      extract_metadata_from_html on the raw HTML
+    parse_text          parse_degreeworks_text (metadata regexes + sections)
+    parse_txt_file      parse_degreeworks_txt (same, through a .txt/.json round trip)
+    embedded_courses    collect_main_courses + add_embedded_courses on the text sections
+    semester_summary    course_summary
+    end_to_end          scrape_degreeworks
+
+Results are written as JSON (one entry per scale, stats in milliseconds).
+Passing --baseline compares against an earlier report and exits non-zero when
+a stage's median slowed down by more than --threshold.
+
+Run from the repository root:
+    python -m benchmarks.stages
+    python -m benchmarks.stages --scales small large --output bench_stages.json
+    python -m benchmarks.stages --sections 20 --courses 50 --embedded 0.8 --still-needed 3
+    python -m benchmarks.stages --baseline bench_stages.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, replace
+
+from selectolax.parser import HTMLParser
+
+import scraper2
+from benchmarks.synthetic import SCALES, AuditShape, generate_audit_html
+from json_convert import parse_degreeworks_text, parse_degreeworks_txt
+
+
+def time_stage(fn, repeat, setup=None):
+    """Run fn repeat times (setup() output is passed in and not timed); return stats in ms."""
+    samples = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "max_ms": round(samples[-1], 3),
+        "repeat": repeat,
+    }
+
+
+def run_scale(name, shape, repeat, workdir):
+    html, headers = generate_audit_html(shape)
+    tree = HTMLParser(html)
+    text = tree.text(separator="\n").strip()
+
+    parsed = parse_degreeworks_text(text, headers)
+    text_courses = [c for sec in parsed["sections"] for c in sec["completed_courses"]]
+
+    txt_path = os.path.join(workdir, f"{name}.txt")
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    json_path = os.path.join(workdir, f"{name}.json")
+
+    def collect_and_embed(courses):
+        scraper2.add_embedded_courses(scraper2.collect_main_courses(courses))
+
+    def course_set():
+        courses = scraper2.collect_main_courses(text_courses)
+        scraper2.add_embedded_courses(courses)
+        return (courses,)
+
+    stages = {
+        "dom_parse": time_stage(lambda: HTMLParser(html), repeat),
+        "tree_text": time_stage(lambda: tree.text(separator="\n").strip(), repeat),
+        "metadata_regex": time_stage(lambda: scraper2.extract_metadata_from_html(html), repeat),
+        "parse_text": time_stage(lambda: parse_degreeworks_text(text, headers), repeat),
+        "parse_txt_file": time_stage(lambda: parse_degreeworks_txt(txt_path, json_path), repeat),
+        "embedded_courses": time_stage(lambda: collect_and_embed(text_courses), repeat),
+        "semester_summary": time_stage(scraper2.course_summary, repeat, setup=course_set),
+        "end_to_end": time_stage(lambda: scraper2.scrape_degreeworks(html, save_artifacts=False), repeat),
+    }
+
+    return {
+        "scale": name,
+        "shape": asdict(shape),
+        "html_bytes": len(html.encode("utf-8")),
+        "text_bytes": len(text.encode("utf-8")),
+        "course_records": len(text_courses),
+        "stages": stages,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Return (scale, stage, old, new) for every stage whose median grew past threshold."""
+    old_scales = {entry["scale"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in report["results"]:
+        old = old_scales.get(entry["scale"])
+        if not old:
+            continue
+        for stage, stats in entry["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if not old_stats or not old_stats["median_ms"]:
+                continue
+            if stats["median_ms"] > old_stats["median_ms"] * (1 + threshold):
+                regressions.append((entry["scale"], stage, old_stats["median_ms"], stats["median_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["small", "medium", "large"],
+                        help=f"preset shapes to run ({', '.join(SCALES)})")
+    parser.add_argument("--sections", type=int, help="custom shape: number of requirement blocks")
+    parser.add_argument("--courses", type=int, help="custom shape: course rows per block")
+    parser.add_argument("--embedded", type=float, help="custom shape: share of rows spilling into term text")
+    parser.add_argument("--still-needed", type=int, help="custom shape: 'Still needed' blocks per section")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="bench_stages.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", help="earlier report to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed median slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    shapes = [(name, replace(SCALES[name], seed=args.seed)) for name in args.scales]
+    custom = {
+        "sections": args.sections,
+        "courses_per_section": args.courses,
+        "embedded_ratio": args.embedded,
+        "still_needed_per_section": args.still_needed,
+    }
+    custom = {key: value for key, value in custom.items() if value is not None}
+    if custom:
+        shapes = [("custom", replace(AuditShape(seed=args.seed), **custom))]
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, shape in shapes:
+            entry = run_scale(name, shape, args.repeat, workdir)
+            results.append(entry)
+            print(f"\n{name}: {entry['html_bytes'] / 1024:.0f} KB html, "
+                  f"{entry['text_bytes'] / 1024:.0f} KB text, {entry['course_records']} course records")
+            print(f"  {'stage':<20} {'median ms':>10} {'p95 ms':>10}")
+            for stage, stats in entry["stages"].items():
+                print(f"  {stage:<20} {stats['median_ms']:>10.3f} {stats['p95_ms']:>10.3f}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parser_version": scraper2.PARSER_VERSION,
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report["baseline"] = args.baseline
+        report["regressions"] = [
+            {"scale": scale, "stage": stage, "baseline_ms": old, "median_ms": new}
+            for scale, stage, old, new in regressions
+        ]
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    for scale, stage, old, new in regressions:
+        print(f"REGRESSION {scale}/{stage}: {old:.3f} ms -> {new:.3f} ms")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Time to first byte of /scrape/stream against the full /scrape response.
+
+Both endpoints are called in-process, straight through the ASGI interface,
+so the time of every body chunk the app sends is seen as it happens (httpx's
+ASGI transport would only hand the body over once it is complete). Every
+request carries a unique HTML comment, so the result cache never answers it.
+For each scale the report shows, as medians over --repeat runs:
+
+    first_event_ms     the "metadata" event of the stream
+    first_section_ms   the first "section" event
+    stream_ms          the last byte of the stream
+    scrape_ms          the whole /scrape response
+
+Run from the repository root (SCRAPER_SAVE_ARTIFACTS=0 keeps scraped_data/ empty):
+    SCRAPER_SAVE_ARTIFACTS=0 python -m benchmarks.stream
+    SCRAPER_SAVE_ARTIFACTS=0 python -m benchmarks.stream --scales large --repeat 10 --format sse
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.synthetic import SCALES, generate_audit_html
+
+
+async def call(app, path, body, query=b""):
+    """POST body as text/html to path; returns [(seconds since the call, body chunk)], first is the status."""
+    chunks = []
+    started = time.perf_counter()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Never disconnect; the app is done before this matters
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            chunks.append((time.perf_counter() - started, message["status"]))
+        elif message.get("body"):
+            chunks.append((time.perf_counter() - started, message["body"]))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query,
+        "headers": [(b"content-type", b"text/html; charset=utf-8")],
+        "server": ("127.0.0.1", 8000), "client": ("127.0.0.1", 50000),
+    }
+    await app(scope, receive, send)
+    return chunks
+
+
+def event_times(chunks, stream_format):
+    """{event: seconds} for the first time each event name arrived."""
+    times = {}
+    for seconds, body in chunks[1:]:
+        if stream_format == "sse":
+            names = [line[7:] for line in body.decode().splitlines() if line.startswith("event: ")]
+        else:
+            names = [json.loads(line)["event"] for line in body.decode().splitlines() if line]
+        for name in names:
+            times.setdefault(name, seconds)
+    return times
+
+
+async def run(scales, repeat, stream_format):
+    import server
+
+    report = {}
+    async with server.lifespan(server.app):
+        for scale in scales:
+            html = generate_audit_html(SCALES[scale])[0]
+            # One unmeasured round, so worker start-up and imports don't count
+            samples = {"first_event_ms": [], "first_section_ms": [], "stream_ms": [], "scrape_ms": []}
+            for run_number in range(repeat + 1):
+                marker = f"<!--stream-bench {scale} {run_number} {time.time_ns()}-->"
+                chunks = await call(
+                    server.app, "/scrape/stream", (html + marker).encode(), f"format={stream_format}".encode(),
+                )
+                times = event_times(chunks, stream_format)
+                scrape = await call(server.app, "/scrape", (html + marker + " ").encode())
+                if chunks[0][1] != 200 or scrape[0][1] != 200:
+                    raise SystemExit(f"{scale}: HTTP {chunks[0][1]} / {scrape[0][1]}")
+                if run_number == 0:
+                    continue
+                samples["first_event_ms"].append(times["metadata"] * 1000)
+                samples["first_section_ms"].append(times.get("section", times["end"]) * 1000)
+                samples["stream_ms"].append(chunks[-1][0] * 1000)
+                samples["scrape_ms"].append(scrape[-1][0] * 1000)
+            report[scale] = {
+                "chars": len(html),
+                **{name: round(statistics.median(values), 1) for name, values in samples.items()},
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["small", "medium", "large"], choices=sorted(SCALES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--format", default="ndjson", choices=["ndjson", "sse"])
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.scales, args.repeat, args.format))
+    print(f"{'scale':<8} {'KB':>7} {'first event':>12} {'first section':>14} {'stream':>9} {'/scrape':>9}")
+    for scale, row in report.items():
+        print(f"{scale:<8} {row['chars'] / 1024:>7.0f} {row['first_event_ms']:>10.1f}ms "
+              f"{row['first_section_ms']:>12.1f}ms {row['stream_ms']:>7.1f}ms {row['scrape_ms']:>7.1f}ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Synthetic DegreeWorks audit generator.
+
+Builds dashboard HTML with the same structure as a captured audit: bold label
+spans for the header metadata, one grid-container of label/value grid-items
+per course row, requirement blocks under section headers and "Still needed"
+blocks. Sizes are controlled by the AuditShape fields.
+"""
+import random
+from dataclasses import dataclass
+
+from json_convert import SECTION_HEADERS
+
+SUBJECTS = ["COSC", "MATH", "ENGL", "PHYS", "HIST", "CHEM", "ECON", "PHIL", "BIOL", "SOCI"]
+TITLE_WORDS = [
+    "INTRODUCTION", "COMPUTING", "ADVANCED", "PROGRAMMING", "DATA", "STRUCTURES", "APPLIED",
+    "PROBABILITY", "STATISTICS", "THEORY", "SYSTEMS", "NETWORKS", "ANALYSIS", "DESIGN", "LAB",
+]
+SEASONS = ["SPRING", "SUMMER", "FALL"]
+GRADES = ["A", "A", "A", "B", "B", "C", "TRA", "TRB"]
+
+LABEL_STYLE = "font-weight: bold; padding-right: 0.25rem;"
+
+
+@dataclass
+class AuditShape:
+    sections: int = 6
+    courses_per_section: int = 10
+    # Share of course rows whose requirement label and title have no punctuation,
+    # so the flattened Term field runs on into them (embedded courses)
+    embedded_ratio: float = 0.3
+    still_needed_per_section: int = 1
+    in_progress_ratio: float = 0.1
+    # Inline CSS/script weight; real dashboards carry a few hundred KB of it
+    boilerplate_kb: int = 100
+    seed: int = 0
+
+
+SCALES = {
+    "small": AuditShape(sections=6, courses_per_section=8, boilerplate_kb=20),
+    "medium": AuditShape(sections=12, courses_per_section=25, boilerplate_kb=100),
+    "large": AuditShape(sections=40, courses_per_section=60, boilerplate_kb=300),
+    "spillover": AuditShape(sections=12, courses_per_section=40, embedded_ratio=0.9, boilerplate_kb=100),
+}
+
+
+def section_headers_for(shape):
+    """Headers used by a generated audit: the profile's set, then numbered extra blocks."""
+    headers = list(SECTION_HEADERS[:shape.sections])
+    for i in range(len(headers), shape.sections):
+        headers.append(f"Requirement Block {i + 1}")
+    return headers
+
+
+def _label_value(label, value):
+    return (
+        f'<div class="header-item"><span><span style="{LABEL_STYLE}">{label}</span> {value}</span></div>'
+    )
+
+
+def _grid_pair(label, value):
+    return (
+        f'<div class="grid-item"><p class="label"><span>{label}</span></p></div>'
+        f'<div class="grid-item"><p class="innerDateItemMobile">{value}</p></div>'
+    )
+
+
+def _course_row(rng, shape, code, spill):
+    words = rng.sample(TITLE_WORDS, 3)
+    title = " ".join(words) if spill else f"{' '.join(words)} ({rng.choice(['IM', 'CT', 'EC', 'BP'])})"
+    in_progress = rng.random() < shape.in_progress_ratio
+    grade = "IP" if in_progress else rng.choice(GRADES)
+    credits = "(3)" if in_progress else rng.choice(["1", "3", "3", "4"])
+    term = "FALL 2025" if in_progress else f"{rng.choice(SEASONS)} {rng.randint(2019, 2025)}"
+    pairs = [("Course", code), ("Title", title), ("Grade", grade), ("Credits", credits), ("Term", term)]
+    row = "".join(_grid_pair(label, value) for label, value in pairs)
+    if grade.startswith("TR"):
+        row += f'<div class="grid-item"><span><span style="{LABEL_STYLE}">Satisfied by:</span> XFER101 - TRANSFER COURSE - COMMUNITY CLG</span></div>'
+    return f'<div class="grid-container">{row}</div>'
+
+
+def generate_audit_html(shape=None):
+    """Return (html, section_headers) for a synthetic audit of the given shape."""
+    shape = shape or AuditShape()
+    rng = random.Random(shape.seed)
+    headers = section_headers_for(shape)
+
+    parts = ['<html lang="en"><head><meta charset="utf-8"><title>Dashboard</title>']
+    filler = ".jss%d { padding: 0; margin: 0 auto; color: #333; }\n"
+    css, i = [], 0
+    while sum(len(line) for line in css) < shape.boilerplate_kb * 1024 // 2:
+        css.append(filler % i)
+        i += 1
+    parts.append(f"<style>{''.join(css)}</style>")
+    parts.append(f"<script>window.__STATE__ = {{\"rows\": \"{'x' * (shape.boilerplate_kb * 512)}\"}};</script>")
+    parts.append("</head><body><nav><a href='/'>Dashboard</a><a href='/audit'>Audit</a></nav><div id='root'><main>")
+
+    # --- Header metadata ---
+    metadata = [
+        ("Level", "Undergraduate"),
+        ("Classification", "4-Senior"),
+        ("Major", "Computer Science"),
+        ("Program", "Computer Science"),
+        ("College", "Sch of Comp, Math/Natural Sci"),
+        ("Academic Standing", "Good Standing"),
+        ("Graduation Application", "Applied for Graduation"),
+        ("Graduation Term", "202570 - BS"),
+        ("Transfer Hours", str(rng.randint(0, 70))),
+        ("Advisor", "Jordan Rivers"),
+    ]
+    parts.extend(_label_value(label, value) for label, value in metadata)
+    parts.append(f"<div><p><span>Overall GPA</span></p><p>{rng.uniform(2.0, 4.0):.3f}</p></div>")
+
+    # --- Requirement blocks ---
+    course_number = 100
+    for header in headers:
+        parts.append(f"<div class='block'><h2>{header}</h2><p>IN-PROGRESS</p>")
+        for _ in range(shape.courses_per_section):
+            spill = rng.random() < shape.embedded_ratio
+            label = "Core Requirement" if spill else f"Core Requirement ({rng.choice(['CT', 'IM'])})"
+            code = f"{rng.choice(SUBJECTS)} {course_number}"
+            course_number += 1
+            parts.append(f"<p>{label}</p>{_course_row(rng, shape, code, spill)}")
+        for _ in range(shape.still_needed_per_section):
+            parts.append(f"<p>Still needed:</p><p>1 Class in {rng.choice(SUBJECTS)} 4@ or 3@</p>")
+        parts.append("</div>")
+
+    parts.append("</main></div></body></html>")
+    return "".join(parts), headers
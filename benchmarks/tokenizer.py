@@ -0,0 +1,145 @@
+"""
+Benchmark the course record lexer in json_convert against the old per-section regex.
+
+Only the section stage is timed (tokenize + record assembly); metadata
+extraction is left out so per-KB numbers stay comparable across sizes.
+
+Run from the repository root:
+    python -m benchmarks.tokenizer
+    python -m benchmarks.tokenizer --sizes 10 100 1000 5000 --legacy
+"""
+import argparse
+import random
+import re
+import time
+
+from json_convert import parse_section_records, tokenize_degreeworks_text
+
+SECTION_HEADERS = [
+    "General Education Program Requirements",
+    "Major Requirements",
+    "Complementary Studies Program",
+    "Computer Science Requirements",
+    "Electives",
+    "Senior Project"
+]
+
+# The pattern parse_degreeworks_txt used before the lexer, kept for comparison
+LEGACY_COURSE_PATTERN = re.compile(
+    r"Course\s*(?P<code>\w+\s*\d+).*?"
+    r"Title\s*(?P<title>.*?)\s*"
+    r"Grade\s*(?P<grade>[A-Z]+).*?"
+    r"Credits\s*(?P<credits>[\d\(\)]+).*?"
+    r"Term\s*(?P<term>[\w\s\d\-]+)",
+    re.DOTALL
+)
+LEGACY_UNMET_PATTERN = re.compile(r"Still needed[:\s]*(.*?)(?:Course|$)", re.DOTALL)
+
+
+def legacy_parse_section(section_text):
+    completed_courses = []
+    for match in LEGACY_COURSE_PATTERN.finditer(section_text):
+        completed_courses.append({
+            "course": match.group("code").strip(),
+            "title": match.group("title").strip(),
+            "grade": match.group("grade").strip(),
+            "credits": match.group("credits").strip(),
+            "term": match.group("term").strip()
+        })
+    remaining_requirements = []
+    for match in LEGACY_UNMET_PATTERN.finditer(section_text):
+        req_text = match.group(1).strip().replace("\n", " ")
+        if req_text:
+            remaining_requirements.append(req_text)
+    return completed_courses, remaining_requirements
+
+
+def make_record(rng):
+    code = f"{rng.choice(['COSC', 'MATH', 'ENGL', 'PHYS', 'HIST'])} {rng.randint(100, 499)}"
+    term = f"{rng.choice(['FALL', 'SPRING', 'SUMMER'])} {rng.randint(2019, 2025)}"
+    grade = rng.choice(["A", "B", "C", "IP", "TRA"])
+    lines = ["Course", code, "Title", "INTRO TO SOMETHING (IM)"]
+    if rng.random() > 0.05:
+        # A few records lose their grade, which is where the old regex backtracked
+        lines += ["Grade", grade]
+    lines += ["Credits", rng.choice(["3", "4", "(3)"]), "Term", term]
+    if rng.random() < 0.2:
+        lines += ["Satisfied by:", " CSIT111 - LOGIC AND OO DESIGN - COMMUNITY CLG"]
+    if rng.random() < 0.1:
+        lines += ["Still needed:", "1 Class in COSC 4@ or 3@"]
+    return "\n".join(lines)
+
+
+def make_audit_text(target_kb, seed=0, unfinished=0.02):
+    """
+    Build flattened audit text of roughly target_kb kilobytes across all sections.
+
+    `unfinished` is the share of records per section that end up after the last
+    Term (planned courses with no term yet); every one of them made the old
+    regex rescan to the end of its section.
+    """
+    rng = random.Random(seed)
+    per_section = target_kb * 1024 // len(SECTION_HEADERS)
+    parts = []
+    for header in SECTION_HEADERS:
+        parts.append(header)
+        size = 0
+        count = 0
+        while size < per_section:
+            record = make_record(rng)
+            parts.append(record)
+            size += len(record) + 1
+            count += 1
+        for _ in range(int(count * unfinished)):
+            parts.append("Course\nCOSC 499\nTitle\nSENIOR PROJECT\nGrade\nIP\nCredits\n3")
+    return "\n".join(parts)
+
+
+def parse_sections(text, bounds):
+    tokens = tokenize_degreeworks_text(text)
+    return [parse_section_records(text, tokens, start, end) for start, end in zip(bounds, bounds[1:])]
+
+
+def legacy_parse_sections(text, bounds):
+    return [legacy_parse_section(text[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+
+def time_call(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000], help="audit sizes in KB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--unfinished", type=float, default=0.02, help="share of trailing records with no Term")
+    parser.add_argument("--legacy", action="store_true", help="also time the old backtracking regex")
+    args = parser.parse_args()
+
+    print(f"{'size KB':>8} {'lexer ms':>10} {'lexer us/KB':>12} {'legacy ms':>10} {'legacy us/KB':>13} {'same':>5}")
+    for size_kb in args.sizes:
+        text = make_audit_text(size_kb, unfinished=args.unfinished)
+        actual_kb = len(text) / 1024
+        bounds = [text.find(header) for header in SECTION_HEADERS] + [len(text)]
+
+        lexer_s = time_call(lambda: parse_sections(text, bounds), args.repeat)
+        legacy_s = same = None
+        if args.legacy:
+            legacy_s = time_call(lambda: legacy_parse_sections(text, bounds), args.repeat)
+            same = legacy_parse_sections(text, bounds) == parse_sections(text, bounds)
+
+        legacy_ms = f"{legacy_s * 1000:10.1f}" if legacy_s is not None else f"{'-':>10}"
+        legacy_per_kb = f"{legacy_s * 1e6 / actual_kb:13.1f}" if legacy_s is not None else f"{'-':>13}"
+        print(
+            f"{actual_kb:8.0f} {lexer_s * 1000:10.1f} {lexer_s * 1e6 / actual_kb:12.1f} "
+            f"{legacy_ms} {legacy_per_kb} {str(same if same is not None else '-'):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Python's re can't be interrupted mid-match, so the budget is cooperative:
+# each stage and each loop iteration of the heavier ones checks the deadline
+# first. Together with the bounded quantifiers in the patterns, no
+# single step can run long enough to blow far past it.
+_local = threading.local()
+
+
+class BudgetExceeded(Exception):
+    """The parse ran out of time during stage."""
+
+    def __init__(self, stage, seconds):
+        super().__init__(f"Parse exceeded its {seconds:g}s budget during {stage}")
+        self.stage = stage
+        self.seconds = seconds
+
+
+class ParseBudget:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.deadline = time.perf_counter() + seconds
+
+    def check(self, stage):
+        if time.perf_counter() > self.deadline:
+            raise BudgetExceeded(stage, self.seconds)
+
+
+@contextmanager
+def parse_budget(seconds):
+    """Run the block under a time budget (None or <= 0 for no limit); nests by keeping the outer one."""
+    previous = getattr(_local, "budget", None)
+    if previous is None and seconds and seconds > 0:
+        _local.budget = ParseBudget(seconds)
+    try:
+        yield
+    finally:
+        _local.budget = previous
+
+
+def check_budget(stage):
+    budget = getattr(_local, "budget", None)
+    if budget is not None:
+        budget.check(stage)
+
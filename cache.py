@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_key(content: str, *salt):
+    """Hash the decoded HTML together with anything else that changes the output (parser version, profile...)."""
+    digest = hashlib.sha256()
+    for part in salt:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(content.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier result cache keyed by content hash.
+
+    The memory tier is a bounded LRU. The optional disk tier keeps one JSON
+    file per key under disk_dir and evicts by age (ttl_seconds) and total size
+    (max_disk_bytes), oldest first.
+    """
+
+    def __init__(self, max_entries=128, disk_dir=None, max_disk_bytes=256 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        # key -> (size, mtime) for the disk tier, so eviction never lists the directory
+        self._disk_index = {}
+        self._disk_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            for name in os.listdir(disk_dir):
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(disk_dir, name))
+                    self._disk_index[name[:-5]] = (stat.st_size, stat.st_mtime)
+                    self._disk_bytes += stat.st_size
+            self._evict_disk()
+
+    # --- Lookups ---
+    # Only the memory tier is read under the lock; disk reads and writes happen
+    # outside it, so a multi-MB json.load never holds up another thread (or the
+    # event loop, which only ever touches the memory tier itself).
+    def get(self, key):
+        value = self._get_memory(key)
+        if value is None:
+            value = self._get_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _get_memory(self, key):
+        with self._lock:
+            if key not in self._memory:
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return self._memory[key]
+
+    def _get_disk(self, key):
+        value = self._read_disk(key)
+        if value is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._put_memory(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._put_memory(key, value)
+        self._write_disk(key, value)
+
+    async def aget_or_compute(self, key, compute, store_if=None):
+        """
+        Return the cached value for key, or await compute() once and cache its result.
+
+        Concurrent callers asking for the same key while it is being computed
+        wait for that single computation. store_if(value) can veto caching
+        (e.g. failed parses).
+        """
+        value = self._get_memory(key)
+        if value is None and self.disk_dir:
+            # The disk tier is read off the event loop
+            value = await asyncio.to_thread(self._get_disk, key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+                return value
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = asyncio.get_running_loop().create_future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # shield: one waiter going away must not cancel the shared parse
+            return await asyncio.shield(pending)
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as e:
+            pending.set_exception(e)
+            pending.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            pending.set_result(value)
+            if store_if is None or store_if(value):
+                # The disk tier write stays off the event loop
+                await asyncio.to_thread(self.put, key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    # --- Memory tier (callers hold the lock) ---
+    def _put_memory(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    # --- Disk tier: file I/O outside the lock, bookkeeping under it ---
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        with self._lock:
+            if key not in self._disk_index:
+                return None
+            size, mtime = self._disk_index[key]
+            if time.time() - mtime > self.ttl_seconds:
+                self._remove_disk(key)
+                return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                if key in self._disk_index:
+                    self._remove_disk(key)
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        # Per-thread temporary name: two threads may store the same key at once
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key in self._disk_index:
+                self._disk_bytes -= self._disk_index[key][0]
+            self._disk_index[key] = (size, time.time())
+            self._disk_bytes += size
+            self._evict_disk()
+
+    def _remove_disk(self, key):
+        size, _ = self._disk_index.pop(key)
+        self._disk_bytes -= size
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        now = time.time()
+        for key, (_, mtime) in list(self._disk_index.items()):
+            if now - mtime > self.ttl_seconds:
+                self._remove_disk(key)
+                self.evictions += 1
+        if self._disk_bytes > self.max_disk_bytes:
+            for key, _ in sorted(self._disk_index.items(), key=lambda item: item[1][1]):
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                self._remove_disk(key)
+                self.evictions += 1
+
+    # --- Counters ---
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": self._disk_bytes,
+                "in_flight": len(self._inflight),
+            }
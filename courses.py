@@ -0,0 +1,120 @@
+import sys
+from functools import lru_cache
+
+# --- Terms as integer keys ---
+# FALL 2024 -> 20243: year * 10 + season, so plain int comparison gives
+# chronological order (Spring, Summer, Fall, Winter within a year).
+SEASON_ORDER = {"SPRING": 1, "SUMMER": 2, "FALL": 3, "WINTER": 4}
+SEASON_NAMES = {number: name for name, number in SEASON_ORDER.items()}
+
+
+def term_key(semester, year):
+    """Integer key for a (semester, year) pair, or None when either is unknown."""
+    if not semester or not year:
+        return None
+    return year * 10 + SEASON_ORDER[semester]
+
+
+@lru_cache(maxsize=None)
+def term_label(key):
+    """"FALL 2024" for 20243; one shared string per term across every output view."""
+    return f"{SEASON_NAMES[key % 10]} {key // 10}"
+
+
+class Course:
+    """One unique course of an audit. term is an integer key (see term_key) or None."""
+
+    __slots__ = ("code", "title", "credits", "grade", "term", "term_text")
+
+    def __init__(self, code, title, credits, grade, term, term_text=""):
+        self.code = sys.intern(code)
+        self.title = title
+        self.credits = credits
+        self.grade = sys.intern(grade)
+        self.term = term
+        # Raw Term field, only kept until embedded courses have been pulled out of it
+        self.term_text = term_text
+
+    @property
+    def full_term(self):
+        return term_label(self.term) if self.term else None
+
+    @property
+    def year(self):
+        return self.term // 10 if self.term else None
+
+
+class CourseSet:
+    """
+    Unique completed and in-progress courses of one audit, keyed by course code.
+
+    Courses are stored once; the output lists (semester breakdown, completed
+    and in-progress lists) are built from them only when asked for.
+    """
+
+    __slots__ = ("completed", "in_progress", "in_progress_grades")
+
+    def __init__(self, in_progress_grades=("IP",)):
+        self.completed = {}
+        self.in_progress = {}
+        # From the profile's grade classes (rules.py)
+        self.in_progress_grades = frozenset(in_progress_grades)
+
+    def __contains__(self, code):
+        return code in self.completed or code in self.in_progress
+
+    def bucket(self, course):
+        return self.in_progress if course.grade in self.in_progress_grades else self.completed
+
+    def add(self, course):
+        """Keep the first record of each code per bucket; returns whether it was added."""
+        bucket = self.bucket(course)
+        if course.code in bucket:
+            return False
+        bucket[course.code] = course
+        return True
+
+    def __iter__(self):
+        yield from self.completed.values()
+        yield from self.in_progress.values()
+
+    # --- Totals ---
+    def completed_credits(self):
+        return sum(c.credits for c in self.completed.values())
+
+    def in_progress_credits(self):
+        return sum(c.credits for c in self.in_progress.values())
+
+    # --- Output views ---
+    def semesters(self):
+        """Per-term breakdown in chronological order (an IP record wins over a completed one of the same code)."""
+        by_term = {}
+        for course in self:
+            if course.term:
+                by_term.setdefault(course.term, {})[course.code] = course
+
+        semesters = []
+        for term in sorted(by_term):
+            courses = list(by_term[term].values())
+            semesters.append({
+                "term": term_label(term),
+                "courses": [
+                    {"course": c.code, "title": c.title, "credits": c.credits, "grade": c.grade}
+                    for c in sorted(courses, key=lambda c: c.code)
+                ],
+                "total_credits": sum(c.credits for c in courses),
+                "course_count": len(courses),
+            })
+        return semesters
+
+    def completed_list(self):
+        return [
+            {"course": c.code, "title": c.title, "credits": c.credits, "grade": c.grade, "term": c.full_term}
+            for c in sorted(self.completed.values(), key=lambda c: (c.year or 0, c.code))
+        ]
+
+    def in_progress_list(self):
+        return [
+            {"course": c.code, "title": c.title, "credits": c.credits, "term": c.full_term}
+            for c in sorted(self.in_progress.values(), key=lambda c: c.code)
+        ]
@@ -0,0 +1,79 @@
+import copy
+
+# --- Result deltas ---
+# A delta describes a new json_preview relative to an earlier one of the same
+# student: changed top-level fields, plus per-item changes to the lists below,
+# matched by their identifying field. apply_delta(old, diff_results(old, new))
+# rebuilds new exactly.
+KEYED_LISTS = {
+    "completed_courses_list": "course",
+    "in_progress_courses_list": "course",
+    "semesters": "term",
+    "sections": "name",
+}
+
+
+def diff_keyed(old_items, new_items, key):
+    """added/changed items, removed keys, and the new key order when appending would get it wrong."""
+    old = {item[key]: item for item in old_items}
+    new = {item[key]: item for item in new_items}
+    if len(old) != len(old_items) or len(new) != len(new_items):
+        # Duplicate keys can't be matched item by item
+        return {"replace": new_items} if old_items != new_items else {}
+
+    diff = {}
+    added = [item for k, item in new.items() if k not in old]
+    changed = [item for k, item in new.items() if k in old and old[k] != item]
+    removed = [k for k in old if k not in new]
+    if added:
+        diff["added"] = added
+    if changed:
+        diff["changed"] = changed
+    if removed:
+        diff["removed"] = removed
+    if [k for k in old if k in new] + [item[key] for item in added] != list(new):
+        diff["order"] = list(new)
+    return diff
+
+
+def diff_results(old, new):
+    """Delta turning json_preview old into new; {} when they are equal."""
+    delta = {}
+    metadata = {k: v for k, v in new.items() if k not in KEYED_LISTS and (k not in old or old[k] != v)}
+    if metadata:
+        delta["metadata"] = metadata
+    removed = [k for k in old if k not in new and k not in KEYED_LISTS]
+    if removed:
+        delta["metadata_removed"] = removed
+
+    for name, key in KEYED_LISTS.items():
+        if name not in old and name not in new:
+            continue
+        diff = diff_keyed(old.get(name) or [], new.get(name) or [], key)
+        if diff:
+            delta[name] = diff
+    return delta
+
+
+def apply_delta(old, delta):
+    """Rebuild the newer json_preview from old and a diff_results delta."""
+    new = copy.deepcopy(old)
+    new.update(delta.get("metadata", {}))
+    for k in delta.get("metadata_removed", ()):
+        new.pop(k, None)
+
+    for name, key in KEYED_LISTS.items():
+        diff = delta.get(name)
+        if not diff:
+            continue
+        if "replace" in diff:
+            new[name] = diff["replace"]
+            continue
+        items = {item[key]: item for item in new.get(name) or []}
+        for k in diff.get("removed", ()):
+            items.pop(k, None)
+        for item in diff.get("changed", []) + diff.get("added", []):
+            items[item[key]] = item
+        order = diff.get("order") or list(items)
+        new[name] = [items[k] for k in order]
+    return new
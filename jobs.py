@@ -0,0 +1,265 @@
+import json
+import time
+import uuid
+import zlib
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# A job is "queued" until a worker claims it, "running" while it holds the
+# lease, then "done" (the parse finished, its result may still be "partial")
+# or "failed". The audit is kept zlib-compressed and dropped once the job has
+# finished; results stay until the job is purged.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    student_id TEXT,
+    html BLOB,
+    html_chars INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    submitted REAL NOT NULL,
+    not_before REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    lease_until REAL,
+    worker TEXT,
+    error TEXT,
+    result TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, not_before, submitted);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+
+FINISHED = ("done", "failed")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Durable queue of audits to parse, in one SQLite file, shared by every server
+    process that opens it.
+
+    claim() hands the oldest ready job to a worker under a lease. A job whose
+    lease runs out (its process died or was restarted mid-parse) is claimed
+    again, like one that failed with retry(), until it has had max_attempts;
+    fail() ends a job at once.
+    Each thread gets its own connection; the database runs in WAL mode.
+    """
+
+    def __init__(self, path, lease_seconds=120, max_attempts=3, retry_delay=1.0, max_queued=10000,
+                 ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Producer side ---
+    def submit(self, html, student_id=None):
+        """Queue an audit; returns (job id, jobs queued ahead of it). Raises JobQueueFull past max_queued."""
+        blob = zlib.compress(html.encode("utf-8", "surrogatepass"), 1)
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        with self._write_lock, conn:
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise JobQueueFull()
+            conn.execute(
+                "INSERT INTO jobs (id, status, student_id, html, html_chars, submitted, not_before) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, student_id, blob, len(html), now, now),
+            )
+        return job_id, queued
+
+    # --- Worker side ---
+    def claim(self, worker):
+        """
+        The oldest ready job, now "running" under worker's lease:
+        {"id", "html", "student_id", "attempts", "submitted"}; None when there is none.
+        """
+        conn = self._connect()
+        with self._write_lock:
+            while True:
+                now = time.time()
+                # IMMEDIATE takes the write lock up front, so two processes can't claim the same job
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute(
+                        """
+                        SELECT id, student_id, html, attempts, submitted FROM jobs
+                        WHERE (status = 'queued' AND not_before <= ?) OR (status = 'running' AND lease_until < ?)
+                        ORDER BY submitted
+                        LIMIT 1
+                        """,
+                        (now, now),
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+                    if row["attempts"] >= self.max_attempts:
+                        # Its last attempt never came back
+                        conn.execute(
+                            "UPDATE jobs SET status = 'failed', html = NULL, finished = ?, lease_until = NULL, "
+                            "error = COALESCE(error, 'Worker lost') || ?, worker = NULL WHERE id = ?",
+                            (now, f"; gave up after {row['attempts']} attempts", row["id"]),
+                        )
+                        conn.execute("COMMIT")
+                        logger.warning("Job %s failed: lease ran out on its last attempt", row["id"])
+                        continue
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ?, "
+                        "lease_until = ?, worker = ? WHERE id = ?",
+                        (now, now + self.lease_seconds, worker, row["id"]),
+                    )
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                return {
+                    "id": row["id"],
+                    "html": zlib.decompress(row["html"]).decode("utf-8", "surrogatepass"),
+                    "student_id": row["student_id"],
+                    "attempts": row["attempts"] + 1,
+                    "submitted": row["submitted"],
+                }
+
+    def complete(self, job_id, result, timings=None):
+        """Store a finished parse; its status is "done" unless the parse itself failed."""
+        status = "failed" if result.get("status") == "failed" else "done"
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, html = NULL, finished = ?, lease_until = NULL, error = ?, "
+                "result = ?, timings = ? WHERE id = ?",
+                (status, time.time(), result.get("error"), json.dumps(result), json.dumps(timings or {}), job_id),
+            )
+        return status
+
+    def retry(self, job_id, error):
+        """Put a job whose attempt crashed back in the queue, after a growing delay; returns its new status."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row["attempts"] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', html = NULL, finished = ?, lease_until = NULL, error = ? "
+                    "WHERE id = ?",
+                    (now, f"{error}; gave up after {row['attempts']} attempts", job_id),
+                )
+                return "failed"
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', not_before = ?, lease_until = NULL, worker = NULL, error = ? "
+                "WHERE id = ?",
+                (now + self.retry_delay * 2 ** (row["attempts"] - 1), error, job_id),
+            )
+            return "queued"
+
+    def fail(self, job_id, error):
+        """Mark a job failed for good, whatever attempts it has left (e.g. its parse timed out)."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', html = NULL, finished = ?, lease_until = NULL, error = ? "
+                "WHERE id = ?",
+                (time.time(), error, job_id),
+            )
+        return "failed"
+
+    def release(self, job_id):
+        """Hand a claimed job back untouched (e.g. at shutdown); the attempt isn't counted."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_until = NULL, worker = NULL "
+                "WHERE id = ? AND status = 'running'",
+                (job_id,),
+            )
+
+    def purge(self):
+        """Drop finished jobs older than ttl_seconds; returns how many."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (time.time() - self.ttl_seconds,),
+            ).rowcount
+
+    # --- Lookups ---
+    def get(self, job_id):
+        """A job's status, attempts, timings and (once finished) result; None if unknown or purged."""
+        row = self._connect().execute(
+            "SELECT id, status, student_id, html_chars, attempts, submitted, started, finished, error, result, timings "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "id": row["id"],
+            "status": row["status"],
+            "student_id": row["student_id"],
+            "html_chars": row["html_chars"],
+            "attempts": row["attempts"],
+            "submitted": row["submitted"],
+            "started": row["started"],
+            "finished": row["finished"],
+            "error": row["error"],
+            "timings": {
+                # Time in the queue before the last attempt started, and that attempt's run time
+                "queued_seconds": round(row["started"] - row["submitted"], 4) if row["started"] else None,
+                "run_seconds": round(row["finished"] - row["started"], 4) if row["finished"] and row["started"] else None,
+                "stages": json.loads(row["timings"]) if row["timings"] else None,
+            },
+        }
+        if row["status"] == "queued":
+            job["queued_ahead"] = self._connect().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND submitted < ?", (row["submitted"],),
+            ).fetchone()[0]
+        job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+    def stats(self):
+        conn = self._connect()
+        counts = dict.fromkeys(("queued", "running") + FINISHED, 0)
+        counts.update(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(submitted) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        recent = conn.execute(
+            "SELECT AVG(started - submitted), AVG(finished - started) FROM jobs "
+            "WHERE finished > ? AND started IS NOT NULL",
+            (time.time() - 300,),
+        ).fetchone()
+        return {
+            "path": self.path,
+            **counts,
+            "oldest_queued_seconds": round(time.time() - oldest, 3) if oldest else None,
+            # Over the jobs finished in the last five minutes
+            "recent_queued_seconds": round(recent[0], 4) if recent[0] is not None else None,
+            "recent_run_seconds": round(recent[1], 4) if recent[1] is not None else None,
+            "max_queued": self.max_queued,
+            "max_attempts": self.max_attempts,
+            "lease_seconds": self.lease_seconds,
+        }
@@ -1,12 +1,214 @@
 import re
 import json
+import hashlib
+import logging
+from bisect import bisect_left
+from functools import lru_cache
 
-def parse_degreeworks_txt(txt_path, json_path="parsed_output.json"):
-    with open(txt_path, "r", encoding="utf-8") as f:
-        text = f.read()
+from budget import check_budget
+from rules import DEFAULT_PROFILE, load_rules
+
+logger = logging.getLogger(__name__)
+
+# --- Section header sets ---
+# Each institution/program profile lists its requirement block headers in
+# profiles/<name>.json (see rules.py); DEGREEWORKS_PROFILE picks the default one.
+def load_section_headers(profile=DEFAULT_PROFILE):
+    """Return the tuple of section headers configured for a profile."""
+    return load_rules(profile).section_headers
+
+
+# Loaded once at import so parsing never has to touch the filesystem
+SECTION_HEADERS = load_section_headers()
+
+
+@lru_cache(maxsize=32)
+def compile_header_pattern(section_headers):
+    """
+    Combine a header set into one alternation, longest first so prefixes don't
+    shadow longer headers. A header only counts at the start of a line, so
+    "Electives" inside "Free Electives" (a table-of-contents entry) or
+    "Group A Electives" is not a section boundary.
+    """
+    ordered = sorted(set(section_headers), key=len, reverse=True)
+    return re.compile(r"^[ \t]*(" + "|".join(re.escape(header) for header in ordered) + ")", re.MULTILINE)
+
+
+def split_sections(text, section_headers=SECTION_HEADERS):
+    """
+    Find every header in one pass and return (header, start, end) in the order
+    the headers actually appear. Each section ends where the next found header
+    starts, so a missing header never merges its neighbours.
+    """
+    section_headers = tuple(section_headers)
+    pattern = compile_header_pattern(section_headers)
+    remaining = len(set(section_headers))
+    starts = {}
+    for match in pattern.finditer(text):
+        if match.group(1) not in starts:
+            starts[match.group(1)] = match.start(1)
+            remaining -= 1
+            if not remaining:
+                break
+
+    found = sorted(starts.items(), key=lambda item: item[1])
+    bounds = []
+    for i, (header, start) in enumerate(found):
+        end = found[i + 1][1] if i + 1 < len(found) else len(text)
+        bounds.append((header, start, end))
+    return bounds
+
+
+# --- Course record lexer ---
+# Every record keyword is found in a single pass over the flattened text and
+# the records are assembled from that token stream, so no backtracking regex
+# is run per section.
+TOKEN_PATTERN = re.compile(r"Course|Title|Grade|Credits|Term|Still needed")
+CODE_PATTERN = re.compile(r"\s*(\w+\s*\d+)")
+GRADE_PATTERN = re.compile(r"\s*([A-Z]+)")
+CREDITS_PATTERN = re.compile(r"\s*([\d\(\)]+)")
+TERM_PATTERN = re.compile(r"[\w\s\-]+")
+UNMET_LEAD_PATTERN = re.compile(r"[:\s]*")
+
+def tokenize_degreeworks_text(text, start=0, end=None):
+    """Return parallel (positions, keywords) lists for every record keyword in text[start:end]."""
+    positions = []
+    keywords = []
+    # No keyword overlaps another, so lexing a slice gives exactly the tokens a
+    # whole-text pass would find inside it
+    for match in TOKEN_PATTERN.finditer(text, start, len(text) if end is None else end):
+        positions.append(match.start())
+        keywords.append(match.group())
+    return positions, keywords
+
+
+def parse_section_records(text, tokens, start, end):
+    """
+    Assemble completed courses and "Still needed" requirements for text[start:end].
+
+    Each field is taken from the first keyword after the previous one, the same
+    way the old lazy `Course .*? Title .*? Grade .*? Credits .*? Term` pattern
+    resolved them.
+    """
+    positions, keywords = tokens
+    first = bisect_left(positions, start)
+    last = bisect_left(positions, end)
+    while last > first and positions[last - 1] + len(keywords[last - 1]) > end:
+        last -= 1
+
+    def next_token(i, keyword, min_pos):
+        if i & 0xFF == 0:
+            check_budget("section_parse")
+        while i < last and (keywords[i] != keyword or positions[i] < min_pos):
+            i += 1
+        return i
+
+    # --- Completed courses ---
+    completed_courses = []
+    i = first
+    while True:
+        i = next_token(i, "Course", start)
+        if i >= last:
+            break
+        code_match = CODE_PATTERN.match(text, positions[i] + 6, end)
+        if not code_match:
+            i += 1
+            continue
+
+        t = next_token(i + 1, "Title", code_match.end())
+        if t >= last:
+            break
+        title_start = positions[t] + 5
+
+        g = t + 1
+        grade_match = None
+        while True:
+            g = next_token(g, "Grade", title_start)
+            if g >= last:
+                break
+            grade_match = GRADE_PATTERN.match(text, positions[g] + 5, end)
+            if grade_match:
+                break
+            g += 1
+        if not grade_match:
+            break
+
+        c = g + 1
+        credits_match = None
+        while True:
+            c = next_token(c, "Credits", grade_match.end())
+            if c >= last:
+                break
+            credits_match = CREDITS_PATTERN.match(text, positions[c] + 7, end)
+            if credits_match:
+                break
+            c += 1
+        if not credits_match:
+            break
 
-    # Initialize JSON structure with metadata
-    data = {
+        r = c + 1
+        term_match = None
+        while True:
+            r = next_token(r, "Term", credits_match.end())
+            if r >= last:
+                break
+            term_match = TERM_PATTERN.match(text, positions[r] + 4, end)
+            if term_match:
+                break
+            r += 1
+        if not term_match:
+            break
+
+        completed_courses.append({
+            "course": code_match.group(1).strip(),
+            "title": text[title_start:positions[g]].strip(),
+            "grade": grade_match.group(1).strip(),
+            "credits": credits_match.group(1).strip(),
+            "term": term_match.group().strip()
+        })
+
+        # The term field swallows everything up to the next non-word character,
+        # so the next record can only start after it.
+        i = bisect_left(positions, term_match.end(), r, last)
+
+    # --- Remaining requirements ---
+    remaining_requirements = []
+    i = first
+    while True:
+        i = next_token(i, "Still needed", start)
+        if i >= last:
+            break
+        lead_end = UNMET_LEAD_PATTERN.match(text, positions[i] + 12, end).end()
+        c = next_token(i + 1, "Course", lead_end)
+        req_end = positions[c] if c < last else end
+        req_text = text[lead_end:req_end].strip().replace("\n", " ")
+        if req_text:
+            remaining_requirements.append(req_text)
+        i = c + 1
+
+    return completed_courses, remaining_requirements
+
+
+def section_hash(section_text):
+    """Content hash of one section's text (header included); equal hashes parse to equal sections."""
+    return hashlib.blake2b(section_text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def iter_degreeworks_text(text, section_headers=None, previous_sections=None, rules=None):
+    """
+    Generator version of parse_degreeworks_text: yields (event, payload) pairs
+    as each part is parsed, so a caller can pass them on before the rest is done.
+
+    "metadata" (every header field) comes first, then one "section" per
+    requirement block in document order and, with previous_sections, a last
+    "section_hashes" list parallel to the sections.
+    """
+    if rules is None:
+        rules = load_rules()
+    if section_headers is None:
+        section_headers = rules.section_headers
+
+    metadata = {
         "student_name": None,
         "gpa": None,
         "advisor": None,
@@ -18,125 +220,73 @@ def parse_degreeworks_txt(txt_path, json_path="parsed_output.json"):
         "program": None,
         "college": None,
         "academic_standing": None,
-        "sections": []
     }
+    # --- Header metadata: every field of the profile's rules in one scan ---
+    metadata.update(rules.text_matcher.extract(text))
+    yield "metadata", metadata
+
+    # --- Sections, split by header position and parsed one at a time ---
+    hashes = None if previous_sections is None else []
+    for header, start, end in split_sections(text, section_headers):
+        check_budget("section_parse")
+        if hashes is not None:
+            digest = section_hash(text[start:end])
+            hashes.append(digest)
+            if digest in previous_sections:
+                yield "section", previous_sections[digest]
+                continue
+        tokens = tokenize_degreeworks_text(text, start, end)
+        completed_courses, remaining_requirements = parse_section_records(text, tokens, start, end)
+        yield "section", {
+            "name": header,
+            "completed_courses": completed_courses,
+            "remaining_requirements": remaining_requirements
+        }
+    if hashes is not None:
+        yield "section_hashes", hashes
 
-    # --- Extract GPA ---
-    gpa_match = re.search(r"Overall GPA\s*([\d\.]+)", text)
-    if gpa_match:
-        data["gpa"] = float(gpa_match.group(1))
-
-    # --- Extract Advisor ---
-    advisor_match = re.search(r"Advisor[:\s]+([\w\s]+?)(?:\n|Format|Degree)", text, re.IGNORECASE)
-    if advisor_match:
-        data["advisor"] = advisor_match.group(1).strip()
-
-    # --- Extract Transfer Hours ---
-    transfer_match = re.search(r"Transfer Hours[:\s]+(\d+)", text, re.IGNORECASE)
-    if transfer_match:
-        data["transfer_hours"] = int(transfer_match.group(1))
-
-    # --- Extract Classification ---
-    classification_match = re.search(r"Classification[:\s]+([\w\-]+)", text, re.IGNORECASE)
-    if classification_match:
-        data["classification"] = classification_match.group(1).strip()
-
-    # --- Extract Major ---
-    major_match = re.search(r"Major[:\s]+([\w\s]+?)(?:\n|Program)", text, re.IGNORECASE)
-    if major_match:
-        data["major"] = major_match.group(1).strip()
-
-    # --- Extract Program ---
-    program_match = re.search(r"Program[:\s]+([\w\s]+?)(?:\n|College)", text, re.IGNORECASE)
-    if program_match:
-        data["program"] = program_match.group(1).strip()
-
-    # --- Extract College ---
-    college_match = re.search(r"College[:\s]+([\w\s,/]+?)(?:\n|Academic)", text, re.IGNORECASE)
-    if college_match:
-        data["college"] = college_match.group(1).strip()
-
-    # --- Extract Academic Standing ---
-    standing_match = re.search(r"Academic Standing[:\s]+([\w\s]+?)(?:\n|Graduation)", text, re.IGNORECASE)
-    if standing_match:
-        data["academic_standing"] = standing_match.group(1).strip()
-
-    # --- Extract Graduation Application Status ---
-    grad_app_match = re.search(r"Graduation Application[:\s]+([\w\s]+?)(?:\n|Graduation Term)", text, re.IGNORECASE)
-    if grad_app_match:
-        data["graduation_status"] = grad_app_match.group(1).strip()
-
-    # --- Extract Graduation Term ---
-    grad_term_match = re.search(r"Graduation Term[:\s]+([\w\s\-]+)", text, re.IGNORECASE)
-    if grad_term_match:
-        data["graduation_term"] = grad_term_match.group(1).strip()
-
-    # --- Section headers to look for ---
-    section_headers = [
-        "General Education Program Requirements",
-        "Major Requirements",
-        "Complementary Studies Program",
-        "Computer Science Requirements",
-        "Electives",
-        "Senior Project"
-    ]
-
-    # --- Split text into sections based on headers ---
-    sections = []
-    for i, header in enumerate(section_headers):
-        start = text.find(header)
-        if start == -1:
-            continue
-        end = (
-            text.find(section_headers[i + 1], start)
-            if i + 1 < len(section_headers)
-            else len(text)
-        )
-        section_text = text[start:end]
-
-        section_data = {"name": header, "completed_courses": [], "remaining_requirements": []}
-
-        # --- Extract completed courses ---
-        course_pattern = re.compile(
-            r"Course\s*(?P<code>\w+\s*\d+).*?"
-            r"Title\s*(?P<title>.*?)\s*"
-            r"Grade\s*(?P<grade>[A-Z]+).*?"
-            r"Credits\s*(?P<credits>[\d\(\)]+).*?"
-            r"Term\s*(?P<term>[\w\s\d\-]+)",
-            re.DOTALL
-        )
-
-        for match in course_pattern.finditer(section_text):
-            section_data["completed_courses"].append({
-                "course": match.group("code").strip(),
-                "title": match.group("title").strip(),
-                "grade": match.group("grade").strip(),
-                "credits": match.group("credits").strip(),
-                "term": match.group("term").strip()
-            })
-
-        # --- Extract remaining requirements ---
-        unmet_pattern = re.compile(r"Still needed[:\s]*(.*?)(?:Course|$)", re.DOTALL)
-        for match in unmet_pattern.finditer(section_text):
-            req_text = match.group(1).strip().replace("\n", " ")
-            if req_text:
-                section_data["remaining_requirements"].append(req_text)
-
-        sections.append(section_data)
-
-    data["sections"] = sections
+
+def parse_degreeworks_text(text, section_headers=None, previous_sections=None, rules=None):
+    """
+    Parse flattened DegreeWorks text into a dict without touching the filesystem.
+
+    rules (a compiled profile, the default one when None) supplies the metadata
+    patterns and, unless section_headers is given, the section headers.
+
+    previous_sections ({section_hash: section}) turns on incremental parsing:
+    sections whose text hashes to one of its keys are reused instead of being
+    parsed again, and the result gets a "section_hashes" list parallel to
+    "sections" for the next round.
+    """
+    data = {}
+    for event, payload in iter_degreeworks_text(text, section_headers, previous_sections, rules):
+        if event == "metadata":
+            data.update(payload)
+            data["sections"] = []
+        elif event == "section":
+            data["sections"].append(payload)
+        else:
+            data[event] = payload
+
+    logger.debug(
+        "Metadata extracted: advisor=%s transfer_hours=%s classification=%s major=%s "
+        "academic_standing=%s graduation_status=%s",
+        data["advisor"], data["transfer_hours"], data["classification"], data["major"],
+        data["academic_standing"], data["graduation_status"],
+    )
+
+    return data
+
+
+def parse_degreeworks_txt(txt_path, json_path="parsed_output.json"):
+    with open(txt_path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    data = parse_degreeworks_text(text)
 
     # --- Write structured JSON file ---
     with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-
-    print(f"✅ JSON file created: {json_path}")
-    print(f"📋 Metadata extracted:")
-    print(f"   - Advisor: {data['advisor']}")
-    print(f"   - Transfer Hours: {data['transfer_hours']}")
-    print(f"   - Classification: {data['classification']}")
-    print(f"   - Major: {data['major']}")
-    print(f"   - Academic Standing: {data['academic_standing']}")
-    print(f"   - Graduation Status: {data['graduation_status']}")
-    
-    return data
\ No newline at end of file
+        json.dump(data, f, separators=(",", ":"))
+
+    logger.info("JSON file created: %s", json_path)
+    return data
@@ -0,0 +1,147 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; parses run from well under a millisecond (cache-sized audits) to several seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds; queued jobs can wait minutes during a burst
+JOB_BUCKETS = LATENCY_BUCKETS + (60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+# Bytes; 1 KB up to the 20 MB body limit
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(9))
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    le = bound if bound == "+Inf" else f"{bound:g}"
+                    labels = _format_labels(self.label_names, key, [("le", le)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {total:.6f}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# --- Metrics exposed on /metrics ---
+REQUESTS = Counter("scraper_requests_total", "HTTP requests by endpoint and status code", ("endpoint", "status"))
+REQUEST_SECONDS = Histogram("scraper_request_seconds", "HTTP request latency", LATENCY_BUCKETS, ("endpoint",))
+REQUEST_BYTES = Histogram("scraper_request_bytes", "Request body size as sent (Content-Length)", SIZE_BUCKETS, ("endpoint",))
+AUDIT_CHARS = Histogram("scraper_audit_chars", "Decoded audit HTML length in characters", SIZE_BUCKETS)
+STAGE_SECONDS = Histogram("scraper_stage_seconds", "Time spent in each pipeline stage", LATENCY_BUCKETS, ("stage",))
+SNAPSHOT_RESPONSES = Counter("scraper_snapshot_responses_total", "Responses to student_id submissions by mode", ("mode",))
+SECTIONS = Counter("scraper_incremental_sections_total", "Sections seen by incremental re-parses, reused or parsed", ("outcome",))
+JOB_SECONDS = Histogram("scraper_job_seconds", "Job time spent queued and running, per attempt", JOB_BUCKETS, ("phase",))
+JOBS = Counter("scraper_jobs_total", "Job attempts by outcome", ("outcome",))
+
+ALL_METRICS = (
+    REQUESTS, REQUEST_SECONDS, REQUEST_BYTES, AUDIT_CHARS, STAGE_SECONDS, SNAPSHOT_RESPONSES, SECTIONS,
+    JOB_SECONDS, JOBS,
+)
+
+
+# --- Stage timing ---
+# Inside collect_stages() timings are gathered per thread and handed back to the
+# caller (worker processes can't reach the server's histograms); otherwise they
+# go straight into STAGE_SECONDS.
+_local = threading.local()
+
+
+def record_stage(name, seconds):
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+    else:
+        STAGE_SECONDS.observe(seconds, stage=name)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_stages():
+    previous = getattr(_local, "timings", None)
+    _local.timings = timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def observe_stages(timings):
+    for name, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def render_metrics(gauges=None):
+    """Prometheus text exposition of every metric, plus optional {name: (help, value)} gauges."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    for name, (help_text, value) in (gauges or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,291 @@
+"""
+Re-run the parser over archived audits and write the results as NDJSON.
+
+SOURCE is a directory (searched recursively) or a .zip / .tar / .tar.gz
+archive of saved audits: the degreeworks_raw_*.html(.gz) artifacts by default,
+or with --kind text the degreeworks_paragraphs_*.txt(.gz) ones (skips the HTML
+parse; only the text-derived fields are rebuilt). Files are read, decompressed
+and parsed on a process pool with a bounded window, so archives are streamed
+rather than loaded whole.
+
+Each output line is {"id", "parser_version", "status", "seconds", "data"}, where
+id is the file's path relative to SOURCE (or its archive member name). Lines
+are appended as documents finish; re-running the same command after an
+interruption skips every id already in the output. Use a fresh output file
+after a PARSER_VERSION change.
+
+Run from the repository root:
+    python reprocess.py scraped_data --output reprocessed.ndjson
+    python reprocess.py audits.tar.gz --output reprocessed.ndjson --workers 8
+    python reprocess.py scraped_data --kind text --output text_only.ndjson
+"""
+import argparse
+import fnmatch
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import scraper2
+from json_convert import parse_degreeworks_text
+from rules import load_rules
+
+DEFAULT_PATTERNS = {
+    "html": "degreeworks_raw_*.html*",
+    "text": "degreeworks_paragraphs_*.txt*",
+}
+# Every line starts with its id, so resuming never has to parse whole results
+ID_PREFIX = re.compile(r'\{"id": ("(?:[^"\\]|\\.)*")')
+
+
+# --- Sources: (id, path, payload) with either the path or the raw bytes ---
+def member_id(name):
+    return name[2:] if name.startswith("./") else name
+
+
+def iter_directory(root, pattern):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if fnmatch.fnmatch(name, pattern):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path, None
+
+
+def iter_zip(path, pattern, done):
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not fnmatch.fnmatch(os.path.basename(info.filename), pattern):
+                continue
+            if member_id(info.filename) not in done:
+                yield member_id(info.filename), None, archive.read(info)
+
+
+def iter_tar(path, pattern, done):
+    # "r|*" reads the archive as a stream; skipped members are never decompressed into memory
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not fnmatch.fnmatch(os.path.basename(member.name), pattern):
+                continue
+            if member_id(member.name) not in done:
+                yield member_id(member.name), None, archive.extractfile(member).read()
+
+
+def iter_source(source, pattern, done):
+    if os.path.isdir(source):
+        return ((i, p, b) for i, p, b in iter_directory(source, pattern) if i not in done)
+    if zipfile.is_zipfile(source):
+        return iter_zip(source, pattern, done)
+    if tarfile.is_tarfile(source):
+        return iter_tar(source, pattern, done)
+    raise SystemExit(f"{source} is not a directory, zip or tar archive")
+
+
+def count_source(source, pattern):
+    """Number of matching documents, when it can be had without reading the archive through."""
+    if os.path.isdir(source):
+        return sum(1 for _ in iter_directory(source, pattern))
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            return sum(1 for info in archive.infolist()
+                       if not info.is_dir() and fnmatch.fnmatch(os.path.basename(info.filename), pattern))
+    return None
+
+
+# --- Resume ---
+def load_done(output):
+    """Ids already in the output; a torn last line from a crash is cut off first."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "rb+") as f:
+        good = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            match = ID_PREFIX.match(line.decode("utf-8", "replace"))
+            if match:
+                done.add(json.loads(match.group(1)))
+            good += len(line)
+        f.truncate(good)
+    return done
+
+
+# --- Worker side ---
+def _init_worker():
+    logging.basicConfig(level=logging.WARNING)
+
+
+def read_document(record_id, path, payload):
+    if payload is None:
+        with open(path, "rb") as f:
+            payload = f.read()
+    if record_id.endswith(".gz"):
+        payload = gzip.decompress(payload)
+    return payload.decode("utf-8", "replace")
+
+
+def make_record(record_id, status, seconds, data):
+    return {
+        "id": record_id,
+        "parser_version": scraper2.PARSER_VERSION,
+        "status": status,
+        "seconds": round(seconds, 4),
+        "data": data,
+    }
+
+
+def process_document(record_id, path, payload, options):
+    """
+    Parse one document; returns (output record, input chars, audit_digest of the HTML or None).
+
+    Only parses: artifacts are never written and the cohort index is left to
+    the parent, the one process that writes it.
+    """
+    started = time.perf_counter()
+    chars = 0
+    digest = None
+    try:
+        content = read_document(record_id, path, payload)
+        chars = len(content)
+        if options["kind"] == "text":
+            profile = options.get("profile")
+            data = parse_degreeworks_text(content, rules=load_rules(profile) if profile else None)
+            status = "success"
+        else:
+            data, _ = scraper2.parse_audit_html(content, options.get("profile"), options.get("time_budget"))
+            status = data["status"]
+            digest = scraper2.audit_digest(content)
+    except Exception as e:
+        data, status = {"error": str(e), "status": "failed"}, "failed"
+    return make_record(record_id, status, time.perf_counter() - started, data), chars, digest
+
+
+# --- Progress ---
+class Progress:
+    def __init__(self, total, skipped, interval):
+        self.total = total
+        self.skipped = skipped
+        self.interval = interval
+        self.started = self.last_report = time.perf_counter()
+        self.done = 0
+        self.chars = 0
+        self.statuses = {}
+
+    def add(self, status, chars):
+        self.done += 1
+        self.chars += chars
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        rate = self.done / elapsed
+        line = f"{self.done + self.skipped}"
+        if self.total is not None:
+            line += f"/{self.total}"
+            remaining = self.total - self.skipped - self.done
+            if rate and remaining > 0 and not final:
+                line += f" eta {remaining / rate:.0f}s"
+        statuses = " ".join(f"{name}={count}" for name, count in sorted(self.statuses.items()))
+        print(f"{'done' if final else 'progress'} {line}  {rate:.1f} docs/s  "
+              f"{self.chars / 1e6 / elapsed:.2f} MB/s  {statuses}  (skipped {self.skipped})",
+              file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory, .zip or .tar(.gz) of saved audits")
+    parser.add_argument("--output", "-o", required=True, help="NDJSON file to append results to")
+    parser.add_argument("--kind", choices=sorted(DEFAULT_PATTERNS), default="html",
+                        help="parse saved HTML (full pipeline) or saved paragraph text")
+    parser.add_argument("--pattern", help="file name glob (default depends on --kind)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--profile", help="section header profile")
+    parser.add_argument("--budget", type=float, help="per-document time budget in seconds")
+    parser.add_argument("--limit", type=int, help="stop after this many new documents")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    pattern = args.pattern or DEFAULT_PATTERNS[args.kind]
+    options = {"kind": args.kind, "profile": args.profile, "time_budget": args.budget}
+
+    done = load_done(args.output)
+    total = count_source(args.source, pattern)
+    progress = Progress(total, len(done), args.interval)
+    if done:
+        print(f"Resuming: {len(done)} documents already in {args.output}", file=sys.stderr)
+
+    documents = iter_source(args.source, pattern, done)
+    # Results are indexed here (SCRAPER_INDEX_DB), never in the workers
+    audit_index = scraper2.get_audit_index()
+    # A bounded window of documents in flight keeps memory flat on large archives
+    window = args.workers * 4
+    submitted = 0
+    # Documents that were running when a worker died. Each is re-run alone on a
+    # fresh pool, so one that kills its worker again only fails itself.
+    suspects = []
+    crashed = set()
+    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+    try:
+        with open(args.output, "a", encoding="utf-8") as out:
+            in_flight = {}
+            exhausted = False
+            while in_flight or suspects or not exhausted:
+                if suspects:
+                    if not in_flight:
+                        document = suspects.pop()
+                        in_flight[pool.submit(process_document, *document, options)] = document
+                else:
+                    while not exhausted and len(in_flight) < window and (args.limit is None or submitted < args.limit):
+                        document = next(documents, None)
+                        if document is None:
+                            exhausted = True
+                            break
+                        in_flight[pool.submit(process_document, *document, options)] = document
+                        submitted += 1
+                    if args.limit is not None and submitted >= args.limit:
+                        exhausted = True
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    document = in_flight.pop(future)
+                    try:
+                        record, chars, digest = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        if document[0] not in crashed:
+                            crashed.add(document[0])
+                            suspects.append(document)
+                            continue
+                        error = "The worker process died while parsing this document"
+                        record, chars, digest = make_record(document[0], "failed", 0, {"error": error, "status": "failed"}), 0, None
+                    out.write(json.dumps(record) + "\n")
+                    if audit_index is not None and digest is not None:
+                        scraper2.index_result(audit_index, record["data"], digest)
+                    progress.add(record["status"], chars)
+                out.flush()
+                if broken:
+                    # Every other future of the dead pool fails the same way once it has shut down
+                    pool.shutdown()
+                    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+    finally:
+        pool.shutdown()
+
+    progress.report(final=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import hashlib
+from functools import lru_cache
+
+from budget import check_budget
+
+# --- Extraction rules ---
+# Everything institution- or program-specific lives in profiles/<name>.json:
+# requirement block headers, metadata fields (DOM label, flattened-text and raw
+# HTML patterns), grade classes and the current term. A profile may "extends"
+# another and override parts of it. DEGREEWORKS_PROFILE picks the default one.
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+DEFAULT_PROFILE = os.environ.get("DEGREEWORKS_PROFILE", "morgan_state_cs")
+
+FIELD_TYPES = {"str": str.strip, "int": int, "float": float}
+# str.lower() can change the length of some non-ASCII strings; this can't
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+REJECTED = object()
+HEAD_CHARS = 16384
+# Used for GPA analytics when a profile lists no grade points of its own
+DEFAULT_GRADE_POINTS = {"A": 4.0, "B": 3.0, "C": 2.0, "D": 1.0, "F": 0.0}
+
+
+def lower_ascii(text):
+    lowered = text.lower()
+    return lowered if len(lowered) == len(text) else text.translate(ASCII_LOWER)
+
+
+class MetadataRule:
+    """One label + value pattern for a field; group 1 of the value is the field's value."""
+
+    __slots__ = ("field", "label", "pattern", "convert", "min_length", "reject")
+
+    def __init__(self, field, spec, field_type, loose_whitespace):
+        self.field = field
+        words = spec["label"].split()
+        # In raw HTML a label can be wrapped across lines
+        self.label = (r"\s+" if loose_whitespace else r"\ ").join(re.escape(word) for word in words)
+        flags = 0 if spec.get("case_sensitive") else re.IGNORECASE
+        self.pattern = re.compile(self.label + spec["value"], flags)
+        self.convert = FIELD_TYPES[field_type]
+        self.min_length = spec.get("min_length", 0)
+        self.reject = frozenset(word.lower() for word in spec.get("reject", ()))
+
+    def value(self, match):
+        value = self.convert(match.group(1))
+        if isinstance(value, str) and (len(value) < self.min_length or value.lower() in self.reject):
+            return REJECTED
+        return value
+
+
+class MetadataMatcher:
+    """
+    Every metadata rule of one source (flattened text or raw HTML) run in a single scan.
+
+    A prefilter made of the lowercased labels finds candidate positions in a
+    lowercased copy; at each one the undecided rules are matched against the
+    original, so each rule still yields its leftmost match, as its own
+    search() would. Rules of a field are tried in the order listed: a later one
+    only counts when the earlier ones found nothing or were rejected. The scan
+    stops as soon as every field is decided.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.fields = {}
+        for i, rule in enumerate(rules):
+            self.fields.setdefault(rule.field, []).append(i)
+        labels = sorted({rule.label.lower() for rule in rules}, key=len, reverse=True)
+        # A plain alternation of literals (no groups) lets re skip ahead on the first characters
+        self.prefilter = re.compile("|".join(labels)) if labels else None
+
+    def _decide(self, field, found, final):
+        """(decided, value) for a field from the rule results so far."""
+        for i in self.fields[field]:
+            if i not in found:
+                if not final:
+                    return False, None
+                continue
+            if found[i] is not REJECTED:
+                return True, found[i]
+        return final or all(i in found for i in self.fields[field]), None
+
+    def extract(self, text, stage="metadata"):
+        metadata = {}
+        if self.prefilter is None:
+            return metadata
+        check_budget(stage)
+        found = {}
+        undecided = set(self.fields)
+        pos = 0
+        # The header fields usually sit near the top: lowercase the first block
+        # and the rest of the text only when the scan runs off its end
+        limit = 0
+        lowered = ""
+        while undecided:
+            hit = self.prefilter.search(lowered, pos)
+            if hit is None:
+                if limit >= len(text):
+                    break
+                limit = len(text) if limit else HEAD_CHARS
+                lowered = lower_ascii(text[:limit])
+                continue
+            check_budget(stage)
+            start = hit.start()
+            for field in list(undecided):
+                for i in self.fields[field]:
+                    if i not in found:
+                        match = self.rules[i].pattern.match(text, start)
+                        if match:
+                            found[i] = self.rules[i].value(match)
+                decided, value = self._decide(field, found, final=False)
+                if decided:
+                    undecided.discard(field)
+                    if value is not None:
+                        metadata[field] = value
+            pos = start + 1
+
+        for field in undecided:
+            _, value = self._decide(field, found, final=True)
+            if value is not None:
+                metadata[field] = value
+        return metadata
+
+
+class Rules:
+    """A profile compiled once: section headers, metadata matchers and grade classes."""
+
+    def __init__(self, name, spec, digest):
+        self.name = name
+        self.digest = digest
+        self.section_headers = tuple(spec.get("sections", ()))
+        self.current_term = spec.get("current_term")
+        grades = spec.get("grades", {})
+        self.in_progress_grades = frozenset(grades.get("in_progress", ("IP",)))
+        self.transfer_grades = frozenset(grades.get("transfer", ()))
+        self.grade_points = grades.get("points", DEFAULT_GRADE_POINTS)
+
+        fields = spec.get("fields", {})
+        self.metadata_fields = tuple(fields)
+        self.field_types = {}
+        text_rules, html_rules = [], []
+        for field, field_spec in fields.items():
+            field_type = field_spec.get("type", "str")
+            if field_type not in FIELD_TYPES:
+                raise ValueError(f"Profile {name}: field {field} has unknown type {field_type!r}")
+            self.field_types[field] = field_type
+            text_rules += [MetadataRule(field, rule, field_type, False) for rule in field_spec.get("text", ())]
+            html_rules += [MetadataRule(field, rule, field_type, True) for rule in field_spec.get("html", ())]
+        self.text_matcher = MetadataMatcher(text_rules)
+        self.html_matcher = MetadataMatcher(html_rules)
+
+
+def read_profile(profile, seen=()):
+    """A profile's JSON with its "extends" chain merged in (fields merge per field)."""
+    if profile in seen:
+        raise ValueError(f"Profile {profile} extends itself")
+    with open(os.path.join(PROFILES_DIR, f"{profile}.json"), "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    base_name = spec.pop("extends", None)
+    if not base_name:
+        return spec
+    base = read_profile(base_name, seen + (profile,))
+    fields = {**base.get("fields", {}), **spec.get("fields", {})}
+    merged = {**base, **spec}
+    merged["fields"] = fields
+    return merged
+
+
+@lru_cache(maxsize=None)
+def load_rules(profile=DEFAULT_PROFILE):
+    """The compiled rules of a profile; read and compiled once per process."""
+    spec = read_profile(profile)
+    # Cached results are keyed on this, so editing a profile never serves stale output
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return Rules(profile, spec, digest)
@@ -1,421 +1,630 @@
 import os
 import re
-from datetime import datetime
+import time
+import atexit
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
 from selectolax.parser import HTMLParser
-from json_convert import parse_degreeworks_txt  
+from json_convert import iter_degreeworks_text, section_hash, split_sections
+from metrics import collect_stages, record_stage, stage
+from artifacts import ArtifactStore
+from audit_index import AuditIndex
+from courses import Course, CourseSet, term_key, term_label
+from budget import BudgetExceeded, check_budget, parse_budget
+from rules import load_rules
 
+logger = logging.getLogger(__name__)
 
-def scrape_degreeworks(html_content: str):
+# Bump whenever a change alters the parsed output; cached results are keyed on it.
+PARSER_VERSION = "2"
+
+# Set SCRAPER_SAVE_ARTIFACTS=0 to skip writing the raw HTML, text and JSON files.
+SAVE_ARTIFACTS = os.environ.get("SCRAPER_SAVE_ARTIFACTS", "1") != "0"
+# Artifacts are gzip-compressed, named by a unique run id and indexed in index.jsonl;
+# the oldest runs are evicted past ARTIFACT_MAX_MB in total or ARTIFACT_MAX_DAYS of age.
+ARTIFACT_DIR = os.environ.get("SCRAPER_ARTIFACT_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "scraped_data"
+)
+ARTIFACT_MAX_MB = int(os.environ.get("SCRAPER_ARTIFACT_MAX_MB", "1024"))
+ARTIFACT_MAX_DAYS = float(os.environ.get("SCRAPER_ARTIFACT_MAX_DAYS", "30"))
+ARTIFACT_QUEUE_SIZE = int(os.environ.get("SCRAPER_ARTIFACT_QUEUE", "64"))
+_artifact_store = None
+
+# Set SCRAPER_INDEX_DB to a SQLite path to upsert every successful result into
+# the cohort index (courses, terms, grades, remaining requirements).
+INDEX_DB = os.environ.get("SCRAPER_INDEX_DB") or None
+_audit_index = None
+
+# Each parse gets SCRAPER_PARSE_BUDGET seconds; past it the result is returned as
+# "partial" (whatever was built so far). Larger audits are refused outright.
+PARSE_BUDGET_SECONDS = float(os.environ.get("SCRAPER_PARSE_BUDGET", "10"))
+MAX_HTML_CHARS = int(float(os.environ.get("SCRAPER_MAX_HTML_MB", "20")) * 1024 * 1024)
+
+def get_artifact_store():
+    """The process-wide ArtifactStore, created on first use."""
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore(
+            ARTIFACT_DIR,
+            max_bytes=ARTIFACT_MAX_MB * 1024 * 1024,
+            max_age_seconds=ARTIFACT_MAX_DAYS * 24 * 3600,
+            queue_size=ARTIFACT_QUEUE_SIZE,
+        )
+        # Scripts and the CLI exit right after parsing; let queued writes finish
+        atexit.register(_artifact_store.close)
+    return _artifact_store
+
+
+def store_artifacts(store, result, html_content, text_content):
+    """Queue the raw HTML, flattened text and parsed JSON; fills in the run id and file paths unless it was dropped."""
+    submitted = store.submit(html_content, text_content, result["json_preview"])
+    if submitted is None:
+        # Queue full: nothing will be written, so no paths to point at
+        return
+    run_id, paths = submitted
+    result["artifact_id"] = run_id
+    result["html_file"] = paths["html"]
+    result["txt_file"] = paths["txt"]
+    result["json_file"] = paths["json"]
+
+
+def get_audit_index():
+    """The process-wide AuditIndex, or None when SCRAPER_INDEX_DB is unset."""
+    global _audit_index
+    if _audit_index is None and INDEX_DB:
+        _audit_index = AuditIndex(INDEX_DB)
+    return _audit_index
+
+
+def audit_digest(html_content):
+    """SHA-256 of an audit's HTML: its index key when there is no student_id."""
+    return hashlib.sha256(html_content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def index_result(index, result, digest, student_id=None):
+    """Upsert a successful result; digest is audit_digest() of the HTML it was parsed from."""
+    if result.get("status") != "success" or not isinstance(result.get("json_preview"), dict):
+        return False
+    return index.upsert(student_id or digest, result["json_preview"], digest, PARSER_VERSION)
+
+
+def extract_metadata_from_html(html_content, rules=None):
+    """Regex fallback: scan the raw HTML once for every header metadata field of the profile."""
+    return (rules or load_rules()).html_matcher.extract(html_content)
+
+
+def parse_credits(s):
+    if not isinstance(s, str):
+        return 0.0
+    cleaned = s.replace("(", "").replace(")", "").strip()
     try:
-        # --- Prepare output directory ---
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        output_dir = os.path.join(base_dir, "scraped_data")
-        os.makedirs(output_dir, exist_ok=True)
-
-        # --- Create filenames ---
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        html_filename = os.path.join(output_dir, f"degreeworks_raw_{timestamp}.html")
-        txt_filename = os.path.join(output_dir, f"degreeworks_paragraphs_{timestamp}.txt")
-        json_filename = os.path.join(output_dir, f"degreeworks_data_{timestamp}.json")
-
-        # --- Save raw HTML ---
-        with open(html_filename, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        print(f"[DEBUG] Saved raw HTML to: {html_filename}")
-
-        # --- Parse the HTML using Selectolax ---
-        tree = HTMLParser(html_content)
-        
-        # Extract ALL text content
-        text_content = tree.text(separator="\n").strip()
-        
-        # Try to extract metadata directly from HTML elements
-        print("[DEBUG] Extracting metadata from HTML structure...")
-        
-        metadata = {}
-        # Look for common DegreeWorks metadata patterns in the HTML
-        html_lower = html_content.lower()
-        
-        # Extract Advisor
-        advisor_patterns = [
-            r'advisor[:\s]*([a-zA-Z\s]+?)(?:<|&|Vojislav Stojkovic)',
-            r'Advisor[:\s]*([a-zA-Z\s]+?)[\n<]',
-        ]
-        for pattern in advisor_patterns:
-            match = re.search(pattern, html_content, re.IGNORECASE)
-            if match:
-                advisor = match.group(1).strip()
-                if advisor and len(advisor) > 3 and advisor.lower() not in ['prerequisite', 'requirements']:
-                    metadata['advisor'] = advisor
+        return float(cleaned)
+    except ValueError:
+        return 0.0
+
+
+def extract_semester_info(term_str):
+    """Extract semester and year from term string"""
+    term_upper = term_str.upper()
+    semester_match = re.search(r'(FALL|SPRING|SUMMER|WINTER)\s+(\d{4})', term_upper)
+    if semester_match:
+        semester = semester_match.group(1)
+        year = int(semester_match.group(2))
+        return (semester, year, f"{semester} {year}")
+    return (None, None, None)
+
+
+# --- Embedded course records (courses that spilled into another course's Term field) ---
+# Every record starts with the same anchor. The complete form continues with
+# "Grade X Credits N [Term SEASON YEAR]" somewhere after the title; the truncated
+# form is a title of letters, spaces, "&" and "," that stops at the next Grade,
+# Course or line break.
+EMBEDDED_ANCHOR = re.compile(r'Course\s+([A-Z]+\s+\d+)\s+Title\s+', re.IGNORECASE)
+EMBEDDED_TAIL = re.compile(
+    r'\s+Grade\s+([A-Z]+)\s+Credits\s*(\d+\.?\d*)?(?:\s+Term\s+([A-Z]+\s+\d{4}))?', re.IGNORECASE
+)
+TRUNCATED_TITLE = re.compile(r'([A-Z\s&,]+?)(?:\s+Grade|\s+Course|\n|$)', re.IGNORECASE)
+SEMESTER_PATTERN = re.compile(r'(FALL|SPRING|SUMMER|WINTER)\s+(\d{4})', re.IGNORECASE)
+
+
+def extract_all_embedded_courses(term_text):
+    """
+    Extract ALL courses from term text, including both completed and IP.
+    Pattern: Course CODE Title TITLE Grade GRADE Credits NUMBER Term SEMESTER YEAR
+
+    One scan over the record anchors handles both forms. The next Grade/Credits
+    tail is looked up once and reused by every anchor before it, so text with
+    no tail left is never rescanned per record.
+    """
+    complete = []
+    truncated = []
+    complete_end = 0  # complete records never overlap
+    truncated_end = 0  # neither do truncated ones
+    tail = None
+    tail_searched_from = None
+    semester_info = None
+
+    for anchor in EMBEDDED_ANCHOR.finditer(term_text):
+        code = anchor.group(1).strip()
+        title_start = anchor.end()
+        title_keyword_end = title_start - len(anchor.group(0)) + len(anchor.group(0).rstrip())
+
+        # Complete form: "Title <anything, at least one char>" up to the first tail
+        if anchor.start() >= complete_end:
+            if tail_searched_from is None or (tail is not None and tail.start() < title_start + 1):
+                tail = EMBEDDED_TAIL.search(term_text, title_start + 1)
+                tail_searched_from = title_start + 1
+            match_title_start, match = title_start, tail
+            if match is None and title_start - title_keyword_end >= 3:
+                # The title may also be a single whitespace char inside a run of at
+                # least three before "Grade", as a backtracking regex would allow
+                match = EMBEDDED_TAIL.match(term_text, title_start - 1)
+                match_title_start = title_start - 2
+            if match is not None:
+                complete_end = match.end()
+                emb_credits = parse_credits(match.group(2) if match.group(2) else "3")
+                if emb_credits == 0.0:
+                    emb_credits = 3.0
+                emb_semester, emb_year, emb_full_term = None, None, None
+                if match.group(3):
+                    emb_semester, emb_year, emb_full_term = extract_semester_info(match.group(3))
+                complete.append({
+                    "code": code,
+                    "title": term_text[match_title_start:match.start()].strip(),
+                    "grade": match.group(1).strip().upper(),
+                    "credits": emb_credits,
+                    "semester": emb_semester,
+                    "year": emb_year,
+                    "full_term": emb_full_term
+                })
+
+        # Truncated form: letters-only title, no Grade/Credits shown
+        if anchor.start() >= truncated_end:
+            match = None
+            # Later starts inside the whitespace run are tried first, like the regex's backtracking
+            for start in range(title_start, title_keyword_end, -1):
+                match = TRUNCATED_TITLE.match(term_text, start)
+                if match is not None:
                     break
-        
-        # Extract Transfer Hours
-        transfer_match = re.search(r'Transfer\s+Hours[:\s]*(\d+)', html_content, re.IGNORECASE)
-        if transfer_match:
-            metadata['transfer_hours'] = int(transfer_match.group(1))
-        
-        # Extract Classification
-        class_match = re.search(r'Classification[:\s]*([\w\-]+)', html_content, re.IGNORECASE)
-        if class_match:
-            metadata['classification'] = class_match.group(1).strip()
-        
-        # Extract Major
-        major_match = re.search(r'Major[:\s]*(Computer Science)', html_content, re.IGNORECASE)
-        if major_match:
-            metadata['major'] = major_match.group(1).strip()
-        
-        # Extract Academic Standing
-        standing_match = re.search(r'Academic\s+Standing[:\s]*([\w\s]+?)(?:<|&|\n)', html_content, re.IGNORECASE)
-        if standing_match:
-            metadata['academic_standing'] = standing_match.group(1).strip()
-        
-        # Extract Graduation Application
-        grad_match = re.search(r'Graduation\s+Application[:\s]*(Applied for Graduation)', html_content, re.IGNORECASE)
-        if grad_match:
-            metadata['graduation_status'] = grad_match.group(1).strip()
-        
-        print(f"[DEBUG] Found metadata: {metadata}")
-
-        # --- Save extracted paragraph text ---
-        with open(txt_filename, "w", encoding="utf-8") as f:
-            f.write("=== Extracted Paragraphs from HTML ===\n\n")
-            f.write(text_content if text_content else "No text found.")
-        print(f"[DEBUG] Saved parsed text to: {txt_filename}")
-
-        # --- Convert extracted text into structured JSON ---
-        try:
-            json_data = parse_degreeworks_txt(txt_filename, json_filename)
-            print(f"[DEBUG] Converted text to JSON and saved to: {json_filename}")
-        except Exception as e:
-            print(f"[ERROR] Failed to convert text to JSON: {e}")
-            json_data = {"error": str(e)}
-
-        # ---------- Enhanced data extraction with ALL embedded courses ----------
-        if isinstance(json_data, dict):
-            sections = json_data.get("sections") or []
-
-            # Helper: parse numeric credits
-            def parse_credits(s):
-                if not isinstance(s, str):
-                    return 0.0
-                cleaned = s.replace("(", "").replace(")", "").strip()
-                try:
-                    return float(cleaned)
-                except ValueError:
-                    return 0.0
-
-            # Helper: extract semester/year from term string
-            def extract_semester_info(term_str):
-                """Extract semester and year from term string"""
-                term_upper = term_str.upper()
-                semester_match = re.search(r'(FALL|SPRING|SUMMER|WINTER)\s+(\d{4})', term_upper)
-                if semester_match:
-                    semester = semester_match.group(1)
-                    year = int(semester_match.group(2))
-                    return (semester, year, f"{semester} {year}")
-                return (None, None, None)
-
-            # Helper: extract ALL embedded courses from term field
-            def extract_all_embedded_courses(term_text):
-                """
-                Extract ALL courses from term text, including both completed and IP.
-                Pattern: Course CODE Title TITLE Grade GRADE Credits NUMBER Term SEMESTER YEAR
-                """
-                embedded = []
-                
-                # Pattern 1: Full pattern with Grade and Credits
-                # Matches: Course COSC 470 Title ARTIFICIAL INTELLIGENCE Grade A Credits 3 Term FALL 2024
-                pattern1 = r'Course\s+([A-Z]+\s+\d+)\s+Title\s+(.+?)\s+Grade\s+([A-Z]+)\s+Credits\s*(\d+\.?\d*)?(?:\s+Term\s+([A-Z]+\s+\d{4}))?'
-                
-                matches1 = re.finditer(pattern1, term_text, re.IGNORECASE | re.DOTALL)
-                
-                for match in matches1:
-                    emb_code = match.group(1).strip()
-                    emb_title = match.group(2).strip()
-                    emb_grade = match.group(3).strip().upper()
-                    emb_credits_str = match.group(4) if match.group(4) else "3"
-                    emb_term = match.group(5) if match.group(5) else None
-                    
-                    emb_credits = parse_credits(emb_credits_str)
-                    if emb_credits == 0.0:
-                        emb_credits = 3.0
-                    
-                    # Extract semester info from the embedded term
-                    emb_semester, emb_year, emb_full_term = None, None, None
-                    if emb_term:
-                        emb_semester, emb_year, emb_full_term = extract_semester_info(emb_term)
-                    
-                    embedded.append({
-                        "code": emb_code,
-                        "title": emb_title,
-                        "grade": emb_grade,
-                        "credits": emb_credits,
-                        "semester": emb_semester,
-                        "year": emb_year,
-                        "full_term": emb_full_term
-                    })
-                
-                # Pattern 2: Incomplete pattern (no Grade/Credits explicitly shown)
-                # Matches: Course MATH 331 Title APPLIED PROB (truncated, missing grade/credits)
-                # We'll infer these from context - if it's in a completed course's term field, assume grade A
-                pattern2 = r'Course\s+([A-Z]+\s+\d+)\s+Title\s+([A-Z\s&,]+?)(?:\s+Grade|\s+Course|\n|$)'
-                
-                matches2 = re.finditer(pattern2, term_text, re.IGNORECASE)
-                
-                # Track codes already found by pattern1
-                found_codes = {emb["code"] for emb in embedded}
-                
-                for match in matches2:
-                    emb_code = match.group(1).strip()
-                    emb_title = match.group(2).strip()
-                    
-                    # Skip if already found by pattern1
-                    if emb_code in found_codes:
-                        continue
-                    
-                    # Try to extract semester from the parent term_text
-                    semester_match = re.search(r'(FALL|SPRING|SUMMER|WINTER)\s+(\d{4})', term_text.upper())
-                    emb_semester, emb_year, emb_full_term = None, None, None
+            if match is not None:
+                truncated_end = match.end()
+                if semester_info is None:
+                    # The first season/year anywhere in the term text, looked up once
+                    semester_match = SEMESTER_PATTERN.search(term_text)
+                    semester_info = (None, None, None)
                     if semester_match:
-                        emb_semester = semester_match.group(1)
-                        emb_year = int(semester_match.group(2))
-                        emb_full_term = f"{emb_semester} {emb_year}"
-                    
-                    # Default to grade A and 3 credits for incomplete patterns
-                    # If no semester found, assume it's the same as the parent course
-                    embedded.append({
-                        "code": emb_code,
-                        "title": emb_title,
-                        "grade": "A",  # Assume completed with A if no grade shown
-                        "credits": 3.0,
-                        "semester": emb_semester,
-                        "year": emb_year,
-                        "full_term": emb_full_term,
-                        "needs_semester_inference": emb_full_term is None
-                    })
-                    
-                    print(f"[DEBUG]   Found incomplete pattern: {emb_code} - assuming grade A, 3 credits, term: {emb_full_term}")
-                
-                return embedded
-
-            # Dictionaries to store UNIQUE courses
-            completed_courses = {}
-            in_progress_courses = {}
-            
-            print(f"\n[DEBUG] ===== Extracting all UNIQUE courses =====")
-            
-            # First pass: collect all main courses (excluding transfer credits)
-            for sec in sections:
-                for c in sec.get("completed_courses", []):
-                    code = c.get("course", "").strip()
-                    if not code:
-                        continue
-                        
-                    title = c.get("title", "").strip()
-                    credits = c.get("credits", "0")
-                    grade = c.get("grade", "").upper().strip()
-                    term_text = c.get("term", "")
-                    
-                    # Skip transfer credits from previous colleges
-                    if grade in ["TRA", "TRB", "TRC"]:
-                        print(f"[DEBUG] Skipping transfer credit: {code} - Grade: {grade}")
-                        
-                    
-                    semester, year, full_term = extract_semester_info(term_text)
-                    credits_num = parse_credits(credits)
-                    
-                    course_record = {
-                        "course": code,
-                        "title": title,
-                        "credits": credits_num,
-                        "grade": grade,
-                        "semester": semester,
-                        "year": year,
-                        "full_term": full_term,
-                        "term_text": term_text
-                    }
-                    
-                    # Categorize by IP vs completed
-                    if grade == "IP":
-                        if code not in in_progress_courses:
-                            in_progress_courses[code] = course_record
-                            print(f"[DEBUG] Main IP: {code} - {full_term}")
-                    else:
-                        if code not in completed_courses:
-                            completed_courses[code] = course_record
-                            print(f"[DEBUG] Main completed: {code} - {full_term} - Grade: {grade}")
-
-            # Second pass: extract ALL embedded courses (both completed and IP)
-            print(f"\n[DEBUG] Searching for ALL embedded courses...")
-            
-            all_courses_list = list(completed_courses.values()) + list(in_progress_courses.values())
-            
-            for parent_course in all_courses_list:
-                term_text = parent_course.get("term_text", "")
-                if not term_text:
-                    continue
-                
-                embedded_courses = extract_all_embedded_courses(term_text)
-                
-                for emb in embedded_courses:
-                    emb_code = emb["code"]
-                    emb_grade = emb["grade"]
-                    
-                    # Skip if already in our lists
-                    if emb_code in completed_courses or emb_code in in_progress_courses:
-                        continue
-                    
-                    # Skip transfer credits from embedded courses too
-                    if emb_grade in ["TRA", "TRB", "TRC"]:
-                        print(f"[DEBUG] Skipping embedded transfer credit: {emb_code} - Grade: {emb_grade}")
-                        
-                    
-                    # If semester is missing, inherit from parent course
-                    if not emb["full_term"]:
-                        emb["semester"] = parent_course.get("semester")
-                        emb["year"] = parent_course.get("year")
-                        emb["full_term"] = parent_course.get("full_term")
-                        print(f"[DEBUG]   -> Inherited semester {emb['full_term']} from parent {parent_course.get('course')}")
-                    
-                    emb_record = {
-                        "course": emb_code,
-                        "title": emb["title"],
-                        "credits": emb["credits"],
-                        "grade": emb_grade,
-                        "semester": emb["semester"],
-                        "year": emb["year"],
-                        "full_term": emb["full_term"],
-                        "term_text": ""
-                    }
-                    
-                    if emb_grade == "IP":
-                        in_progress_courses[emb_code] = emb_record
-                        print(f"[DEBUG] Embedded IP: {emb_code} ({emb['title'][:30]}...) - {emb['full_term']}")
-                    else:
-                        completed_courses[emb_code] = emb_record
-                        print(f"[DEBUG] Embedded completed: {emb_code} ({emb['title'][:30]}...) - {emb['full_term']} - Grade: {emb_grade}")
-
-            # Build courses by semester
-            courses_by_semester = {}
-            
-            print(f"\n[DEBUG] Building semester breakdown...")
-            for course_dict in [completed_courses, in_progress_courses]:
-                for course in course_dict.values():
-                    full_term = course.get("full_term")
-                    course_code = course.get("course")
-                    if full_term:
-                        if full_term not in courses_by_semester:
-                            courses_by_semester[full_term] = {}
-                        courses_by_semester[full_term][course_code] = course
-                        print(f"[DEBUG]   Added {course_code} to {full_term}")
-
-            # Calculate totals (AFTER all embedded courses extracted, EXCLUDING transfer credits)
-            total_completed_credits = sum(c["credits"] for c in completed_courses.values())
-            total_msu_courses = len(completed_courses)  # Only courses taken at Morgan State
-            current_term_courses = sorted(list(in_progress_courses.keys()))
-            current_term_credits = sum(c["credits"] for c in in_progress_courses.values())
-
-            # Build semester list (sorted)
-            def semester_sort_key(term):
-                parts = term.split()
-                if len(parts) != 2:
-                    return (0, 0)
-                semester_order = {"SPRING": 1, "SUMMER": 2, "FALL": 3, "WINTER": 4}
-                year = int(parts[1])
-                semester_num = semester_order.get(parts[0], 0)
-                return (year, semester_num)
-            
-            sorted_semesters = sorted(courses_by_semester.keys(), key=semester_sort_key)
-            
-            # Build semester summary
-            semesters_data = []
-            for term in sorted_semesters:
-                courses = list(courses_by_semester[term].values())
-                semester_info = {
-                    "term": term,
-                    "courses": [
-                        {
-                            "course": c["course"],
-                            "title": c["title"],
-                            "credits": c["credits"],
-                            "grade": c["grade"]
-                        }
-                        for c in sorted(courses, key=lambda x: x["course"])
-                    ],
-                    "total_credits": sum(c["credits"] for c in courses),
-                    "course_count": len(courses)
-                }
-                semesters_data.append(semester_info)
-
-            # Store enhanced data
-            json_data["total_completed_credits"] = total_completed_credits
-            json_data["total_completed_courses"] = total_msu_courses  # Morgan State courses only
-            json_data["current_term"] = "FALL 2025"
-            json_data["current_term_courses"] = current_term_courses
-            json_data["current_term_credits"] = current_term_credits
-            json_data["semesters"] = semesters_data
-            
-            # Add metadata from HTML extraction
-            if metadata:
-                for key, value in metadata.items():
-                    json_data[key] = value
-            
-            # Ensure fields exist even if not found
-            if "advisor" not in json_data:
-                json_data["advisor"] = None
-            if "classification" not in json_data:
-                json_data["classification"] = None  
-            if "transfer_hours" not in json_data:
-                json_data["transfer_hours"] = None
-            if "major" not in json_data:
-                json_data["major"] = None
-            if "academic_standing" not in json_data:
-                json_data["academic_standing"] = None
-            if "graduation_status" not in json_data:
-                json_data["graduation_status"] = None
-            
-            json_data["completed_courses_list"] = [
-                {
-                    "course": c["course"],
-                    "title": c["title"],
-                    "credits": c["credits"],
-                    "grade": c["grade"],
-                    "term": c["full_term"]
-                }
-                for c in sorted(completed_courses.values(), key=lambda x: (x["year"] or 0, x["course"]))
-            ]
-            
-            json_data["in_progress_courses_list"] = [
-                {
-                    "course": c["course"],
-                    "title": c["title"],
-                    "credits": c["credits"],
-                    "term": c["full_term"]
-                }
-                for c in sorted(in_progress_courses.values(), key=lambda x: x["course"])
-            ]
-            
-            # Debug output
-            print(f"\n[DEBUG] ===== FINAL RESULTS =====")
-            print(f"[DEBUG] Total completed courses at Morgan State: {total_msu_courses}")
-            print(f"[DEBUG] Total in-progress courses: {len(in_progress_courses)}")
-            print(f"[DEBUG] Total completed credits at Morgan State: {total_completed_credits}")
-            print(f"[DEBUG] Current semester credits: {current_term_credits}")
-            print(f"\n[DEBUG] Semester breakdown (Morgan State only):")
-            for sem in semesters_data:
-                print(f"[DEBUG]   {sem['term']}: {sem['course_count']} courses, {sem['total_credits']} credits")
-            print(f"[DEBUG] ===========================\n")
-        # --------------------------------------------------------------------
+                        semester = semester_match.group(1).upper()
+                        year = int(semester_match.group(2))
+                        semester_info = (semester, year, f"{semester} {year}")
+                truncated.append((code, match.group(1).strip()))
+
+    # Truncated records only count for codes that have no complete record
+    # Default to grade A and 3 credits for incomplete patterns
+    found_codes = {emb["code"] for emb in complete}
+    embedded = complete
+    for code, title in truncated:
+        if code in found_codes:
+            continue
+        emb_semester, emb_year, emb_full_term = semester_info
+        embedded.append({
+            "code": code,
+            "title": title,
+            "grade": "A",  # Assume completed with A if no grade shown
+            "credits": 3.0,
+            "semester": emb_semester,
+            "year": emb_year,
+            "full_term": emb_full_term,
+            "needs_semester_inference": emb_full_term is None
+        })
+        logger.debug("Found incomplete pattern: %s - assuming grade A, 3 credits, term: %s", code, emb_full_term)
+
+    return embedded
+
+
+def collect_main_courses(main_courses, rules=None):
+    """First pass: bucket the main course records into a CourseSet of unique completed and in-progress courses."""
+    rules = rules or load_rules()
+    course_set = CourseSet(rules.in_progress_grades)
+
+    # Checked once so the per-course loop skips the logging calls entirely when off
+    debug = logger.isEnabledFor(logging.DEBUG)
+    logger.debug("Extracting all unique courses from %d rows", len(main_courses))
+
+    for c in main_courses:
+        code = c.get("course", "").strip()
+        if not code:
+            continue
+
+        grade = c.get("grade", "").upper().strip()
+        term_text = c.get("term", "")
+
+        # Skip transfer credits from previous colleges
+        if grade in rules.transfer_grades and debug:
+            logger.debug("Skipping transfer credit: %s - Grade: %s", code, grade)
+
+        semester, year, full_term = extract_semester_info(term_text)
+        course = Course(
+            code,
+            c.get("title", "").strip(),
+            parse_credits(c.get("credits", "0")),
+            grade,
+            term_key(semester, year),
+            term_text,
+        )
+
+        # Categorize by IP vs completed
+        if course_set.add(course) and debug:
+            logger.debug("Main %s: %s - %s - Grade: %s",
+                         "IP" if grade in rules.in_progress_grades else "completed", code, full_term, grade)
+
+    return course_set
+
+
+def add_embedded_courses(course_set, rules=None):
+    """Second pass: pull courses that spilled into another course's term text into the CourseSet."""
+    rules = rules or load_rules()
+    debug = logger.isEnabledFor(logging.DEBUG)
+    logger.debug("Searching for embedded courses...")
+
+    # Identical term texts (e.g. every course of one term in DOM mode) yield the
+    # same embedded courses, which are all in the set after the first scan
+    scanned = set()
+    for parent_course in list(course_set):
+        term_text = parent_course.term_text
+        # The raw Term field is not needed past this point
+        parent_course.term_text = None
+        if not term_text or term_text in scanned:
+            continue
+        scanned.add(term_text)
+        check_budget("embedded_extraction")
+
+        embedded_courses = extract_all_embedded_courses(term_text)
+
+        for emb in embedded_courses:
+            emb_code = emb["code"]
+            emb_grade = emb["grade"]
+
+            # Skip if already in our lists
+            if emb_code in course_set:
+                continue
+
+            # Skip transfer credits from embedded courses too
+            if emb_grade in rules.transfer_grades and debug:
+                logger.debug("Skipping embedded transfer credit: %s - Grade: %s", emb_code, emb_grade)
+
+            # If semester is missing, inherit from parent course
+            term = term_key(emb["semester"], emb["year"]) if emb["full_term"] else None
+            if term is None:
+                term = parent_course.term
+                if debug:
+                    logger.debug("Inherited semester %s from parent %s", parent_course.full_term, parent_course.code)
+
+            course = Course(emb_code, emb["title"], emb["credits"], emb_grade, term, None)
+            course_set.add(course)
+            if debug:
+                logger.debug("Embedded %s: %s (%.30s...) - %s - Grade: %s",
+                             "IP" if emb_grade in rules.in_progress_grades else "completed",
+                             emb_code, course.title, course.full_term, emb_grade)
+
+
+def latest_term(courses):
+    """Label of the latest term among courses, for profiles that leave current_term unset."""
+    terms = [c.term for c in courses if c.term]
+    return term_label(max(terms)) if terms else None
+
+
+# The json_preview keys course_summary fills in; a streamed parse sends them last, as "summary"
+SUMMARY_FIELDS = (
+    "total_completed_credits", "total_completed_courses", "current_term", "current_term_courses",
+    "current_term_credits", "semesters", "completed_courses_list", "in_progress_courses_list",
+)
+
 
+def course_summary(course_set, rules=None):
+    """Semester aggregation: totals, the per-term breakdown and the flat course lists, as a dict."""
+    rules = rules or load_rules()
+    check_budget("aggregation")
+    logger.debug("Building semester breakdown...")
+
+    # Calculate totals (AFTER all embedded courses extracted, EXCLUDING transfer credits)
+    summary = {
+        "total_completed_credits": course_set.completed_credits(),
+        "total_completed_courses": len(course_set.completed),  # Morgan State courses only
+        "current_term": rules.current_term or latest_term(course_set.in_progress.values()),
+        "current_term_courses": sorted(course_set.in_progress),
+        "current_term_credits": course_set.in_progress_credits(),
+        "semesters": course_set.semesters(),
+        "completed_courses_list": course_set.completed_list(),
+        "in_progress_courses_list": course_set.in_progress_list(),
+    }
+
+    # Debug output
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Final results: %d completed courses, %d in progress, %s completed credits, %s current credits",
+            summary["total_completed_courses"], len(course_set.in_progress),
+            summary["total_completed_credits"], summary["current_term_credits"],
+        )
+        for sem in summary["semesters"]:
+            logger.debug("  %s: %d courses, %s credits", sem["term"], sem["course_count"], sem["total_credits"])
+    return summary
+
+
+def scrape_degreeworks(html_content: str, save_artifacts=None, profile=None, time_budget=None, student_id=None):
+    if save_artifacts is None:
+        save_artifacts = SAVE_ARTIFACTS
+
+    result, text_content = parse_audit_html(html_content, profile, time_budget)
+
+    # --- Optional artifact sink, written by a background thread ---
+    if save_artifacts and result["status"] == "success":
+        store_artifacts(get_artifact_store(), result, html_content, text_content)
+    # --- Optional cohort index ---
+    index = get_audit_index()
+    if index is not None:
+        index_result(index, result, audit_digest(html_content), student_id)
+    return result
+
+
+class ResultBuilder:
+    """Assembles the result dict of parse_audit_html from iter_audit_html's events, fed in order."""
+
+    def __init__(self):
+        self.text = None
+        self.preview = None
+        self.end = None
+
+    def add(self, event, payload):
+        if event == "text":
+            self.text = payload
+        elif event == "metadata":
+            self.preview = {**payload, "sections": []}
+        elif event == "section":
+            self.preview["sections"].append(payload)
+        elif event == "section_hashes":
+            self.preview["section_hashes"] = payload
+        elif event == "summary":
+            self.preview.update(payload)
+        elif event == "end":
+            self.end = payload
+
+    def result(self):
+        if self.end["status"] == "failed":
+            return self.end
         return {
-    "status": "success",
-    "html_file": html_filename,
-    "txt_file": txt_filename,
-    "json_file": json_filename,
-    "json_preview": json_data if isinstance(json_data, dict) else None,
-}
+            **self.end,
+            "artifact_id": None,
+            "html_file": None,
+            "txt_file": None,
+            "json_file": None,
+            "json_preview": self.preview,
+        }
+
+
+def parse_audit_html(html_content, profile=None, time_budget=None, previous_sections=None):
+    """
+    Parse one audit in memory; returns (result, flattened text) without touching the disk.
+
+    Runs under time_budget seconds (SCRAPER_PARSE_BUDGET by default, 0 for no
+    limit). When it runs out the result has status "partial": the stage that
+    was cut short and whatever had been built by then. previous_sections is
+    passed on to iter_degreeworks_text for incremental re-parses.
+    """
+    builder = ResultBuilder()
+    for event, payload in iter_audit_html(html_content, profile, time_budget, previous_sections):
+        builder.add(event, payload)
+    result = builder.result()
+    return result, None if result["status"] == "failed" else builder.text
+
+
+def iter_audit_html(html_content, profile=None, time_budget=None, previous_sections=None):
+    """
+    Generator version of parse_audit_html: yields (event, payload) pairs as soon as each part is ready.
+
+    In order: "text" (the flattened text, for the caller's artifacts and not
+    meant for clients), "metadata" (every header field), one "section" per requirement block as it is parsed,
+    "section_hashes" (only with previous_sections), "summary" (totals,
+    semesters and course lists) and always a last "end": {"status": ...},
+    plus "error" and, for "partial", the "stage" the budget ran out in. The
+    budget runs in wall-clock time, including while the consumer holds the
+    generator.
+    """
+    if time_budget is None:
+        time_budget = PARSE_BUDGET_SECONDS
+
+    if len(html_content) > MAX_HTML_CHARS:
+        logger.warning("Refusing audit of %d chars (limit %d)", len(html_content), MAX_HTML_CHARS)
+        yield "end", {
+            "error": f"Audit HTML too large ({len(html_content)} chars, limit {MAX_HTML_CHARS})",
+            "status": "failed",
+        }
+        return
+
+    # Compiled once per profile and process; see rules.py
+    rules = load_rules(profile) if profile else load_rules()
+    try:
+        with parse_budget(time_budget):
+            # --- Parse the HTML using Selectolax ---
+            with stage("dom_parse"):
+                tree = HTMLParser(html_content)
+
+            # Extract ALL text content
+            with stage("text_flatten"):
+                text_content = tree.text(separator="\n").strip()
+            yield "text", text_content
+
+            with stage("metadata"):
+                metadata = extract_metadata_from_html(html_content, rules)
+
+            logger.debug("Found metadata: %s", metadata)
+
+            # --- Convert extracted text into structured JSON, one section at a time ---
+            # Timed here rather than with stage() so the time the consumer spends
+            # between sections is left out
+            sections = []
+            parse_seconds = 0.0
+            events = iter_degreeworks_text(text_content, None, previous_sections, rules)
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        event, payload = next(events)
+                    except StopIteration:
+                        break
+                    finally:
+                        parse_seconds += time.perf_counter() - started
+                    if event == "metadata":
+                        payload.update(metadata)
+                    elif event == "section":
+                        sections.append(payload)
+                    yield event, payload
+            finally:
+                record_stage("section_parse", parse_seconds)
+
+            # ---------- Enhanced data extraction with ALL embedded courses ----------
+            # First pass: collect all main courses (excluding transfer credits)
+            main_courses = [c for sec in sections for c in sec.get("completed_courses", [])]
+            with stage("embedded_extraction"):
+                course_set = collect_main_courses(main_courses, rules)
 
+                # Second pass: extract ALL embedded courses (both completed and IP)
+                add_embedded_courses(course_set, rules)
 
+            with stage("aggregation"):
+                summary = course_summary(course_set, rules)
+            # --------------------------------------------------------------------
+        yield "summary", summary
+        yield "end", {"status": "success"}
+
+    except BudgetExceeded as e:
+        logger.warning("Partial result for audit of %d chars: %s", len(html_content), e)
+        yield "end", {"status": "partial", "error": str(e), "stage": e.stage}
+
+    except Exception as e:
+        logger.exception("scrape_degreeworks() failed: %s", e)
+        yield "end", {"error": str(e), "status": "failed"}
+
+
+def stream_audit_html(conn, html_content, profile=None, time_budget=None):
+    """
+    Worker side of a streamed parse: sends each event of iter_audit_html over
+    conn (the sending end of a multiprocessing Pipe) as soon as it is ready.
+
+    The flattened text stays out of the stream; it comes last, with the stage
+    timings, as ("done", (timings, text)). Stops early if the reading end is
+    closed.
+    """
+    text_content = None
+    try:
+        with collect_stages() as timings:
+            for event, payload in iter_audit_html(html_content, profile, time_budget):
+                if event == "text":
+                    text_content = payload
+                else:
+                    conn.send((event, payload))
+        conn.send(("done", (timings, text_content)))
+    except OSError as e:
+        logger.warning("Streamed parse abandoned: %s", e)
+
+
+def scrape_degreeworks_timed(html_content, profile=None, time_budget=None):
+    """
+    Worker-side parse for callers in another process: (result, {stage: seconds}, text).
+
+    Artifacts are left to the caller, so a single process owns each store and
+    its index; the flattened text comes back for that.
+    """
+    with collect_stages() as timings:
+        result, text_content = parse_audit_html(html_content, profile, time_budget)
+    return result, timings, text_content
+
+
+def scrape_degreeworks_incremental(html_content, previous_sections, profile=None, time_budget=None):
+    """
+    Worker-side re-parse against a previous snapshot: (result, timings, text, section hashes).
+
+    Sections whose text hash is a key of previous_sections ({hash: section},
+    see json_convert.section_hash) are reused as they are; only the rest are
+    parsed. The hashes, one per section of the result, key the next round.
+    """
+    with collect_stages() as timings:
+        result, text_content = parse_audit_html(html_content, profile, time_budget, previous_sections or {})
+    preview = result.get("json_preview")
+    section_hashes = preview.pop("section_hashes", None) if isinstance(preview, dict) else None
+    return result, timings, text_content, section_hashes
+
+
+def audit_section_hashes(html_content, profile=None):
+    """
+    Worker-side: the section hashes scrape_degreeworks_incremental would return
+    for this audit, without parsing the sections (for a result that came from
+    the cache).
+    """
+    rules = load_rules(profile) if profile else load_rules()
+    text_content = HTMLParser(html_content).text(separator="\n").strip()
+    return [
+        section_hash(text_content[start:end]) for _, start, end in split_sections(text_content, rules.section_headers)
+    ]
+
+
+def _scrape_batch_item(html_content, profile, time_budget):
+    try:
+        return parse_audit_html(html_content, profile, time_budget)
     except Exception as e:
-        print(f"[ERROR] scrape_degreeworks() failed: {e}")
-        return {"error": str(e), "status": "failed"}
\ No newline at end of file
+        return {"error": str(e), "status": "failed"}, None
+
+
+def scrape_degreeworks_batch(html_documents, workers=None, save_artifacts=None, profile=None, time_budget=None):
+    """
+    Parse many audits in parallel across worker processes.
+
+    Every document gets its own entry in "results" (same order as the input),
+    so one bad audit never fails the batch. save_artifacts, profile
+    and time_budget apply to every document, as in scrape_degreeworks;
+    results are indexed by content hash (there are no student ids here).
+    """
+    html_documents = list(html_documents)
+    if save_artifacts is None:
+        save_artifacts = SAVE_ARTIFACTS
+    started = time.perf_counter()
+
+    audit_index = get_audit_index()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_scrape_batch_item, doc, profile, time_budget) for doc in html_documents]
+        for index, future in enumerate(futures):
+            try:
+                result, text_content = future.result()
+            except Exception as e:
+                # e.g. the worker process died while parsing this document
+                result, text_content = {"error": str(e), "status": "failed"}, None
+            # Artifacts are queued here, in the parent, which owns the store
+            if save_artifacts and result["status"] == "success":
+                store_artifacts(get_artifact_store(), result, html_documents[index], text_content)
+            if audit_index is not None:
+                index_result(audit_index, result, audit_digest(html_documents[index]))
+            result["index"] = index
+            results.append(result)
+
+    return {
+        "results": results,
+        "stats": batch_stats([len(doc) for doc in html_documents], results, time.perf_counter() - started),
+    }
+
+
+def batch_stats(document_lengths, results, elapsed):
+    """Aggregate throughput numbers for a batch run; document_lengths holds each document's size in chars."""
+    total_chars = sum(document_lengths)
+    succeeded = sum(1 for r in results if r.get("status") == "success")
+    partial = sum(1 for r in results if r.get("status") == "partial")
+    return {
+        "documents": len(document_lengths),
+        "succeeded": succeeded,
+        "partial": partial,
+        "failed": len(results) - succeeded - partial,
+        "elapsed_seconds": round(elapsed, 4),
+        "documents_per_second": round(len(document_lengths) / elapsed, 2) if elapsed else None,
+        "megabytes_per_second": round(total_chars / 1e6 / elapsed, 2) if elapsed else None,
+    }
@@ -1,12 +1,722 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from scraper2 import scrape_degreeworks
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from scraper2 import (
+    scrape_degreeworks, scrape_degreeworks_timed, scrape_degreeworks_incremental, audit_section_hashes,
+    stream_audit_html, batch_stats, get_artifact_store, store_artifacts, get_audit_index, index_result, audit_digest,
+    ResultBuilder, PARSER_VERSION, SAVE_ARTIFACTS, SUMMARY_FIELDS, ARTIFACT_DIR,
+)
+from audit_index import label_term, normalize_code
+from rules import DEFAULT_PROFILE, load_rules
+from cache import ResultCache, content_key
+from delta import diff_results
+from jobs import FINISHED, JobQueue, JobQueueFull
+from views import project_preview, project_result, resolve_fields
+from metrics import (
+    AUDIT_CHARS, JOB_SECONDS, JOBS, REQUEST_BYTES, REQUEST_SECONDS, REQUESTS, SECTIONS, SNAPSHOT_RESPONSES,
+    observe_stages, record_stage, render_metrics,
+)
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from multiprocessing import Pipe
+import asyncio
+import codecs
+import hashlib
 import html
+import logging
 import os
+import re
 import json
+import socket
+import time
+import zlib
+
+try:
+    import brotli  # optional, only needed for Content-Encoding: br
+except ImportError:
+    brotli = None
+
+try:
+    import orjson  # optional, faster response encoding
+except ImportError:
+    orjson = None
+
+try:
+    from analytics import Cohort  # optional, needs numpy
+except ImportError:
+    Cohort = None
+
+# --- Logging: SCRAPER_LOG_LEVEL=DEBUG brings back the per-course trace ---
+logging.basicConfig(
+    level=os.environ.get("SCRAPER_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+logger = logging.getLogger("server")
+
+# --- Worker pool: CPU-bound parsing runs off the event loop ---
+POOL_KIND = os.environ.get("SCRAPER_POOL", "process")  # "process" or "thread"
+POOL_WORKERS = int(os.environ.get("SCRAPER_WORKERS", str(os.cpu_count() or 1)))
+# Parses queued or running at once; past this /scrape answers 503 right away
+QUEUE_LIMIT = int(os.environ.get("SCRAPER_QUEUE_LIMIT", str(POOL_WORKERS * 4)))
+SCRAPE_TIMEOUT = float(os.environ.get("SCRAPER_TIMEOUT", "30"))
+# Largest /scrape/batch request, and how many of its documents may use the pool
+# at once (half the queue, so interactive /scrape calls still get through)
+BATCH_LIMIT = int(os.environ.get("SCRAPER_BATCH_LIMIT", "500"))
+BATCH_CONCURRENCY = max(1, QUEUE_LIMIT // 2)
+
+# --- Ingestion ---
+# Largest accepted audit after decompression
+MAX_BODY_BYTES = int(os.environ.get("SCRAPER_MAX_BODY_MB", "20")) * 1024 * 1024
+# Set SCRAPER_DEBUG_DUMP=1 to keep a copy of the last received audit in testwrite/
+DEBUG_DUMP = os.environ.get("SCRAPER_DEBUG_DUMP", "0") == "1"
+
+# --- Responses: gzip when the client accepts it and the body is big enough ---
+GZIP_MIN_BYTES = int(os.environ.get("SCRAPER_GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("SCRAPER_GZIP_LEVEL", "6"))
+
+# --- Durable jobs: POST /jobs queues the audit in SQLite; JOB_WORKERS tasks per process drain it ---
+# The file is only created by the first POST /jobs; until then workers just check that it exists
+JOBS_DB = os.environ.get("SCRAPER_JOBS_DB") or os.path.join(ARTIFACT_DIR, "jobs.db")
+# 0 makes this process accept jobs without running any (another process sharing JOBS_DB does)
+JOB_WORKERS = int(os.environ.get("SCRAPER_JOB_WORKERS", str(POOL_WORKERS)))
+# Keep the lease above SCRAPER_TIMEOUT: a job still running when it ends is claimed again
+JOB_LEASE_SECONDS = float(os.environ.get("SCRAPER_JOB_LEASE", "120"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("SCRAPER_JOB_ATTEMPTS", "3"))
+JOB_QUEUE_LIMIT = int(os.environ.get("SCRAPER_JOB_QUEUE_LIMIT", "10000"))
+JOB_TTL_SECONDS = int(os.environ.get("SCRAPER_JOB_TTL", str(7 * 24 * 3600)))
+# Idle workers look for jobs from other processes (and lapsed leases) this often
+JOB_POLL_SECONDS = float(os.environ.get("SCRAPER_JOB_POLL", "1"))
+
+executor = None
+pending_jobs = 0
+# Set (and replaced) whenever a pool slot frees up, for batch items waiting on capacity
+slot_freed = None
+job_queue = None
+job_queue_lock = asyncio.Lock()
+job_workers = []
+# Set by POST /jobs so an idle worker here picks the job up without waiting for its poll
+jobs_waiting = None
+
+
+class QueueFull(Exception):
+    pass
+
+
+WORKER_CRASHED = "A parse worker crashed, please retry"
+
+
+def make_executor():
+    if POOL_KIND == "thread":
+        return ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="scraper")
+    return ProcessPoolExecutor(max_workers=POOL_WORKERS)
+
+
+def release_slot():
+    global pending_jobs
+    pending_jobs -= 1
+    if slot_freed is not None:
+        slot_freed.set()
+
+
+async def wait_for_slot():
+    """Wait until the worker pool has room for another parse."""
+    global slot_freed
+    while pending_jobs >= QUEUE_LIMIT:
+        if slot_freed is None or slot_freed.is_set():
+            slot_freed = asyncio.Event()
+        await slot_freed.wait()
+
+
+def submit_to_pool(fn, *args):
+    """Start fn(*args) on the worker pool, holding a queue slot until it finishes; returns an asyncio future."""
+    global executor, pending_jobs
+    if pending_jobs >= QUEUE_LIMIT:
+        raise QueueFull()
+
+    loop = asyncio.get_running_loop()
+    try:
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); drop whatever the old pool still holds
+        # and start a fresh one. Futures already running on it fail with BrokenProcessPool.
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = make_executor()
+        future = executor.submit(fn, *args)
+
+    # The slot is held until the work really finishes, even after a timeout
+    def on_done(_):
+        try:
+            loop.call_soon_threadsafe(release_slot)
+        except RuntimeError:
+            pass  # event loop already closed at shutdown
+
+    pending_jobs += 1
+    future.add_done_callback(on_done)
+    return asyncio.wrap_future(future)
+
+
+async def run_in_pool(fn, *args):
+    """Run fn(*args) on the worker pool with backpressure and a timeout."""
+    return await asyncio.wait_for(submit_to_pool(fn, *args), SCRAPE_TIMEOUT)
+
+
+async def get_job_queue(create=False):
+    """The durable job queue, opened on first use; None while JOBS_DB doesn't exist, unless create is set."""
+    global job_queue
+    if job_queue is None and (create or os.path.exists(JOBS_DB)):
+        async with job_queue_lock:
+            if job_queue is None:
+                os.makedirs(os.path.dirname(os.path.abspath(JOBS_DB)), exist_ok=True)
+                job_queue = await asyncio.to_thread(
+                    JobQueue, JOBS_DB, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS,
+                    max_queued=JOB_QUEUE_LIMIT, ttl_seconds=JOB_TTL_SECONDS,
+                )
+    return job_queue
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global executor, jobs_waiting
+    executor = make_executor()
+    jobs_waiting = asyncio.Event()
+    job_workers[:] = [asyncio.create_task(job_worker(number)) for number in range(JOB_WORKERS)]
+    yield
+    # Jobs cut short here go back to the queue for the next start
+    for task in job_workers:
+        task.cancel()
+    await asyncio.gather(*job_workers, return_exceptions=True)
+    executor.shutdown(wait=False, cancel_futures=True)
+    if SAVE_ARTIFACTS:
+        # Let queued artifact writes land before exiting
+        await asyncio.to_thread(get_artifact_store().close)
+
+
+class FastJSONResponse(JSONResponse):
+    """Compact JSON, encoded with orjson when it is installed."""
+
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content)
+        return super().render(content)
+
+
+def retry_later(error="Server is busy, please retry shortly", **body):
+    """503 for a full pool or a crashed pool worker; both clear up within a second or so."""
+    return FastJSONResponse({"error": error, **body}, status_code=503, headers={"Retry-After": "1"})
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# --- Result cache: repeated submissions of the same audit skip the parse ---
+result_cache = ResultCache(
+    max_entries=int(os.environ.get("SCRAPER_CACHE_ENTRIES", "128")),
+    disk_dir=os.environ.get("SCRAPER_CACHE_DIR") or None,
+    max_disk_bytes=int(os.environ.get("SCRAPER_CACHE_DISK_MB", "256")) * 1024 * 1024,
+    ttl_seconds=int(os.environ.get("SCRAPER_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+
+# --- Student snapshots: the last successful result per student_id, for delta responses ---
+snapshot_cache = ResultCache(
+    max_entries=int(os.environ.get("SCRAPER_SNAPSHOT_ENTRIES", "1024")),
+    disk_dir=os.environ.get("SCRAPER_SNAPSHOT_DIR") or None,
+    max_disk_bytes=int(os.environ.get("SCRAPER_SNAPSHOT_DISK_MB", "512")) * 1024 * 1024,
+    ttl_seconds=int(os.environ.get("SCRAPER_SNAPSHOT_TTL", str(90 * 24 * 3600))),
+)
+
+
+def finish_parse(result, timings, cleaned_html, text_content):
+    # Stage timings come back with the result since the parse may run in another process
+    observe_stages(timings)
+    # Artifacts are written by this process's background writer, not the pool workers
+    if SAVE_ARTIFACTS and result["status"] == "success":
+        store_artifacts(get_artifact_store(), result, cleaned_html, text_content)
+    return result
+
+
+async def timed_scrape(cleaned_html):
+    result, timings, text_content = await run_in_pool(scrape_degreeworks_timed, cleaned_html)
+    return finish_parse(result, timings, cleaned_html, text_content)
+
+
+AUDIT_KEY = re.compile(r"[0-9a-f]{64}")
+# Editing the profile's rules file changes every key, like a PARSER_VERSION bump
+RULES_DIGEST = load_rules().digest
+
+
+def audit_key(cleaned_html):
+    return content_key(cleaned_html, PARSER_VERSION, DEFAULT_PROFILE, RULES_DIGEST)
+
+
+def is_success(result):
+    return result.get("status") == "success"
+
+
+async def index_audit(result, cleaned_html, student_id=None):
+    """Upsert a successful result into the cohort index (off the event loop) when one is configured."""
+    index = get_audit_index()
+    if index is not None and is_success(result):
+        await asyncio.to_thread(index_result, index, result, audit_digest(cleaned_html), student_id)
+
+
+async def cached_scrape(cleaned_html, key=None):
+    return await result_cache.aget_or_compute(
+        key or audit_key(cleaned_html), lambda: timed_scrape(cleaned_html), store_if=is_success,
+    )
+
+
+# --- ETags: the audit key (content hash + parser version, profile), plus the projection ---
+def make_etag(key, fields=None):
+    if fields is None:
+        return f'"{key}"'
+    projection = hashlib.sha256(",".join(sorted(fields)).encode("utf-8")).hexdigest()[:8]
+    return f'"{key}.{projection}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        # No "*": on /scrape it would skip the parse for content the client never saw
+        if tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def snapshot_sections(snapshot):
+    """{section hash: section} of a stored snapshot, for reuse by the incremental parse."""
+    if snapshot is None or not snapshot.get("section_hashes"):
+        return {}
+    sections = snapshot["result"]["json_preview"].get("sections") or []
+    if len(sections) != len(snapshot["section_hashes"]):
+        return {}
+    return dict(zip(snapshot["section_hashes"], sections))
+
+
+async def delta_scrape(cleaned_html, student_id, base=None, key=None):
+    """
+    Parse an audit for a known student and answer with a delta from their last snapshot.
+
+    Only sections whose text changed since the snapshot are parsed again. The
+    body is a delta when the server holds a snapshot and it is the one the
+    client says it has (base, when given); otherwise it is the full result.
+    Either way "snapshot" names the version the client holds afterwards.
+    """
+    key = key or audit_key(cleaned_html)
+    student_key = content_key(student_id, "snapshot", PARSER_VERSION, DEFAULT_PROFILE, RULES_DIGEST)
+    snapshot = await asyncio.to_thread(snapshot_cache.get, student_key)
+
+    if snapshot is not None and snapshot["id"] == key:
+        result, section_hashes = snapshot["result"], snapshot["section_hashes"]
+    else:
+        previous_sections = snapshot_sections(snapshot)
+        section_hashes = None
+
+        async def incremental_scrape():
+            nonlocal section_hashes
+            result, timings, text_content, section_hashes = await run_in_pool(
+                scrape_degreeworks_incremental, cleaned_html, previous_sections,
+            )
+            if section_hashes:
+                reused = sum(1 for h in section_hashes if h in previous_sections)
+                SECTIONS.inc(reused, outcome="reused")
+                SECTIONS.inc(len(section_hashes) - reused, outcome="parsed")
+            return finish_parse(result, timings, cleaned_html, text_content)
+
+        result = await result_cache.aget_or_compute(key, incremental_scrape, store_if=is_success)
+        if section_hashes is None and is_success(result):
+            # From the cache or another request's parse: hash the sections so the next round can reuse them
+            section_hashes = await run_in_pool(audit_section_hashes, cleaned_html)
+
+    if not is_success(result):
+        # The snapshot stays as it was; the client keeps its own copy too
+        SNAPSHOT_RESPONSES.inc(mode="full")
+        return {"status": "success", "mode": "full", "data": result}
+    await index_audit(result, cleaned_html, student_id)
+
+    if snapshot is None or snapshot["id"] != key:
+        new_snapshot = {"id": key, "result": result, "section_hashes": section_hashes}
+        await asyncio.to_thread(snapshot_cache.put, student_key, new_snapshot)
+
+    if snapshot is None or (base and base != snapshot["id"]):
+        SNAPSHOT_RESPONSES.inc(mode="full")
+        return {"status": "success", "mode": "full", "snapshot": key, "data": result}
+
+    data = {k: v for k, v in result.items() if k != "json_preview"}
+    data["delta"] = await asyncio.to_thread(diff_results, snapshot["result"]["json_preview"], result["json_preview"])
+    SNAPSHOT_RESPONSES.inc(mode="delta")
+    return {"status": "success", "mode": "delta", "base": snapshot["id"], "snapshot": key, "data": data}
+
+
+# --- Job workers ---
+async def job_worker(number):
+    """Claim jobs from the queue one at a time until cancelled; purges old jobs now and then."""
+    worker = f"{socket.gethostname()}:{os.getpid()}:{number}"
+    last_purge = 0.0
+    while True:
+        jobs_waiting.clear()
+        queue = await get_job_queue()
+        job = None
+        if queue is not None:
+            try:
+                job = await asyncio.to_thread(queue.claim, worker)
+            except Exception as e:
+                logger.exception("Could not claim a job: %s", e)
+        if job is not None:
+            await run_job(job)
+            continue
+        if number == 0 and queue is not None and time.time() - last_purge > 3600:
+            last_purge = time.time()
+            purged = await asyncio.to_thread(queue.purge)
+            if purged:
+                logger.info("Purged %d finished jobs", purged)
+        try:
+            await asyncio.wait_for(jobs_waiting.wait(), JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_job(job):
+    """
+    Parse one claimed job like /scrape does (cache, pool, artifacts, index) and
+    store the result. A crashed worker process sends the job back to the queue
+    for another attempt. A timeout is final: the parse keeps its pool worker
+    until it ends, so retrying would only stack more copies of a slow audit on
+    the pool. So is a parse that fails on its own.
+    """
+    started = time.time()
+    JOB_SECONDS.observe(started - job["submitted"], phase="queued")
+    try:
+        key = audit_key(job["html"])
+        result = await asyncio.to_thread(result_cache.get, key)
+        timings = {}
+        if result is None:
+            result, timings, text_content = await run_in_pool(scrape_degreeworks_timed, job["html"])
+            finish_parse(result, timings, job["html"], text_content)
+            if is_success(result):
+                await asyncio.to_thread(result_cache.put, key, result)
+        await index_audit(result, job["html"], job["student_id"])
+        status = await asyncio.to_thread(job_queue.complete, job["id"], result, timings)
+    except QueueFull:
+        # The pool is busy with interactive requests; hand the job back and give them room
+        await asyncio.to_thread(job_queue.release, job["id"])
+        await asyncio.sleep(JOB_POLL_SECONDS)
+        return
+    except asyncio.CancelledError:
+        await asyncio.to_thread(job_queue.release, job["id"])
+        raise
+    except BrokenProcessPool:
+        # Counts as an attempt, so an audit that keeps killing its worker ends up failed
+        status = await asyncio.to_thread(job_queue.retry, job["id"], WORKER_CRASHED)
+        logger.warning("Job %s attempt %d: pool worker crashed; now %s", job["id"], job["attempts"], status)
+        status = "retried" if status == "queued" else status
+    except asyncio.TimeoutError:
+        error = f"Parsing took longer than {SCRAPE_TIMEOUT:g}s"
+        status = await asyncio.to_thread(job_queue.fail, job["id"], error)
+        logger.warning("Job %s attempt %d failed (%s)", job["id"], job["attempts"], error)
+    except Exception as e:
+        error = repr(e)
+        status = await asyncio.to_thread(job_queue.retry, job["id"], error)
+        logger.warning("Job %s attempt %d failed (%s); now %s", job["id"], job["attempts"], error, status)
+        status = "retried" if status == "queued" else status
+    JOB_SECONDS.observe(time.time() - started, phase="run")
+    JOBS.inc(outcome=status)
+
+
+# --- Streaming: /scrape/stream sends each part of the result as soon as it is parsed ---
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+# Running pump_stream tasks, so none is garbage-collected mid-stream
+_stream_tasks = set()
+
+
+def encode_event(event, payload, stream_format):
+    data = orjson.dumps(payload) if orjson is not None else json.dumps(payload, separators=(",", ":")).encode()
+    if stream_format == "sse":
+        return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+    return b'{"event":"' + event.encode() + b'","data":' + data + b"}\n"
+
+
+def project_event(event, payload, fields):
+    """An event's data narrowed to the view/fields projection, or None when the event is left out."""
+    if fields is None:
+        return payload
+    if event == "section":
+        return payload if "sections" in fields else None
+    if event in ("metadata", "summary"):
+        return project_preview(payload, fields)
+    return payload
+
+
+async def cached_events(result, etag, stream_format, fields=None):
+    """A cached result replayed as the events a streamed parse would have sent."""
+    preview = result["json_preview"]
+    events = [("metadata", {k: v for k, v in preview.items() if k != "sections" and k not in SUMMARY_FIELDS})]
+    events += [("section", section) for section in preview["sections"]]
+    events.append(("summary", {k: preview[k] for k in SUMMARY_FIELDS if k in preview}))
+    events.append(("end", {"status": "success", "etag": etag}))
+    for event, payload in events:
+        payload = project_event(event, payload, fields)
+        if payload is not None:
+            yield encode_event(event, payload, stream_format)
+
+
+async def receive(reader, future):
+    """The next message from a streaming worker, or None once it has finished without sending one."""
+    loop = asyncio.get_running_loop()
+    while not reader.poll():
+        readable = loop.create_future()
+        loop.add_reader(reader.fileno(), lambda: readable.done() or readable.set_result(None))
+        try:
+            await asyncio.wait((readable, future), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            loop.remove_reader(reader.fileno())
+            readable.cancel()
+        if future.done() and not reader.poll():
+            return None
+    # The start of a message is there; a large one may still be arriving, so read it off the loop
+    return await asyncio.to_thread(reader.recv)
+
+
+async def pump_stream(reader, writer, future, queue, cleaned_html, key, etag):
+    """
+    Move a streamed parse from the worker's pipe onto queue, then store the
+    assembled result like /scrape does (artifacts, cache, index).
+
+    Runs to the end even after the client has gone: the worker is never left
+    blocked on a full pipe, and the result is cached for the retry. "end" is
+    held back until the result is in the cache, so its etag can be fetched
+    straight away.
+    """
+    builder = ResultBuilder()
+    try:
+        while True:
+            message = await receive(reader, future)
+            if message is None:
+                error = future.exception() if not future.cancelled() else None
+                if isinstance(error, BrokenProcessPool):
+                    # scrape_stream answers 503 when this comes before any other event
+                    queue.put_nowait(("crashed", {"status": "failed", "error": WORKER_CRASHED}))
+                else:
+                    queue.put_nowait(("end", {"status": "failed", "error": f"Parse worker stopped: {error!r}"}))
+                return
+            event, payload = message
+            if event == "done":
+                timings, text_content = payload
+                result = finish_parse(builder.result(), timings, cleaned_html, text_content)
+                if is_success(result):
+                    await asyncio.to_thread(result_cache.put, key, result)
+                    await index_audit(result, cleaned_html)
+                    queue.put_nowait(("end", {**builder.end, "etag": etag}))
+                else:
+                    queue.put_nowait(("end", builder.end))
+                return
+            builder.add(event, payload)
+            if event != "end":
+                queue.put_nowait(message)
+    except Exception as e:
+        logger.exception("Streamed parse failed: %s", e)
+        queue.put_nowait(("end", {"status": "failed", "error": str(e)}))
+    finally:
+        reader.close()
+        writer.close()
+
+
+async def next_event(queue, deadline):
+    try:
+        return await asyncio.wait_for(queue.get(), max(0.0, deadline - time.perf_counter()))
+    except asyncio.TimeoutError:
+        return "end", {"status": "failed", "error": f"Parsing took longer than {SCRAPE_TIMEOUT:g}s"}
+
 
-app = FastAPI()
+async def stream_events(queue, stream_format, deadline, first, fields=None):
+    """Encode first and every later event off queue, up to and including "end", projected to fields."""
+    event, payload = first
+    while True:
+        if event == "crashed":
+            event = "end"
+        payload = project_event(event, payload, fields)
+        if payload is not None:
+            yield encode_event(event, payload, stream_format)
+        if event == "end":
+            return
+        event, payload = await next_event(queue, deadline)
+
+
+def decode_html_payload(html_content):
+    # --- Interpret leftover backslash escapes, then HTML entities ---
+    # backslashreplace keeps non-Latin-1 characters as \uXXXX so unicode_escape
+    # turns them back into themselves instead of mojibake
+    try:
+        cleaned_html = html_content
+        if "\\" in cleaned_html:
+            cleaned_html = codecs.decode(cleaned_html.encode('latin-1', 'backslashreplace'), 'unicode_escape')
+        cleaned_html = html.unescape(cleaned_html)
+    except Exception as e:
+        cleaned_html = html.unescape(html_content)
+        logger.warning("Unicode decode fallback: %s", e)
+    return cleaned_html
+
+
+class PayloadError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def make_decompressor(content_encoding):
+    """Return a chunk -> bytes function for the request's Content-Encoding (None for identity)."""
+    encoding = content_encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        # wbits 47 auto-detects gzip and zlib headers
+        decompressor = zlib.decompressobj(47)
+
+        def decompress(chunk):
+            # Cap the output so a small compressed body can't expand past the limit
+            data = decompressor.decompress(chunk, MAX_BODY_BYTES + 1)
+            if decompressor.unconsumed_tail:
+                raise PayloadError("Audit is too large", 413)
+            return data
+
+        return decompress
+    if encoding == "br":
+        if brotli is None:
+            raise PayloadError("Content-Encoding br needs the brotli package", 415)
+        if not hasattr(brotli.Decompressor, "can_accept_more_data"):
+            # Older releases can't cap the output, so a small bomb would inflate in full
+            raise PayloadError("Content-Encoding br needs brotli 1.2 or newer", 415)
+        decompressor = brotli.Decompressor()
+
+        def decompress(chunk):
+            # Same cap as gzip: more output still pending past the limit means the audit is too large
+            try:
+                data = decompressor.process(chunk, output_buffer_limit=MAX_BODY_BYTES + 1)
+            except brotli.error as e:
+                raise PayloadError(f"Could not decompress body: {e}", 400)
+            if len(data) > MAX_BODY_BYTES or not decompressor.can_accept_more_data():
+                raise PayloadError("Audit is too large", 413)
+            return data
+
+        return decompress
+    raise PayloadError(f"Unsupported Content-Encoding: {content_encoding}", 415)
+
+
+async def read_html_body(request):
+    """
+    Stream a raw text/html body, decompressing and decoding it chunk by chunk.
+
+    Returns the text, decoded with the charset from Content-Type (UTF-8 by
+    default), and the seconds spent decompressing and decoding, which leave
+    out the time spent waiting for the client's chunks.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_BODY_BYTES:
+        raise PayloadError("Audit is too large", 413)
+
+    decompress = make_decompressor(request.headers.get("content-encoding", ""))
+    charset = "utf-8"
+    for param in request.headers.get("content-type", "").split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "charset" and value:
+            charset = value.strip('"')
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    except LookupError:
+        raise PayloadError(f"Unknown charset: {charset}", 415)
+
+    parts = []
+    size = 0
+    decode_seconds = 0.0
+    async for chunk in request.stream():
+        started = time.perf_counter()
+        if decompress is not None:
+            chunk = decompress(chunk)
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise PayloadError("Audit is too large", 413)
+        parts.append(decoder.decode(chunk))
+        decode_seconds += time.perf_counter() - started
+    started = time.perf_counter()
+    parts.append(decoder.decode(b"", final=True))
+    html_content = "".join(parts)
+    return html_content, decode_seconds + time.perf_counter() - started
+
+
+async def read_json_body(request):
+    """A JSON request body, refused with 413 past MAX_BODY_BYTES like a raw one."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_BODY_BYTES:
+        raise PayloadError("Audit is too large", 413)
+    parts = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise PayloadError("Audit is too large", 413)
+        parts.append(chunk)
+    try:
+        data = json.loads(b"".join(parts))
+    except ValueError:
+        raise PayloadError("Body is not valid JSON", 400)
+    if not isinstance(data, dict):
+        raise PayloadError("Expected a JSON object", 400)
+    return data
+
+
+async def read_audit_request(request):
+    """
+    The decoded audit of a /scrape-style request and its options (student_id, base, view, fields).
+
+    The audit is a raw (optionally gzip/br compressed) text/html body, with the
+    options as query parameters, or JSON with an "html" field, where the
+    options may also be JSON fields. Both go through decode_html_payload, so an
+    audit gets the same cache key and ETag either way. Raises PayloadError
+    without a usable audit.
+    """
+    # Delta mode: student_id (and optionally the snapshot id the client holds as base);
+    # projection: view= preset and/or fields= list of json_preview keys
+    options = {name: request.query_params.get(name) for name in ("student_id", "base", "view", "fields")}
+    if request.headers.get("content-type", "").startswith("text/html"):
+        # Raw HTML body
+        try:
+            html_content, decode_seconds = await read_html_body(request)
+        except zlib.error as e:
+            raise PayloadError(f"Could not decompress body: {e}", 400)
+    else:
+        data = await read_json_body(request)
+        html_content, decode_seconds = data.get("html"), 0.0
+        for name in options:
+            options[name] = data.get(name) or options[name]
+
+    if not html_content:
+        raise PayloadError("No HTML provided", 400)
+    if not isinstance(html_content, str):
+        raise PayloadError("\"html\" must be a string", 400)
+
+    started = time.perf_counter()
+    cleaned_html = decode_html_payload(html_content)
+    record_stage("decode", decode_seconds + time.perf_counter() - started)
+
+    if DEBUG_DUMP:
+        await asyncio.to_thread(write_debug_copy, cleaned_html)
+
+    AUDIT_CHARS.observe(len(cleaned_html))
+    logger.info("HTML received and decoded. Length: %d", len(cleaned_html))
+    return cleaned_html, options
+
+
+def write_debug_copy(cleaned_html):
+    os.makedirs("testwrite", exist_ok=True)
+    with open("testwrite/raw_received.html", "w", encoding="utf-8") as f:
+        f.write(cleaned_html)
 
 # ✅ Allow Android devices (and any frontend) to connect
 app.add_middleware(
@@ -16,11 +726,237 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
+
+# Paths reported on /metrics; anything else would give unbounded label values
+METERED_PATHS = {"/scrape", "/scrape/batch", "/scrape/stream", "/jobs"}
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    endpoint = request.url.path
+    if endpoint not in METERED_PATHS:
+        return await call_next(request)
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        REQUEST_BYTES.observe(int(content_length), endpoint=endpoint)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=status)
 
 @app.get("/")
 def home():
     return {"message": "Morgan State Scraper API is running!"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+@app.get("/snapshots/stats")
+def snapshot_stats():
+    return snapshot_cache.stats()
+
+@app.get("/pool/stats")
+def pool_stats():
+    return {
+        "kind": POOL_KIND,
+        "workers": POOL_WORKERS,
+        "queue_limit": QUEUE_LIMIT,
+        "pending": pending_jobs,
+        "timeout_seconds": SCRAPE_TIMEOUT,
+    }
+
+@app.get("/jobs/stats")
+async def jobs_stats():
+    queue = await get_job_queue()
+    if queue is None:
+        # Nothing was ever submitted
+        stats = {"path": JOBS_DB, **dict.fromkeys(("queued", "running") + FINISHED, 0)}
+    else:
+        stats = await asyncio.to_thread(queue.stats)
+    return {**stats, "workers_here": JOB_WORKERS, "poll_seconds": JOB_POLL_SECONDS}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, view: str = None, fields: str = None):
+    """A job's status, attempts and timings; the result (narrowed by view/fields) once it has finished."""
+    try:
+        fields = resolve_fields(view, fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    queue = await get_job_queue()
+    job = await asyncio.to_thread(queue.get, job_id) if queue is not None else None
+    if job is None:
+        return JSONResponse({"error": "Unknown or expired job"}, status_code=404)
+    job["result"] = project_result(job["result"], fields)
+    return FastJSONResponse(job)
+
+@app.get("/artifacts/stats")
+def artifact_stats():
+    return get_artifact_store().stats()
+
+@app.get("/artifacts/{run_id}")
+def artifact_entry(run_id: str):
+    entry = get_artifact_store().get(run_id)
+    if entry is None:
+        return JSONResponse({"error": "Unknown artifact id"}, status_code=404)
+    return entry
+
+# --- Cohort queries over the SQLite audit index (SCRAPER_INDEX_DB) ---
+def index_unavailable():
+    return JSONResponse({"error": "The audit index is disabled; set SCRAPER_INDEX_DB"}, status_code=503)
+
+
+def bad_course(course):
+    return JSONResponse({"error": f"Not a course code: {course!r}"}, status_code=400)
+
+
+@app.get("/index/stats")
+async def index_stats():
+    index = get_audit_index()
+    if index is None:
+        return index_unavailable()
+    return await asyncio.to_thread(index.stats)
+
+@app.get("/query/still-needed")
+async def query_still_needed(course: str, limit: int = 1000):
+    """Students whose remaining requirements include course (e.g. COSC 470), wildcards included."""
+    index = get_audit_index()
+    if index is None:
+        return index_unavailable()
+    code = normalize_code(course)
+    if code is None:
+        return bad_course(course)
+    students = await asyncio.to_thread(index.still_needed, code, limit)
+    return {"course": code, "count": len(students), "students": students}
+
+@app.get("/query/in-progress")
+async def query_in_progress(course: str, term: str = None, limit: int = 1000):
+    """Students in progress on course in term (e.g. FALL 2025); each student's own current term by default."""
+    index = get_audit_index()
+    if index is None:
+        return index_unavailable()
+    code = normalize_code(course)
+    if code is None:
+        return bad_course(course)
+    term_key = label_term(term) if term else None
+    if term and term_key is None:
+        return JSONResponse({"error": f"Not a term: {term!r}"}, status_code=400)
+    students = await asyncio.to_thread(index.in_progress, code, term_key, limit)
+    return {"course": code, "term": term, "count": len(students), "students": students}
+
+@app.get("/query/completed")
+async def query_completed(course: str, grade: str = None, limit: int = 1000):
+    index = get_audit_index()
+    if index is None:
+        return index_unavailable()
+    code = normalize_code(course)
+    if code is None:
+        return bad_course(course)
+    students = await asyncio.to_thread(index.completed, code, grade, limit)
+    return {"course": code, "grade": grade, "count": len(students), "students": students}
+
+@app.get("/query/requirements")
+async def query_requirements(q: str, limit: int = 1000):
+    """Full-text search over remaining requirement text."""
+    index = get_audit_index()
+    if index is None:
+        return index_unavailable()
+    students = await asyncio.to_thread(index.search_requirements, q, limit)
+    return {"query": q, "count": len(students), "students": students}
+
+# --- Cohort analytics: NumPy columns built from the index, rebuilt only when it changes ---
+_cohort = (None, None)
+_cohort_lock = asyncio.Lock()
+
+
+async def current_cohort():
+    global _cohort
+    index = get_audit_index()
+    version = await asyncio.to_thread(index.version)
+    async with _cohort_lock:
+        if _cohort[0] != version:
+            _cohort = (version, await asyncio.to_thread(Cohort.from_index, index))
+        return _cohort[1]
+
+
+def analytics_unavailable():
+    if get_audit_index() is None:
+        return index_unavailable()
+    if Cohort is None:
+        return JSONResponse({"error": "Cohort analytics need numpy (pip install numpy)"}, status_code=503)
+    return None
+
+
+@app.get("/analytics/term-loads")
+async def analytics_term_loads():
+    """Credits per student per term across the cohort (mean, median, p10/p90, max)."""
+    unavailable = analytics_unavailable()
+    if unavailable:
+        return unavailable
+    cohort = await current_cohort()
+    return {"students": len(cohort), "terms": await asyncio.to_thread(cohort.term_loads)}
+
+@app.get("/analytics/grades")
+async def analytics_grades(course: str = None, limit: int = 50):
+    """Grade distribution per course: one course, or the most-taken ones."""
+    unavailable = analytics_unavailable()
+    if unavailable:
+        return unavailable
+    code = None
+    if course:
+        code = normalize_code(course)
+        if code is None:
+            return bad_course(course)
+    cohort = await current_cohort()
+    return {"students": len(cohort), "courses": await asyncio.to_thread(cohort.grade_distribution, code, limit)}
+
+@app.get("/analytics/sections")
+async def analytics_sections():
+    """Completion rate per requirement section."""
+    unavailable = analytics_unavailable()
+    if unavailable:
+        return unavailable
+    cohort = await current_cohort()
+    return {"students": len(cohort), "sections": await asyncio.to_thread(cohort.section_completion)}
+
+@app.get("/analytics/gpa")
+async def analytics_gpa():
+    """Term GPA from course grades per term, and overall GPA per classification."""
+    unavailable = analytics_unavailable()
+    if unavailable:
+        return unavailable
+    cohort = await current_cohort()
+    return {"students": len(cohort), **await asyncio.to_thread(cohort.gpa_trends)}
+
+@app.get("/metrics")
+def metrics():
+    cache = result_cache.stats()
+    gauges = {
+        "scraper_pool_pending": ("Parses queued or running on the worker pool", pending_jobs),
+        "scraper_pool_queue_limit": ("Pending parses allowed before /scrape answers 503", QUEUE_LIMIT),
+        "scraper_cache_hits": ("Result cache hits since start", cache["hits"]),
+        "scraper_cache_misses": ("Result cache misses since start", cache["misses"]),
+        "scraper_cache_memory_entries": ("Results held in the memory cache tier", cache["memory_entries"]),
+        "scraper_snapshot_memory_entries": (
+            "Student snapshots held in memory", snapshot_cache.stats()["memory_entries"],
+        ),
+    }
+    if job_queue is not None:
+        jobs = job_queue.stats()
+        gauges["scraper_jobs_queued"] = ("Jobs waiting in the durable queue", jobs["queued"])
+        gauges["scraper_jobs_running"] = ("Jobs claimed by a worker and not finished", jobs["running"])
+        gauges["scraper_jobs_oldest_queued_seconds"] = (
+            "Age of the oldest queued job", jobs["oldest_queued_seconds"] or 0,
+        )
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
 @app.get("/testwrite")
 def test_write():
     test_html = "<html><body><p>Hello World</p></body></html>"
@@ -28,25 +964,216 @@ def test_write():
 
 @app.post("/scrape")
 async def scrape(request: Request):
-    data = await request.json()
-    html_content = data.get("html")
+    try:
+        cleaned_html, options = await read_audit_request(request)
+    except PayloadError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+    student_id, base, view, fields = options["student_id"], options["base"], options["view"], options["fields"]
 
-    if not html_content:
-        return JSONResponse({"error": "No HTML provided"}, status_code=400)
+    try:
+        fields = resolve_fields(view, ",".join(fields) if isinstance(fields, list) else fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    # The client already holds this exact result: no parse, no body
+    key = audit_key(cleaned_html)
+    etag = make_etag(key, fields)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
 
-    # --- Decode twice, then interpret Unicode escapes ---
     try:
-        cleaned_html = html_content.encode('utf-8').decode('unicode_escape')
-        cleaned_html = html.unescape(cleaned_html)
-    except Exception as e:
-        cleaned_html = html.unescape(html_content)
-        print("⚠️ Unicode decode fallback:", e)
+        if student_id:
+            body = await delta_scrape(cleaned_html, str(student_id), base, key)
+            body["data"] = project_result(body["data"], fields)
+            headers = {"ETag": etag} if is_success(body["data"]) else None
+            return FastJSONResponse(body, headers=headers)
+        result = await cached_scrape(cleaned_html, key)
+        await index_audit(result, cleaned_html)
+    except QueueFull:
+        return retry_later()
+    except BrokenProcessPool:
+        return retry_later(WORKER_CRASHED)
+    except asyncio.TimeoutError:
+        return JSONResponse({"error": f"Parsing took longer than {SCRAPE_TIMEOUT:g}s"}, status_code=504)
+    # Returned as a Response so FastAPI skips its generic (slow) jsonable_encoder pass
+    return FastJSONResponse(
+        {"status": "success", "data": project_result(result, fields)},
+        # Only successful results are cached, so only they can be fetched again by ETag
+        headers={"ETag": etag} if is_success(result) else None,
+    )
 
-    os.makedirs("testwrite", exist_ok=True)
-    with open("testwrite/raw_received.html", "w", encoding="utf-8") as f:
-        f.write(cleaned_html)
 
-    print(f"✅ HTML received and decoded. Length: {len(cleaned_html)}")
+@app.get("/results/{etag}")
+async def cached_result(request: Request, etag: str, view: str = None, fields: str = None):
+    """
+    A result computed earlier, by the ETag /scrape returned, without uploading the audit again.
+
+    404 once the result has left the cache; the client then posts the audit.
+    """
+    key = etag.removeprefix("W/").strip('"').split(".")[0]
+    if not AUDIT_KEY.fullmatch(key):
+        return JSONResponse({"error": "Malformed ETag"}, status_code=400)
+    try:
+        fields = resolve_fields(view, fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    current = make_etag(key, fields)
+    if etag_matches(request.headers.get("if-none-match"), current):
+        return not_modified(current)
+
+    result = await asyncio.to_thread(result_cache.get, key)
+    if result is None:
+        return JSONResponse({"error": "Unknown or expired ETag; post the audit again"}, status_code=404)
+    return FastJSONResponse({"status": "success", "data": project_result(result, fields)}, headers={"ETag": current})
+
+@app.post("/scrape/stream")
+async def scrape_stream(request: Request):
+    """
+    /scrape as a stream of events, each sent as soon as it is parsed: "metadata",
+    one "section" per requirement block, "summary" and a last "end" with the
+    status (and the ETag for /results when it succeeded).
+
+    NDJSON by default; Server-Sent Events with format=sse or Accept: text/event-stream.
+    view/fields narrow the metadata and summary events and drop the section
+    events unless "sections" is asked for. Delta mode (student_id) is /scrape only.
+    """
+    stream_format = request.query_params.get("format") or (
+        "sse" if "text/event-stream" in request.headers.get("accept", "") else "ndjson"
+    )
+    if stream_format not in STREAM_MEDIA_TYPES:
+        return JSONResponse({"error": f"Unknown format {stream_format!r}; expected ndjson or sse"}, status_code=400)
+    try:
+        cleaned_html, options = await read_audit_request(request)
+    except PayloadError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+    if options["student_id"] or options["base"]:
+        return JSONResponse({"error": "Delta mode (student_id) is not available on streams; use /scrape"},
+                            status_code=400)
+    try:
+        fields = options["fields"]
+        fields = resolve_fields(options["view"], ",".join(fields) if isinstance(fields, list) else fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    key = audit_key(cleaned_html)
+    etag = make_etag(key, fields)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    cached = await asyncio.to_thread(result_cache.get, key)
+    if cached is not None:
+        body = cached_events(cached, etag, stream_format, fields)
+    else:
+        reader, writer = Pipe(duplex=False)
+        try:
+            future = submit_to_pool(stream_audit_html, writer, cleaned_html)
+        except QueueFull:
+            reader.close()
+            writer.close()
+            return retry_later()
+        deadline = time.perf_counter() + SCRAPE_TIMEOUT
+        queue = asyncio.Queue()
+        task = asyncio.create_task(pump_stream(reader, writer, future, queue, cleaned_html, key, etag))
+        _stream_tasks.add(task)
+        task.add_done_callback(_stream_tasks.discard)
+        # The status line waits for the first event, so a worker that crashes before
+        # sending anything still gets a 503; after that the crash can only end the stream
+        first = await next_event(queue, deadline)
+        if first[0] == "crashed":
+            return retry_later(WORKER_CRASHED)
+        body = stream_events(queue, stream_format, deadline, first, fields)
+    # X-Accel-Buffering: no keeps a fronting nginx from holding the events back
+    return StreamingResponse(
+        body, media_type=STREAM_MEDIA_TYPES[stream_format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/jobs")
+async def submit_job(request: Request):
+    """
+    Queue an audit (same body as /scrape) and answer at once with 202 and the job id.
+
+    The job survives restarts; poll GET /jobs/{id} for its status and result.
+    """
+    try:
+        cleaned_html, options = await read_audit_request(request)
+    except PayloadError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+    student_id = options["student_id"]
+    queue = await get_job_queue(create=True)
+    try:
+        job_id, queued_ahead = await asyncio.to_thread(
+            queue.submit, cleaned_html, str(student_id) if student_id else None,
+        )
+    except JobQueueFull:
+        return JSONResponse(
+            {"error": f"Job queue is full ({JOB_QUEUE_LIMIT} queued), please retry later"},
+            status_code=503,
+            headers={"Retry-After": "30"},
+        )
+    jobs_waiting.set()
+    return JSONResponse(
+        {"id": job_id, "status": "queued", "queued_ahead": queued_ahead},
+        status_code=202,
+        headers={"Location": f"/jobs/{job_id}"},
+    )
+
+
+@app.post("/scrape/batch")
+async def scrape_batch(request: Request):
+    data = await request.json()
+    documents = data.get("documents")
+
+    if not isinstance(documents, list) or not documents:
+        return JSONResponse({"error": "Expected a non-empty \"documents\" list"}, status_code=400)
+    if len(documents) > BATCH_LIMIT:
+        return JSONResponse({"error": f"At most {BATCH_LIMIT} documents per batch"}, status_code=413)
+    try:
+        fields = data.get("fields") or request.query_params.get("fields")
+        fields = resolve_fields(
+            data.get("view") or request.query_params.get("view"),
+            ",".join(fields) if isinstance(fields, list) else fields,
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    crashed = False
+
+    async def scrape_item(index, document):
+        nonlocal crashed
+        # Items are either raw HTML strings or {"id": ..., "html": ...}
+        item_id = document.get("id") if isinstance(document, dict) else None
+        html_content = document.get("html") if isinstance(document, dict) else document
+        if not isinstance(html_content, str) or not html_content:
+            return {"index": index, "id": item_id, "status": "failed", "error": "No HTML provided"}, 0
+
+        cleaned_html = await asyncio.to_thread(decode_html_payload, html_content)
+        async with slots:
+            try:
+                while True:
+                    try:
+                        result = await cached_scrape(cleaned_html)
+                        break
+                    except QueueFull:
+                        # Interactive requests filled the pool; a batch waits its turn instead of failing items
+                        await wait_for_slot()
+                await index_audit(result, cleaned_html, str(item_id) if item_id is not None else None)
+            except asyncio.TimeoutError:
+                result = {"status": "failed", "error": f"Parsing took longer than {SCRAPE_TIMEOUT:g}s"}
+            except BrokenProcessPool:
+                crashed = True
+                result = {"status": "failed", "error": WORKER_CRASHED}
+            except Exception as e:
+                result = {"status": "failed", "error": str(e)}
+        return {"index": index, "id": item_id, **project_result(result, fields)}, len(cleaned_html)
 
-    result = scrape_degreeworks(cleaned_html)
-    return {"status": "success", "data": result}
\ No newline at end of file
+    items = await asyncio.gather(*(scrape_item(i, doc) for i, doc in enumerate(documents)))
+    results = [result for result, _ in items]
+    stats = batch_stats([length for _, length in items], results, time.perf_counter() - started)
+    if crashed:
+        # Items that finished are cached, so the retry only parses the ones the crash cut short
+        return retry_later(WORKER_CRASHED, results=results, stats=stats)
+    return FastJSONResponse({"status": "success", "results": results, "stats": stats})
@@ -0,0 +1,46 @@
+"""Section splitting on the captured audit in testwrite/ (run from the repository root: python -m pytest)."""
+import os
+
+import pytest
+from selectolax.parser import HTMLParser
+
+from json_convert import split_sections
+from scraper2 import parse_audit_html
+
+AUDIT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "testwrite", "raw_received.html")
+
+# The audit's table of contents lists "Free Electives", which must not open the
+# "Electives" section; no block of this audit starts with that header.
+EXPECTED_COURSES = {
+    "General Education Program Requirements": 0,
+    "Major Requirements": 16,
+    "Computer Science Requirements": 8,
+    "Senior Project": 1,
+    "Complementary Studies Program": 10,
+}
+
+
+@pytest.fixture(scope="module")
+def audit_html():
+    with open(AUDIT, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_section_course_counts(audit_html):
+    result, _ = parse_audit_html(audit_html)
+    assert result["status"] == "success"
+    counts = {s["name"]: len(s["completed_courses"]) for s in result["json_preview"]["sections"]}
+    assert counts == EXPECTED_COURSES
+
+
+def test_headers_only_count_at_line_start():
+    text = "Contents\nFree Electives\nMajor Requirements\nCourse\nCOSC 111\nGroup A Electives\nElectives\nCourse\nCOSC 238"
+    assert [header for header, _, _ in split_sections(text, ("Major Requirements", "Electives"))] == [
+        "Major Requirements", "Electives",
+    ]
+
+
+def test_sections_do_not_overlap(audit_html):
+    text = HTMLParser(audit_html).text(separator="\n").strip()
+    bounds = split_sections(text)
+    assert all(end == next_start for (_, _, end), (_, next_start, _) in zip(bounds, bounds[1:]))
@@ -0,0 +1,73 @@
+# --- Response views ---
+# The full json_preview repeats every course up to four times (raw sections,
+# semesters and both course lists). Clients name the parts they render with
+# view= (a preset below) and/or fields= (json_preview keys); the rest is dropped.
+METADATA_FIELDS = (
+    "student_name", "gpa", "advisor", "transfer_hours", "classification", "graduation_status",
+    "graduation_term", "major", "program", "college", "academic_standing",
+    "total_completed_credits", "total_completed_courses",
+    "current_term", "current_term_courses", "current_term_credits",
+)
+FIELDS = frozenset(METADATA_FIELDS + ("sections", "semesters", "completed_courses_list", "in_progress_courses_list"))
+
+VIEWS = {
+    "full": None,
+    "summary": METADATA_FIELDS,
+    "semesters": METADATA_FIELDS + ("semesters",),
+    "courses": METADATA_FIELDS + ("completed_courses_list", "in_progress_courses_list"),
+}
+
+
+def resolve_fields(view=None, fields=None):
+    """
+    The set of json_preview keys to send, or None for everything.
+
+    fields is a comma-separated list; with a view as well the two are merged.
+    Raises ValueError naming an unknown view or field.
+    """
+    if view and view not in VIEWS:
+        raise ValueError(f"Unknown view {view!r}; expected one of {', '.join(VIEWS)}")
+    requested = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    unknown = [name for name in requested if name not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    preset = VIEWS.get(view) if view else None
+    if view == "full" or (not requested and preset is None):
+        return None
+    return frozenset(requested).union(preset or ())
+
+
+def project_preview(preview, fields):
+    if fields is None or not isinstance(preview, dict):
+        return preview
+    # Keys outside the known set (errors, extra metadata) always go through
+    return {k: v for k, v in preview.items() if k in fields or k not in FIELDS}
+
+
+def project_delta(delta, fields):
+    if fields is None:
+        return delta
+    projected = {}
+    for name, diff in delta.items():
+        if name == "metadata":
+            diff = {k: v for k, v in diff.items() if k in fields or k not in FIELDS}
+        elif name == "metadata_removed":
+            diff = [k for k in diff if k in fields or k not in FIELDS]
+        elif name not in fields:
+            continue
+        if diff:
+            projected[name] = diff
+    return projected
+
+
+def project_result(result, fields):
+    """A copy of a scrape result (full or delta) with json_preview / delta narrowed to fields."""
+    if fields is None or not isinstance(result, dict):
+        return result
+    projected = dict(result)
+    if "json_preview" in projected:
+        projected["json_preview"] = project_preview(projected["json_preview"], fields)
+    if "delta" in projected:
+        projected["delta"] = project_delta(projected["delta"], fields)
+    return projected